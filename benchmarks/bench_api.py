@@ -0,0 +1,243 @@
+"""Latency / throughput benchmark for the prediction API.
+
+Replays synthetic payloads drawn from datasets/*.csv against the app
+in-process (template reports instead of the LLM) and reports p50/p95/p99
+latency, throughput and memory per endpoint and engine. Single predictions
+include their SHAP top features; batch_explain covers batched attributions.
+
+    python benchmarks/bench_api.py                       # run and print
+    python benchmarks/bench_api.py --save-baseline       # write benchmarks/baseline.json
+    python benchmarks/bench_api.py --check               # fail on regressions vs the baseline
+
+The committed baseline was recorded with the .forest artifacts exported;
+without them the native scenarios are served by sklearn and --check refuses
+to compare them. Export them first:
+
+    python -m services.forest models/diabetes_model.pkl models/heart_pipeline.pkl models/parkinsons_pipeline.pkl
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# disease -> (csv, columns to drop)
+DATASETS = {
+    "diabetes": ("datasets/diabetes.csv", ["Outcome"]),
+    "heart": ("datasets/heart.csv", ["HeartDisease"]),
+    "parkinsons": ("datasets/parkinsons.csv", ["name", "status"]),
+}
+
+
+def synthetic_payloads(csv_path, drop, n, seed=0):
+    """Sample n payloads column by column from the empirical distribution.
+
+    Numeric columns are bootstrapped and jittered by a fraction of their
+    standard deviation (clipped to the observed range so schema bounds hold);
+    categorical columns are drawn with their observed frequencies.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(os.path.join(ROOT, csv_path)).drop(columns=drop)
+    out = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            out[col] = rng.choice(values, size=n)
+            continue
+        sampled = rng.choice(values, size=n) + rng.normal(0, 0.05 * values.std(), size=n)
+        sampled = np.clip(sampled, values.min(), values.max())
+        out[col] = np.round(sampled).astype(int) if pd.api.types.is_integer_dtype(df[col]) else sampled
+    return pd.DataFrame(out).to_dict("records")
+
+
+def stub_llm():
+    # template reports: no network, constant cost, so only the prediction path is measured
+    os.environ.setdefault("LLM_PROVIDER", "template")
+    import main
+    return main
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(latencies, elapsed, rows):
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "throughput_rps": round(len(ms) / elapsed, 1),
+        "rows_per_s": round(rows / elapsed, 1),
+    }
+
+
+def run_scenario(client, method, url, payloads, concurrency, rows_per_request=1):
+    def call(payload):
+        start = time.perf_counter()
+        response = client.request(method, url, json=payload)
+        latency = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} -> {response.status_code}: {response.text[:200]}")
+        return latency
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = list(pool.map(call, payloads))
+    else:
+        latencies = [call(p) for p in payloads]
+    elapsed = time.perf_counter() - start
+    result = summarize(latencies, elapsed, len(payloads) * rows_per_request)
+    result["rss_mb"] = round(rss_mb(), 1)
+    result["rss_delta_mb"] = round(result["rss_mb"] - rss_before, 1)
+    return result
+
+
+def run_engine(main, engine, args):
+    from fastapi.testclient import TestClient
+
+    os.environ["MODEL_ENGINE"] = engine
+    results = {}
+    with TestClient(main.app) as client:
+        while client.get("/ready").status_code != 200:
+            if any(m["state"] == "failed" for m in client.get("/ready").json()["models"].values()):
+                raise RuntimeError(f"model failed to load: {client.get('/ready').json()}")
+            time.sleep(0.05)
+        served = {key: m["engine"] for key, m in client.get("/ready").json()["models"].items()}
+
+        for disease, (csv_path, drop) in DATASETS.items():
+            if args.diseases and disease not in args.diseases:
+                continue
+            payloads = synthetic_payloads(csv_path, drop, args.requests, seed=args.seed)
+            for payload in payloads[: args.warmup]:
+                client.post(f"/predict/{disease}", json=payload)
+            results[f"{engine}/{disease}/single"] = run_scenario(
+                client, "POST", f"/predict/{disease}", payloads, args.concurrency
+            )
+
+            batch_rows = synthetic_payloads(csv_path, drop, args.batch_size * args.batches, seed=args.seed + 1)
+            batches = [batch_rows[i:i + args.batch_size] for i in range(0, len(batch_rows), args.batch_size)]
+            results[f"{engine}/{disease}/batch"] = run_scenario(
+                client, "POST", f"/predict/{disease}/batch", batches, 1, rows_per_request=args.batch_size
+            )
+
+            # attributions for every row are opt-in on the batch endpoint and much costlier, so bench them on smaller batches
+            explain_batches = [rows[: args.explain_batch_size] for rows in batches]
+            results[f"{engine}/{disease}/batch_explain"] = run_scenario(
+                client, "POST", f"/predict/{disease}/batch?explain=true", explain_batches, 1,
+                rows_per_request=args.explain_batch_size,
+            )
+    return results, served
+
+
+def check_regressions(results, baseline, tolerance, engines, model_keys):
+    """Compare results with the baseline; returns (regressions, scenarios that cannot be compared).
+
+    A scenario is only compared when its model was served by the same engine
+    as in the baseline: "native" falls back to sklearn without .forest files,
+    and sklearn numbers measured against native ones would read as regressions.
+    """
+    failures, mismatched = [], []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        engine, disease, _ = name.split("/")
+        served = engines.get(engine, {}).get(model_keys[disease])
+        base_served = baseline.get("engines_served", {}).get(engine, {}).get(model_keys[disease])
+        if served != base_served:
+            mismatched.append(f"{name}: served by {served}, baseline by {base_served}")
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if current["rows_per_s"] < base["rows_per_s"] * (1 - tolerance):
+            failures.append(f"{name}: {current['rows_per_s']} rows/s vs baseline {base['rows_per_s']} rows/s")
+    return failures, mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["sklearn", "native"])
+    parser.add_argument("--diseases", nargs="+", choices=list(DATASETS))
+    parser.add_argument("--requests", type=int, default=300, help="single-row requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--batches", type=int, default=5)
+    parser.add_argument("--explain-batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 if p95 or throughput regress past --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("MODEL_WATCH_INTERVAL", "0")
+    app_module = stub_llm()
+
+    results, engines = {}, {}
+    for engine in args.engines:
+        engine_results, served = run_engine(app_module, engine, args)
+        results.update(engine_results)
+        engines[engine] = served
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline", "check")},
+        "engines_served": engines,
+        "results": results,
+    }
+
+    print(f"{'scenario':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'rows/s':>12}{'rss MB':>9}")
+    for name, r in results.items():
+        print(f"{name:<32}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['throughput_rps']:>10}{r['rows_per_s']:>12}{r['rss_mb']:>9}")
+    fallbacks = {engine: served for engine, served in engines.items() if any(actual != engine for actual in served.values())}
+    for engine, served in fallbacks.items():
+        print(f"note: requested engine '{engine}' but served {served} (export .forest artifacts to bench the native engine)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        if fallbacks:
+            sys.exit("Not saving a baseline whose scenarios were served by another engine than requested.")
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    if args.check:
+        with open(args.baseline) as f:
+            model_keys = {disease: app_module.BATCH_MODELS[disease][1] for disease in DATASETS}
+            failures, mismatched = check_regressions(results, json.load(f), args.tolerance, engines, model_keys)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        for scenario in mismatched:
+            print(f"CANNOT COMPARE {scenario}")
+        if failures:
+            sys.exit(1)
+        if mismatched:
+            sys.exit("Served engines differ from the baseline's; export the .forest artifacts (see --help) or record a new baseline.")
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Local stand-in for the LLM, speaking the protocol of services.llm.HTTPProvider.
+
+Latency, jitter and failure rate are configurable so deadlines, retries and
+the circuit breaker can be exercised without a network or an API key.
+
+    python benchmarks/fake_llm.py --port 8089 --latency 0.8 --error-rate 0.2
+    LLM_PROVIDER=http LLM_BASE_URL=http://127.0.0.1:8089 uvicorn main:app
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPORT = (
+    "Your results suggest a {risk} risk. Key factors are the values furthest from the normal range. "
+    "Tips: eat a balanced diet and stay active. This is not medical advice; consult a doctor."
+)
+
+
+def make_handler(args):
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(max(0.0, random.gauss(args.latency, args.jitter)))
+            if random.random() < args.error_rate:
+                self._send(args.error_status, "application/json", json.dumps({"error": "injected failure"}).encode())
+                return
+
+            text = REPORT.format(risk="high" if "HIGH RISK" in body.get("prompt", "") else "low")
+            if not body.get("stream"):
+                self._send(200, "application/json", json.dumps({"text": text}).encode())
+                return
+
+            words = text.split(" ")
+            step = max(1, len(words) // args.chunks)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(words), step):
+                chunk = (" ".join(words[i:i + step]) + " ").encode()
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+                time.sleep(args.chunk_delay)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _send(self, status, content_type, payload):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeLLMHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--chunks", type=int, default=5)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"Fake LLM listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
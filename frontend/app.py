@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import os
+from client import APIError, PredictionClient
 
 st.set_page_config(
     page_title="MediPredict AI",
@@ -10,6 +11,11 @@ st.set_page_config(
 
 API_URL = os.getenv("API_URL","http://127.0.0.1:8000")
 
+@st.cache_resource
+def get_client():
+    # one pooled session and result cache for every rerun and browser session
+    return PredictionClient(API_URL)
+
 if 'history' not in st.session_state:
     st.session_state.history = []
 
@@ -46,38 +52,61 @@ st.markdown(" Advanced Multi-Disease Risk Analysis powered by GenAI")
 tab1, tab2, tab3 = st.tabs([" Diabetes", " Heart Disease", " Parkinson's"])
 
 def handle_prediction(endpoint, payload, disease_name):
+    client = get_client()
     try:
-        
-        with st.spinner("🤖 Analyzing vitals & generating AI report..."):
-            response = requests.post(f"{API_URL}/predict/{endpoint}", json=payload)
-            
-        if response.status_code == 200:
-            data = response.json()
-            
-          
-            st.session_state.history.append({
-                "disease": disease_name,
-                "risk": data['risk_level'],
-                "date": "Just now"
-            })
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.subheader("Results")
-                if data['risk_level'] == "High":
-                    st.markdown(f"<div class='risk-high'>RISK: HIGH ({data['probability']:.1%})</div>", unsafe_allow_html=True)
-                else:
-                    st.markdown(f"<div class='risk-low'>RISK: LOW ({data['probability']:.1%})</div>", unsafe_allow_html=True)
-            
-            with col2:
-                st.subheader("AI Analysis")
-                st.info(data['ai_analysis'])
-                st.caption("⚠️ Disclaimer: This is an AI prediction. Consult a doctor.")
-        else:
-            st.error(f"Server Error: {response.text}")
-            
+        with st.spinner("🤖 Analyzing vitals..."):
+            key, data = client.predict(endpoint, payload)
+    except APIError as e:
+        st.error(f"Server Error: {e.text}")
+        return
+    except requests.exceptions.Timeout:
+        st.error(" The backend took too long to answer, please try again")
+        return
     except requests.exceptions.ConnectionError:
         st.error(" Could not connect to backend")
+        return
+
+    st.session_state.history.append({
+        "disease": disease_name,
+        "risk": data['risk_level'],
+        "date": "Just now"
+    })
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Results")
+        if data['risk_level'] == "High":
+            st.markdown(f"<div class='risk-high'>RISK: HIGH ({data['probability']:.1%})</div>", unsafe_allow_html=True)
+        else:
+            st.markdown(f"<div class='risk-low'>RISK: LOW ({data['probability']:.1%})</div>", unsafe_allow_html=True)
+
+    with col2:
+        st.subheader("AI Analysis")
+        # the risk is already on screen; the report streams in underneath it
+        if data.get("report_status") == "done" and data.get("ai_analysis"):
+            st.info(data['ai_analysis'])
+        else:
+            show_report(client, key, data)
+        st.caption("⚠️ Disclaimer: This is an AI prediction. Consult a doctor.")
+
+def show_report(client, key, data):
+    placeholder = st.empty()
+    placeholder.info(data.get("ai_analysis") or "🤖 Generating AI report...")
+    # the stream replays the report from its first chunk
+    text = ""
+    try:
+        for chunk in client.stream_report(data['report_id']):
+            text += chunk
+            placeholder.info(text)
+    except (APIError, requests.exceptions.RequestException):
+        # the stream dropped; whatever the job has produced so far is still there
+        try:
+            text = client.report(data['report_id']).get("ai_analysis") or text
+        except (APIError, requests.exceptions.RequestException):
+            pass
+        placeholder.info(text or "The AI report is not available right now.")
+        return
+    client.remember_report(key, text)
 
 # Diabetes
 with tab1:
@@ -176,6 +205,6 @@ with tab3:
             "MDVP:APQ": mdvp_apq, "Shimmer:DDA": shim_dda, "NHR": nhr, "HNR": hnr,
             "RPDE": rpde, "DFA": dfa, "spread1": spread1, "spread2": spread2, "D2": d2, "PPE": ppe
         }
-        handle_prediction("parkinson's",payload,"Parkinson's")
+        handle_prediction("parkinsons",payload,"Parkinson's")
         
        
\ No newline at end of file
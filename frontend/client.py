@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))  # seconds between bytes, not for the whole call
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+
+
+class APIError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def payload_key(endpoint, payload):
+    canonical = json.dumps({"endpoint": endpoint, "payload": payload}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PredictionClient:
+    """Shared HTTP client for the Streamlit app.
+
+    One pooled keep-alive session serves every rerun and every browser
+    session, with connect/read timeouts and a retry on the API's 503
+    back-pressure (honouring Retry-After). Results are cached by payload hash
+    for RESULT_CACHE_TTL seconds, and identical predictions that are already
+    in flight are joined instead of being sent again. Predictions use the
+    async report flow: the risk result comes back straight away and the AI
+    analysis is streamed afterwards from /reports/{id}/stream.
+    """
+
+    def __init__(self, base_url, pool_size=API_POOL_SIZE, cache_size=RESULT_CACHE_SIZE, cache_ttl=RESULT_CACHE_TTL,
+                 timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT)):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.session = requests.Session()
+        retry = Retry(total=2, connect=2, read=0, status=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset({"GET", "POST"}), respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def predict(self, endpoint, payload):
+        """Returns (key, result); result is shared with the cache, so treat it as read-only."""
+        key = payload_key(endpoint, payload)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+                self._cache.move_to_end(key)
+                return key, cached[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return key, future.result()
+        try:
+            result = self._post(f"/predict/{endpoint}", payload)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        self._store(key, result)
+        future.set_result(result)
+        return key, result
+
+    def _post(self, path, payload):
+        response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        if response.status_code != 200:
+            raise APIError(response.status_code, response.text)
+        return response.json()
+
+    def _store(self, key, result):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def remember_report(self, key, text):
+        """Keep a finished AI analysis with its cached result, so a resubmit needs no call at all."""
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache[key] = (cached[0], {**cached[1], "ai_analysis": text, "report_status": "done"})
+
+    def stream_report(self, report_id):
+        """Yield the AI analysis text chunk by chunk as the report job produces it."""
+        with self.session.get(f"{self.base_url}/reports/{report_id}/stream", stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise APIError(response.status_code, response.text)
+            response.encoding = "utf-8"
+            event, data = None, []
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[6:] if line.startswith("data: ") else line[5:])
+                elif not line and event is not None:
+                    if event == "chunk":
+                        yield "\n".join(data)
+                    elif event == "done":
+                        return
+                    elif event == "error":
+                        raise APIError(500, "\n".join(data))
+                    event, data = None, []
+
+    def report(self, report_id):
+        response = self.session.get(f"{self.base_url}/reports/{report_id}", timeout=self.timeout)
+        if response.status_code != 200:
+            raise APIError(response.status_code, response.text)
+        return response.json()
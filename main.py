@@ -1,124 +1,387 @@
-import pickle
-import pandas as pd
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+import secrets
+import time
+from functools import partial
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
-from schemas import DiabetesInput, HeartInput, ParkinsonInput
-from services.llm import generate_health_report
-ml_models = {}
+from schemas import DiabetesInput, HeartInput, ParkinsonInput, ScreenInput, FEATURE_LAYOUTS
+from services.llm import generate_health_report, generate_screening_report, merge_inputs, llm_client
+from services.inference import run_inference, serving_path
+from services.explain import top_features
+from services.microbatch import MicroBatcher, MICRO_BATCHING
+from services.executor import cpu_executor, ExecutorBusy, INFERENCE_RETRY_AFTER
+from services.registry import ModelRegistry, ModelValidationError, holdout_split
+from services.batch import read_batch_records, validate_records
+from services.reports import report_pool, stream_job_events, ReportQueueFull
+from services.report_cache import report_cache, report_key, screening_key
+from services.metrics import metrics, begin_request, current_timings, mark_parsed, set_model, stage, HTTP_REQUEST_SECONDS, SERVER_TIMING
+from services.audit import audit_log
+from services.drift import drift_monitor
+registry = ModelRegistry()
+batchers = {}
+
+# disease -> (schema, model key)
+BATCH_MODELS = {
+    "diabetes": (DiabetesInput, "diabetes_model"),
+    "heart": (HeartInput, "heart_pipeline"),
+    "parkinsons": (ParkinsonInput, "parkinsons_pipeline"),
+}
+DISEASE_NAMES = {"diabetes": "Diabetes", "heart": "Heart Disease", "parkinsons": "Parkinson's"}
+
+def model_engine(disease):
+    # "auto" (mmapped .forest if present, else pickle), "native" or "sklearn", per model
+    return os.getenv(f"MODEL_ENGINE_{disease.upper()}", os.getenv("MODEL_ENGINE", "auto"))
+
+def model_path(disease, path):
+    # "full" or a compressed variant from services/lite.py ("pruned", "distilled"), per model
+    return serving_path(path, os.getenv(f"MODEL_VARIANT_{disease.upper()}", os.getenv("MODEL_VARIANT", "full")))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 
-    print("Loading models...")
+    print("Loading models in the background...")
+    cpu_executor.start()
+    audit_log.start()
     
     # 1. Diabetes Pipeline
-    with open('models/diabetes_model.pkl', 'rb') as f:
-        ml_models["diabetes_model"] = pickle.load(f)
+    registry.register("diabetes_model", model_path("diabetes", 'models/diabetes_model.pkl'), model_engine("diabetes"), FEATURE_LAYOUTS[DiabetesInput],
+                      partial(holdout_split, "diabetes"))
         
     # 2. Heart Disease  Pipeline 
-    with open('models/heart_pipeline.pkl', 'rb') as f:
-        ml_models["heart_pipeline"] = pickle.load(f)
+    registry.register("heart_pipeline", model_path("heart", 'models/heart_pipeline.pkl'), model_engine("heart"), FEATURE_LAYOUTS[HeartInput],
+                      partial(holdout_split, "heart"))
 
     # Parkinsons Pipeline
-    with open('models/parkinsons_pipeline.pkl', 'rb') as f:
-        ml_models["parkinsons_pipeline"] = pickle.load(f)
-        
-    print("All models loaded successfully.")
+    registry.register("parkinsons_pipeline", model_path("parkinsons", 'models/parkinsons_pipeline.pkl'), model_engine("parkinsons"), FEATURE_LAYOUTS[ParkinsonInput],
+                      partial(holdout_split, "parkinsons"))
+
+    registry.load_all()
+    if MICRO_BATCHING:
+        for key in registry.entries:
+            batchers[key] = MicroBatcher(key)
+            await batchers[key].start()
+    await report_pool.start()
     yield
-    ml_models.clear()
+    await report_pool.stop()
+    for batcher in batchers.values():
+        await batcher.stop()
+    batchers.clear()
+    report_cache.close()
+    registry.shutdown()
+    cpu_executor.shutdown()
+    audit_log.stop()
 
 app = FastAPI(title="Multi-Disease Prediction API", version="2.0", lifespan=lifespan)
 
-def get_risk_level(prob):
-    if prob < 0.3:
-        return "Low"
-    elif prob < 0.7:
-        return "Medium"
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    timings = begin_request()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - timings.start
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route.path if route else "unmatched", status=response.status_code)
+    if SERVER_TIMING and timings.stages:
+        response.headers["Server-Timing"] = f"{timings.server_timing()}, total;dur={elapsed * 1000:.3f}"
+    return response
+
+def respond(result):
+    with stage("serialize"):
+        return JSONResponse(content=jsonable_encoder(result))
+
+def executor_busy():
+    return HTTPException(status_code=503, detail="Inference capacity exhausted, retry later",
+                         headers={"Retry-After": str(INFERENCE_RETRY_AFTER)})
+
+async def offload(fn, loaded, *args):
+    # CPU-bound work runs on its own executor, so blocking I/O on the threadpool can't starve it;
+    # when that executor is full the request is shed instead of queued
+    try:
+        return await cpu_executor.run(fn, loaded, *args)
+    except ExecutorBusy:
+        raise executor_busy()
+
+def score_one(loaded, row):
+    # one forest pass per request: class, probability and risk from one proba vector
+    with stage("infer"):
+        scored = run_inference(loaded.model, row, loaded.meta["risk_thresholds"])[0]
+    return {**scored, "top_features": explain_row(loaded, row)}
+
+def explain_row(loaded, row):
+    with stage("explain"):
+        explained = top_features(loaded.explainer, loaded.model, row)
+    return explained[0] if explained else None
+
+async def predict_one(model_key, loaded, data):
+    with stage("featurize"):
+        row = FEATURE_LAYOUTS[type(data)].to_row(data)
+    batcher = batchers.get(model_key)
+    if batcher is None:
+        scored = await offload(score_one, loaded, row)
     else:
-        return "High"
+        with stage("infer"):
+            try:
+                scored = await batcher.submit(loaded, row)
+            except ExecutorBusy:
+                raise executor_busy()
+        top = await offload(explain_row, loaded, row) if loaded.explainer is not None else None
+        scored = {**scored, "top_features": top}
+    audit_log.record(model_key, loaded, row, [scored], current_timings())
+    drift_monitor.observe(model_key, loaded, row, [scored])
+    return scored
+
+def build_result(scored, loaded, with_model=True):
+    # batch rows leave the model out, it is already on the batch response once
+    result = {
+        "prediction": scored["prediction"],
+        "probability": round(scored["probability"], 3),
+        "risk_level": scored["risk_level"],
+    }
+    if with_model:
+        result["model_version"] = loaded.version
+        result["model_variant"] = loaded.meta.get("variant", "full")
+    if scored.get("top_features") is not None:
+        result["top_features"] = scored["top_features"]
+    return result
+
+async def attach_report(result, disease_name, prediction, probability, input_data, sync_report, top=None):
+    args = (disease_name, prediction, probability, input_data, top)
+    return await _attach(result, sync_report, report_key(*args), generate_health_report, report_pool.submit, args)
+
+async def attach_screening_report(result, findings, input_data, sync_report):
+    args = (findings, input_data)
+    return await _attach(result, sync_report, screening_key(*args), generate_screening_report, report_pool.submit_screening, args)
+
+async def _attach(result, sync_report, key, generate, submit, args):
+    with stage("report"):
+        if sync_report:
+            # the LLM call blocks, so it waits on the I/O threadpool, never on the loop or the inference executor
+            return await run_in_threadpool(sync_report_into, result, key, generate, args)
+        return await queued_report_into(result, submit, args)
+
+def sync_report_into(result, key, generate, args):
+    # sync_report keeps the old behaviour of waiting for Gemini inside the request
+    report, source = report_cache.get(key), "cache"
+    if report is None:
+        report, source = generate(*args)
+        # template reports are cheap and shouldn't mask the LLM once it recovers
+        if source == "llm":
+            report_cache.put(key, report)
+    result["ai_analysis"] = report
+    result["report_source"] = source
+    return result
+
+async def queued_report_into(result, submit, args):
+    try:
+        job = await submit(*args)
+    except ReportQueueFull:
+        raise HTTPException(status_code=503, detail="Report queue is full, retry later", headers={"Retry-After": "1"})
+    result["ai_analysis"] = job.text or None
+    result["report_id"] = job.id
+    result["report_status"] = job.status
+    return result
 
 @app.get("/")
 def home():
     return {"message": "Health AI Prediction Service is Running."}
 
+@app.get("/ready")
+def ready():
+    status = registry.status()
+    if not registry.ready():
+        return JSONResponse(status_code=503, content={"ready": False, "models": status, "llm": llm_client.status()})
+    # the LLM is optional: reports degrade to templates, so it never holds back readiness
+    return {"ready": True, "models": status, "llm": llm_client.status()}
+
 @app.post("/predict/diabetes", tags=["Diabetes"])
-def predict_diabetes(data: DiabetesInput):
-    model = ml_models.get("diabetes_model")
+async def predict_diabetes(data: DiabetesInput, sync_report: bool = False):
+    mark_parsed("diabetes_model")
+    model = registry.get("diabetes_model")
     if not model:
         raise HTTPException(status_code=503, detail="Diabetes model is not available")
   
+    scored = await predict_one("diabetes_model", model, data)
     input_data = data.model_dump()
-    input_df = pd.DataFrame([input_data])
-    
-    prob = model.predict_proba(input_df)[0][1]
-    pred = model.predict(input_df)[0]
-    
-    ai_explanation = generate_health_report(
-        disease_name="Diabetes",
-        prediction=int(pred),
-        probability=prob,
-        input_data=input_data
-    )
-
-    return {
-        "prediction": int(pred),
-        "probability": round(prob, 3),
-        "risk_level": get_risk_level(prob),
-        "ai_analysis": ai_explanation
-    }
+
+    result = await attach_report(build_result(scored, model), "Diabetes", scored["prediction"], scored["probability"], input_data, sync_report, scored["top_features"])
+    return respond(result)
 
 @app.post("/predict/heart", tags=["Heart Disease"])
-def predict_heart(data: HeartInput):
-    pipeline = ml_models.get("heart_pipeline")
+async def predict_heart(data: HeartInput, sync_report: bool = False):
+    mark_parsed("heart_pipeline")
+    pipeline = registry.get("heart_pipeline")
 
     if not pipeline:
         raise HTTPException(status_code=503, detail="Heart model pipeline is not available")
 
+    scored = await predict_one("heart_pipeline", pipeline, data)
     input_data = data.model_dump()
-   
-    input_df = pd.DataFrame([input_data])
-
-    pred = pipeline.predict(input_df)[0]
-    prob = pipeline.predict_proba(input_df)[0][1]
-
-    ai_explanation = generate_health_report(
-        disease_name="Heart Disease",
-        prediction=int(pred),
-        probability=prob,
-        input_data=input_data
-    )
-
-    return {
-        "prediction": int(pred),
-        "probability": round(prob, 3),
-        "risk_level": get_risk_level(prob),
-        "ai_analysis": ai_explanation
-    }
+
+    result = await attach_report(build_result(scored, pipeline), "Heart Disease", scored["prediction"], scored["probability"], input_data, sync_report, scored["top_features"])
+    return respond(result)
 
 @app.post("/predict/parkinsons", tags=["Parkinsons"])
-def predict_parkinsons(data: ParkinsonInput):
-    pipeline = ml_models.get("parkinsons_pipeline")
+async def predict_parkinsons(data: ParkinsonInput, sync_report: bool = False):
+    mark_parsed("parkinsons_pipeline")
+    pipeline = registry.get("parkinsons_pipeline")
     if not pipeline:
         raise HTTPException(status_code=503, detail="Parkinson's model pipeline is not available")
     
     
+    scored = await predict_one("parkinsons_pipeline", pipeline, data)
     input_data = data.model_dump(by_alias=True)
-    input_df  = pd.DataFrame([input_data])
 
-    prob = pipeline.predict_proba(input_df)[0][1]
-    pred = pipeline.predict(input_df)[0]
+    result = await attach_report(build_result(scored, pipeline), "Parkinson's", scored["prediction"], scored["probability"], input_data, sync_report, scored["top_features"])
+    return respond(result)
+
+@app.post("/predict/screen", tags=["Screening"])
+async def predict_screen(data: ScreenInput, sync_report: bool = False):
+    mark_parsed("screen")
+    payloads = {disease: getattr(data, disease) for disease in BATCH_MODELS if getattr(data, disease) is not None}
+    models = {disease: registry.get(BATCH_MODELS[disease][1]) for disease in payloads}
+    missing = [disease for disease, loaded in models.items() if not loaded]
+    if missing:
+        raise HTTPException(status_code=503, detail=f"{', '.join(missing)} model not available")
+
+    # the models score concurrently on the inference executor; one report covers them all
+    scored = await asyncio.gather(*(
+        predict_one(BATCH_MODELS[disease][1], models[disease], payload) for disease, payload in payloads.items()
+    ))
+    results, findings, inputs = {}, [], {}
+    for (disease, payload), item in zip(payloads.items(), scored):
+        results[disease] = build_result(item, models[disease])
+        findings.append({"disease": DISEASE_NAMES[disease], "prediction": item["prediction"],
+                         "probability": item["probability"], "top_features": item["top_features"]})
+        inputs[DISEASE_NAMES[disease]] = payload.model_dump(by_alias=True)
+
+    result = await attach_screening_report({"results": results}, findings, merge_inputs(inputs), sync_report)
+    return respond(result)
+
+@app.get("/metrics", tags=["Monitoring"])
+async def prometheus_metrics():
+    # async so drift sketches are read on the event loop, the only thread that updates them
+    drift_monitor.evaluate()  # refreshes the drift gauges
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/monitoring/drift", tags=["Monitoring"])
+async def drift_report():
+    return drift_monitor.evaluate()
+
+@app.get("/monitoring/alerts", tags=["Monitoring"])
+async def drift_alerts():
+    return {"alerts": drift_monitor.alerts()}
+
+@app.get("/batching/stats", tags=["Batch"])
+def batching_stats():
+    return {"enabled": bool(batchers), "models": {key: b.stats() for key, b in batchers.items()}, "executor": cpu_executor.stats()}
+
+@app.get("/reports/cache/stats", tags=["Reports"])
+def report_cache_stats():
+    return report_cache.snapshot()
+
+@app.get("/reports/{report_id}", tags=["Reports"])
+def get_report(report_id: str):
+    job = report_pool.get(report_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return job.to_dict()
+
+@app.get("/reports/{report_id}/stream", tags=["Reports"])
+async def stream_report(report_id: str):
+    job = report_pool.get(report_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return StreamingResponse(stream_job_events(job), media_type="text/event-stream")
+
+@app.post("/predict/{disease}/batch", tags=["Batch"])
+async def predict_batch(disease: str, request: Request, explain: bool = False):
+    if disease not in BATCH_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown disease '{disease}'")
+    schema, model_key = BATCH_MODELS[disease]
+    loaded = registry.get(model_key)
+    if not loaded:
+        raise HTTPException(status_code=503, detail=f"{disease} model is not available")
+
+    set_model(model_key)
+    with stage("parse"):
+        records = await read_batch_records(request)
+    # validation and scoring are CPU bound, keep them off the event loop
+    result, X, scored_rows = await offload(score_batch, loaded, schema, records, explain)
+    if scored_rows:
+        audit_log.record(model_key, loaded, X, scored_rows, current_timings())
+        drift_monitor.observe(model_key, loaded, X, scored_rows)
+    return respond(result)
+
+def score_batch(loaded, schema, records, explain=False):
+    with stage("validate"):
+        rows, errors = validate_records(schema, records)
+
+    results = [None] * len(records)
+    for i, err in errors.items():
+        results[i] = {"index": i, "error": err}
+
+    X, scored_rows = None, []
+    if rows:
+        # one vectorized pass over every valid row
+        with stage("featurize"):
+            X = FEATURE_LAYOUTS[schema].to_matrix([item for _, item in rows])
+        with stage("infer"):
+            scored_rows = run_inference(loaded.model, X, loaded.meta["risk_thresholds"])
+        if explain:
+            # attributions cost far more than scoring a row, so batches only pay for them on request
+            with stage("explain"):
+                explained = top_features(loaded.explainer, loaded.model, X)
+            if explained:
+                scored_rows = [{**scored, "top_features": top} for scored, top in zip(scored_rows, explained)]
+        for (i, _), scored in zip(rows, scored_rows):
+            results[i] = {"index": i, **build_result(scored, loaded, with_model=False)}
+
+    result = {"count": len(records), "valid": len(rows), "model_version": loaded.version,
+              "model_variant": loaded.meta.get("variant", "full"), "results": results}
+    # the scored matrix goes back too, for the audit log
+    return result, X, scored_rows
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def check_admin(token):
+    # without a configured token the admin endpoints stay closed rather than open to anyone
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+    if token is None or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def admin_model_key(disease):
+    if disease not in BATCH_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown disease '{disease}'")
+    return BATCH_MODELS[disease][1]
 
-    ai_explanation = generate_health_report(
-        disease_name="Parkinson's",
-        prediction=int(pred),
-        probability=prob,
-        input_data=input_data
-    )
+@app.get("/admin/models", tags=["Admin"])
+def list_models(x_admin_token: str = Header(None)):
+    check_admin(x_admin_token)
+    return registry.status()
 
-    return {
-        "prediction": int(pred),
-        "probability": round(prob, 3),
-        "risk_level": get_risk_level(prob),
-        "ai_analysis": ai_explanation
+@app.post("/admin/models/{disease}/reload", tags=["Admin"])
+def reload_model(disease: str, x_admin_token: str = Header(None)):
+    check_admin(x_admin_token)
+    key = admin_model_key(disease)
+    try:
+        loaded = registry.reload(key)
+    except ModelValidationError as e:
+        raise HTTPException(status_code=409, detail=f"New {disease} model rejected: {e}")
+    except Exception as e:
+        # corrupt, truncated or mismatched artifacts; like the watcher, the current version keeps serving
+        raise HTTPException(status_code=422, detail=f"New {disease} model could not be loaded: {type(e).__name__}: {e}")
+    return {"model": key, "version": loaded.version}
 
-    }
\ No newline at end of file
+@app.post("/admin/models/{disease}/rollback", tags=["Admin"])
+def rollback_model(disease: str, x_admin_token: str = Header(None)):
+    check_admin(x_admin_token)
+    key = admin_model_key(disease)
+    try:
+        loaded = registry.rollback(key)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"model": key, "version": loaded.version}
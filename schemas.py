@@ -1,5 +1,8 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Literal
+import operator
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Literal, Optional, get_args, get_origin
 
 #  Diabetes Schema
 class DiabetesInput(BaseModel):
@@ -56,4 +59,114 @@ class ParkinsonInput(BaseModel):
     spread1: float = Field(..., alias="spread1", json_schema_extra={"example": -4.813031})
     spread2: float = Field(..., alias="spread2", json_schema_extra={"example": 0.266482})
     d2: float = Field(..., alias="D2", json_schema_extra={"example": 2.301442})
-    ppe: float = Field(..., alias="PPE", json_schema_extra={"example": 0.284654})
\ No newline at end of file
+    ppe: float = Field(..., alias="PPE", json_schema_extra={"example": 0.284654})
+
+
+# Combined screening: any subset of the three payloads
+class ScreenInput(BaseModel):
+    diabetes: Optional[DiabetesInput] = None
+    heart: Optional[HeartInput] = None
+    parkinsons: Optional[ParkinsonInput] = None
+
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        if self.diabetes is None and self.heart is None and self.parkinsons is None:
+            raise ValueError("Provide at least one of diabetes, heart or parkinsons")
+        return self
+
+
+# Feature layouts: validated inputs -> float64 rows in training-column order
+_BOUNDS = (("ge", operator.ge, ">="), ("gt", operator.gt, ">"), ("le", operator.le, "<="), ("lt", operator.lt, "<"))
+
+
+class FeatureLayout:
+    """Precompiled mapping from a schema instance to a model input row.
+
+    Columns follow the schema's field order, which is the training column
+    order (aliases for Parkinson's). Literal fields are encoded through a
+    lookup table into codes over their sorted values, the same order the
+    fitted OneHotEncoder uses; the registry checks both against the model.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        fields = schema.model_fields
+        self.columns = [field.alias or name for name, field in fields.items()]
+        self.categories = {}
+        self._lookups = []
+        for i, (name, field) in enumerate(fields.items()):
+            if get_origin(field.annotation) is Literal:
+                values = sorted(get_args(field.annotation))
+                self.categories[self.columns[i]] = values
+                self._lookups.append((i, {v: code for code, v in enumerate(values)}))
+        self._get = operator.attrgetter(*fields)
+
+    def to_row(self, item, out=None):
+        values = list(self._get(item))
+        for i, lookup in self._lookups:
+            values[i] = lookup[values[i]]
+        if out is None:
+            return np.array([values], dtype=np.float64)
+        out[:] = values
+        return out
+
+    def to_matrix(self, items):
+        X = np.empty((len(items), len(self.columns)), dtype=np.float64)
+        for row, item in zip(X, items):
+            self.to_row(item, out=row)
+        return X
+
+    def frame_to_matrix(self, df):
+        """Vectorized validate + to_matrix for a DataFrame of raw records.
+
+        Applies the schema's coercions and bounds column by column instead of
+        building a model per row. Returns (X, errors): X has one row per input
+        row (NaN where invalid) and errors is an object array holding None or a
+        "column: reason; ..." string for every row.
+        """
+        n = len(df)
+        X = np.full((n, len(self.columns)), np.nan)
+        errors = np.full(n, "", dtype=object)
+        lookups = dict(self._lookups)
+        for j, (column, field) in enumerate(zip(self.columns, self.schema.model_fields.values())):
+            if column not in df:
+                errors += f"{column}: missing; "
+                continue
+            raw = df[column]
+            missing = raw.isna().to_numpy()
+            if j in lookups:
+                values = raw.map(lookups[j]).to_numpy(dtype=np.float64)
+                checks = [(np.isnan(values) & ~missing, f"must be one of {self.categories[column]}")]
+            else:
+                values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+                checks = [(np.isnan(values) & ~missing, "not a number")]
+                if field.annotation is int:
+                    checks.append((~np.isnan(values) & (values % 1 != 0), "not an integer"))
+                for constraint in field.metadata:
+                    for attr, op, symbol in _BOUNDS:
+                        limit = getattr(constraint, attr, None)
+                        if limit is not None:
+                            checks.append((~op(values, limit) & ~np.isnan(values), f"must be {symbol} {limit}"))
+            checks.append((missing, "missing"))
+            for bad, reason in checks:
+                errors[bad] += f"{column}: {reason}; "
+            X[:, j] = values
+
+        invalid = errors != ""
+        X[invalid] = np.nan
+        errors = np.where(invalid, [e.rstrip("; ") for e in errors], None)
+        return X, errors
+
+    def example_row(self):
+        example = {field.alias or name: field.json_schema_extra["example"] for name, field in self.schema.model_fields.items()}
+        return self.to_row(self.schema.model_validate(example))
+
+    def check(self, model):
+        if list(model.columns) != self.columns:
+            raise ValueError(f"{self.schema.__name__} columns {self.columns} do not match the model's {list(model.columns)}")
+        for col, values in self.categories.items():
+            if list(model.categories.get(col, [])) != values:
+                raise ValueError(f"{self.schema.__name__}.{col} categories {values} do not match the model's")
+
+
+FEATURE_LAYOUTS = {schema: FeatureLayout(schema) for schema in (DiabetesInput, HeartInput, ParkinsonInput)}
@@ -0,0 +1,304 @@
+"""Append-only audit log of every prediction, in fixed-width binary segments.
+
+Each model gets its own directory of segments under AUDIT_LOG_DIR. A segment
+is the magic, a uint64 header length, a JSON header (model, feature columns,
+categories, record dtype) and then packed records: timestamp, model version,
+prediction, probability, request latency so far, inference time and the raw
+model input row (categoricals as codes, see schemas.FeatureLayout). Records
+are fixed width, so a segment maps straight into a NumPy structured array.
+
+    python -m services.audit replay audit/heart_pipeline --model models/heart_pipeline.pkl
+    python -m services.audit dump audit/heart_pipeline/20260101T000000-000001.audit --limit 20
+"""
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import numpy as np
+from services.metrics import AUDIT_DROPPED, AUDIT_RECORDS
+
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR")  # e.g. audit/, unset = no audit log
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "0.2"))  # seconds between buffered writes
+AUDIT_FSYNC_INTERVAL = float(os.getenv("AUDIT_FSYNC_INTERVAL", "1"))  # seconds between fsyncs of written data
+AUDIT_SEGMENT_BYTES = int(os.getenv("AUDIT_SEGMENT_BYTES", str(64 << 20)))
+AUDIT_SEGMENT_SECONDS = float(os.getenv("AUDIT_SEGMENT_SECONDS", "3600"))
+AUDIT_MAX_PENDING = int(os.getenv("AUDIT_MAX_PENDING", "100000"))  # rows buffered before new ones are dropped
+
+MAGIC = b"AUDIT001"
+SUFFIX = ".audit"
+
+
+def record_dtype(n_features):
+    return np.dtype([
+        ("ts", "<f8"),
+        ("version", "S12"),
+        ("prediction", "<i1"),
+        ("probability", "<f8"),
+        ("latency_ms", "<f4"),
+        ("infer_ms", "<f4"),
+        ("features", "<f8", (n_features,)),
+    ])
+
+
+class _Segment:
+    def __init__(self, directory, header, dtype):
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        existing = glob.glob(os.path.join(directory, f"*{SUFFIX}"))
+        self.path = os.path.join(directory, f"{stamp}-{len(existing) + 1:06d}{SUFFIX}")
+        self.dtype = dtype
+        self.opened = time.monotonic()
+        encoded = json.dumps({**header, "dtype": np.lib.format.dtype_to_descr(dtype)}).encode("utf-8")
+        self.f = open(self.path, "xb")
+        self.f.write(MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+        self.size = self.f.tell()
+        self.dirty = True
+
+    def write(self, records):
+        self.f.write(records.tobytes())
+        self.size += records.nbytes
+        self.dirty = True
+
+    def sync(self):
+        if self.dirty:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.dirty = False
+
+    def close(self):
+        self.sync()
+        self.f.close()
+
+
+class AuditLog:
+    """Buffered, asynchronous writer for the audit segments.
+
+    record() only packs the rows into a NumPy record array and appends it to
+    an in-memory buffer, so a request never waits on disk. A background
+    thread writes the buffer every flush_interval, fsyncs written segments
+    at most every fsync_interval, and rotates a segment once it passes
+    segment_bytes or segment_seconds. If the writer falls behind by more
+    than max_pending rows, new rows are dropped and counted rather than
+    slowing requests down.
+    """
+
+    def __init__(self, directory=AUDIT_LOG_DIR, flush_interval=AUDIT_FLUSH_INTERVAL, fsync_interval=AUDIT_FSYNC_INTERVAL,
+                 segment_bytes=AUDIT_SEGMENT_BYTES, segment_seconds=AUDIT_SEGMENT_SECONDS, max_pending=AUDIT_MAX_PENDING):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.max_pending = max_pending
+        self._pending = []
+        self._pending_rows = 0
+        self._headers = {}
+        self._segments = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
+
+    def record(self, model_key, loaded, X, scored, timings=None):
+        """Queue one record per row of X with its scored result; a no-op when the log is off."""
+        if not self.enabled:
+            return
+        X = np.atleast_2d(X)
+        header = self._headers.get(model_key)
+        if header is None:
+            model = loaded.model
+            header = self._headers[model_key] = {
+                "model": model_key,
+                "columns": list(model.columns),
+                "categories": model.categories,
+            }
+        records = np.empty(len(X), dtype=record_dtype(X.shape[1]))
+        records["ts"] = time.time()
+        records["version"] = loaded.version
+        records["prediction"] = [s["prediction"] for s in scored]
+        records["probability"] = [s["probability"] for s in scored]
+        if timings is not None:
+            records["latency_ms"] = (time.perf_counter() - timings.start) * 1000
+            records["infer_ms"] = sum(seconds for stage, seconds in timings.stages if stage == "infer") * 1000
+        else:
+            records["latency_ms"] = records["infer_ms"] = np.nan
+        records["features"] = X
+
+        with self._lock:
+            if self._pending_rows + len(records) > self.max_pending:
+                AUDIT_DROPPED.inc(len(records), model=model_key)
+                return
+            self._pending.append((model_key, records))
+            self._pending_rows += len(records)
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while True:
+            stopping = self._stop.wait(self.flush_interval)
+            self._flush()
+            if stopping or time.monotonic() - last_sync >= self.fsync_interval:
+                for segment in self._segments.values():
+                    segment.sync()
+                last_sync = time.monotonic()
+            if stopping:
+                return
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending, self._pending_rows = self._pending, [], 0
+        batches = {}
+        for model_key, records in pending:
+            batches.setdefault(model_key, []).append(records)
+        for model_key, parts in batches.items():
+            records = np.concatenate(parts)
+            try:
+                self._segment(model_key, records.dtype).write(records)
+            except OSError as e:
+                AUDIT_DROPPED.inc(len(records), model=model_key)
+                print(f"Audit log write for {model_key} failed: {e}")
+                continue
+            AUDIT_RECORDS.inc(len(records), model=model_key)
+
+    def _segment(self, model_key, dtype):
+        segment = self._segments.get(model_key)
+        if segment is not None and (
+            segment.size >= self.segment_bytes
+            or time.monotonic() - segment.opened >= self.segment_seconds
+            or segment.dtype != dtype
+        ):
+            segment.close()
+            segment = None
+        if segment is None:
+            segment = self._segments[model_key] = _Segment(
+                os.path.join(self.directory, model_key), self._headers[model_key], dtype
+            )
+        return segment
+
+
+def read_segment(path):
+    """Map a segment read-only; returns (header, records). A torn record at the end of a crashed segment is ignored."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an audit segment")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    dtype = np.lib.format.descr_to_dtype([tuple(field) for field in header["dtype"]])
+    offset = len(MAGIC) + 8 + header_len
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count == 0:
+        return header, np.empty(0, dtype=dtype)
+    return header, np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+
+
+def segment_paths(path):
+    return sorted(glob.glob(os.path.join(path, f"*{SUFFIX}"))) if os.path.isdir(path) else [path]
+
+
+def replay(paths, model, thresholds, chunk_rows=100000):
+    """Re-score logged rows with a candidate model and compare them against what was served."""
+    from services.inference import risk_levels
+
+    totals = {"rows": 0, "flipped": 0, "risk_changed": 0, "abs_delta_sum": 0.0, "max_abs_delta": 0.0}
+    by_version = {}
+    start = time.perf_counter()
+    for path in paths:
+        header, records = read_segment(path)
+        if list(model.columns) != header["columns"] or any(
+            list(model.categories.get(col, [])) != values for col, values in header["categories"].items()
+        ):
+            raise SystemExit(f"{path}: the candidate model's inputs do not match the logged {header['model']} rows")
+        for i in range(0, len(records), chunk_rows):
+            chunk = records[i:i + chunk_rows]
+            proba = model.predict_proba(np.asarray(chunk["features"]))
+            predictions = model.classes_[proba.argmax(axis=1)]
+            delta = np.abs(proba[:, 1] - chunk["probability"])
+            totals["rows"] += len(chunk)
+            totals["flipped"] += int((predictions != chunk["prediction"]).sum())
+            totals["risk_changed"] += int((risk_levels(proba[:, 1], thresholds) != risk_levels(chunk["probability"], thresholds)).sum())
+            totals["abs_delta_sum"] += float(delta.sum())
+            totals["max_abs_delta"] = max(totals["max_abs_delta"], float(delta.max()))
+            versions, counts = np.unique(chunk["version"], return_counts=True)
+            for version, count in zip(versions, counts):
+                by_version[version.decode()] = by_version.get(version.decode(), 0) + int(count)
+
+    seconds = time.perf_counter() - start
+    rows = totals.pop("rows")
+    return {
+        "rows": rows,
+        "segments": len(paths),
+        "served_versions": by_version,
+        "flipped_predictions": totals["flipped"],
+        "risk_level_changes": totals["risk_changed"],
+        "mean_abs_probability_delta": round(totals["abs_delta_sum"] / rows, 6) if rows else 0.0,
+        "max_abs_probability_delta": round(totals["max_abs_delta"], 6),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds else None,
+    }
+
+
+def dump(path, limit=None):
+    import pandas as pd
+
+    header, records = read_segment(path)
+    records = records[:limit]
+    df = pd.DataFrame(np.asarray(records["features"]), columns=header["columns"])
+    for col, values in header["categories"].items():
+        df[col] = np.asarray(values, dtype=object)[df[col].to_numpy(dtype=int)]
+    for name in ("ts", "version", "prediction", "probability", "latency_ms", "infer_ms"):
+        df.insert(len(df.columns), name, records[name])
+    df["version"] = df["version"].str.decode("ascii")
+    df.to_csv(sys.stdout, index=False)
+
+
+def main():
+    from services.forest import load_model
+    from services.inference import load_model_meta
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="re-score segments against a candidate model")
+    replay_parser.add_argument("path", help="segment file, or a model's segment directory")
+    replay_parser.add_argument("--model", required=True, help="candidate model pickle (its .forest is used if present)")
+    replay_parser.add_argument("--engine", default="auto", choices=["auto", "native", "sklearn"])
+    dump_parser = commands.add_parser("dump", help="print a segment as CSV")
+    dump_parser.add_argument("path")
+    dump_parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    if args.command == "dump":
+        dump(args.path, args.limit)
+        return
+    model = load_model(args.model, args.engine)
+    result = replay(segment_paths(args.path), model, load_model_meta(args.model)["risk_thresholds"])
+    print(json.dumps(result, indent=2))
+
+
+audit_log = AuditLog()
+
+
+if __name__ == "__main__":
+    main()
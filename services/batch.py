@@ -0,0 +1,89 @@
+import io
+import json
+import os
+import pandas as pd
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(16 << 20)))
+
+
+def _too_many_rows(n):
+    return HTTPException(status_code=413, detail=f"Batch of {n} rows exceeds the limit of {MAX_BATCH_SIZE}")
+
+
+async def read_body(request: Request, limit=None):
+    """The request body, refused with a 413 as soon as it is known to exceed limit (MAX_BATCH_BYTES) bytes."""
+    limit = MAX_BATCH_BYTES if limit is None else limit
+    too_large = HTTPException(status_code=413, detail=f"Batch body exceeds the limit of {limit} bytes")
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise too_large
+    # the header may be missing (chunked uploads) or wrong, so the stream is counted too
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+
+async def read_batch_records(request: Request):
+    """Parse a batch body into a list of raw record dicts.
+
+    Accepts a JSON list of records, a columnar JSON object
+    ({"Glucose": [...], "BMI": [...]}) or a CSV body with a header row.
+    """
+    content_type = request.headers.get("content-type", "")
+    body = await read_body(request)
+
+    if "csv" in content_type:
+        try:
+            # one row past the limit is enough to know the batch is too big
+            df = pd.read_csv(io.BytesIO(body), nrows=MAX_BATCH_SIZE + 1)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV body: {e}")
+        if len(df) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds the limit of {MAX_BATCH_SIZE} rows")
+        # NaN cells become None so they show up as per-row validation errors
+        return df.astype(object).where(df.notna(), None).to_dict("records")
+
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if isinstance(payload, dict):
+        return columns_to_records(payload)
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Batch body must be a list of records, a columnar object or CSV")
+    if len(payload) > MAX_BATCH_SIZE:
+        raise _too_many_rows(len(payload))
+    return payload
+
+
+def columns_to_records(columns):
+    lengths = {len(v) for v in columns.values() if isinstance(v, list)}
+    if len(lengths) != 1 or len(columns) != sum(isinstance(v, list) for v in columns.values()):
+        raise HTTPException(status_code=400, detail="Columnar body must map every field to a list of equal length")
+    n = lengths.pop()
+    if n > MAX_BATCH_SIZE:
+        raise _too_many_rows(n)
+    return [{name: values[i] for name, values in columns.items()} for i in range(n)]
+
+
+def validate_records(schema, records):
+    """Validate each record on its own so one bad row doesn't fail the batch.
+
+    Returns (rows, errors): rows is a list of (index, validated model) for
+    valid records and errors maps the index of every invalid record to its errors.
+    """
+    rows, errors = [], {}
+    for i, record in enumerate(records):
+        try:
+            item = schema.model_validate(record)
+        except ValidationError as e:
+            errors[i] = e.errors(include_url=False, include_context=False)
+            continue
+        rows.append((i, item))
+    return rows, errors
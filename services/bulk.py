@@ -0,0 +1,252 @@
+"""Offline scoring of large CSV/Parquet exports with bounded memory.
+
+    python -m services.bulk heart exports/heart.csv scored/heart.csv
+    python -m services.bulk diabetes big.parquet scored.parquet --workers 4 --keep patient_id
+    python -m services.bulk heart exports/heart.csv scored/heart.csv --resume
+
+Input is read CHUNK_SIZE rows at a time, validated and featurized per chunk
+with FeatureLayout.frame_to_matrix and scored in worker processes that each
+load the model once. At most two chunks per worker are in flight, so memory
+does not grow with the file. Every output row carries the input row number,
+any --keep columns, prediction, probability, risk_level and a validation
+error (rows that fail validation are not scored).
+
+Results are written in input order as each chunk finishes: appended to a CSV,
+or as one part file per chunk in a Parquet directory. After every chunk the
+progress is recorded in <output>.progress.json, and --resume continues from
+the last completed chunk, cutting off anything written after it.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from schemas import DiabetesInput, HeartInput, ParkinsonInput, FEATURE_LAYOUTS
+from services.forest import load_model
+from services.inference import load_model_meta, risk_levels
+
+CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "50000"))
+
+# disease -> (schema, model artifact)
+BULK_MODELS = {
+    "diabetes": (DiabetesInput, "models/diabetes_model.pkl"),
+    "heart": (HeartInput, "models/heart_pipeline.pkl"),
+    "parkinsons": (ParkinsonInput, "models/parkinsons_pipeline.pkl"),
+}
+
+_worker = {}
+
+
+def _is_parquet(path):
+    return path.endswith(".parquet") or path.endswith(".pq")
+
+
+def read_chunks(path, chunk_size, skip_rows=0):
+    """Yield DataFrames of at most chunk_size rows, starting after the first skip_rows data rows."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            yield batch.slice(skip_rows).to_pandas()
+            skip_rows = 0
+    else:
+        # skipped rows are still tokenized, but never converted into frames; a callable, because pandas
+        # turns a range into a set of every skipped line number
+        for chunk in pd.read_csv(path, chunksize=chunk_size, skiprows=lambda i: 0 < i <= skip_rows):
+            if len(chunk):  # a fully skipped file still yields one empty frame
+                yield chunk
+
+
+def init_worker(disease, engine):
+    schema, model_path = BULK_MODELS[disease]
+    model = load_model(model_path, engine)
+    layout = FEATURE_LAYOUTS[schema]
+    layout.check(model)
+    _worker.update(model=model, layout=layout, thresholds=load_model_meta(model_path)["risk_thresholds"])
+
+
+def score_chunk(chunk, first_row, keep=()):
+    """Validate, featurize and score one chunk; runs in a worker after init_worker."""
+    model, layout = _worker["model"], _worker["layout"]
+    X, errors = layout.frame_to_matrix(chunk)
+    valid = errors == None  # noqa: E711 - elementwise on an object array
+
+    prediction = pd.array([pd.NA] * len(chunk), dtype="Int64")
+    probability = np.full(len(chunk), np.nan)
+    risk = np.full(len(chunk), None, dtype=object)
+    if valid.any():
+        proba = model.predict_proba(X[valid])
+        prediction[valid] = model.classes_[proba.argmax(axis=1)].astype(np.int64)
+        probability[valid] = proba[:, 1]
+        risk[valid] = risk_levels(proba[:, 1], _worker["thresholds"])
+
+    out = pd.DataFrame({"row": np.arange(first_row, first_row + len(chunk))})
+    for column in keep:
+        out[column] = chunk[column].to_numpy()
+    out["prediction"] = prediction
+    out["probability"] = probability
+    out["risk_level"] = risk
+    out["error"] = errors
+    return out
+
+
+class CSVSink:
+    """Appends chunks to one CSV; the byte offset after each chunk is what a resume truncates back to."""
+
+    def __init__(self, path, offset=None):
+        self.path = path
+        if offset is None:
+            self.f = open(path, "w", newline="")
+            self.header = True
+        else:
+            self.f = open(path, "r+", newline="")
+            self.f.truncate(offset)
+            self.f.seek(offset)
+            self.header = offset == 0
+
+    def write(self, frame, index):
+        frame.to_csv(self.f, header=self.header, index=False)
+        self.header = False
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    """One part file per chunk in a directory, renamed into place once complete."""
+
+    def __init__(self, path, chunks_done=None):
+        self.path = path
+        if chunks_done is None:
+            shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            # parts past the recorded progress (or half-written ones) are redone
+            if not name.startswith("part-") or not name.endswith(".parquet") or int(name[5:10]) >= (chunks_done or 0):
+                os.remove(os.path.join(path, name))
+
+    def write(self, frame, index):
+        part = os.path.join(self.path, f"part-{index:05d}.parquet")
+        frame.to_parquet(part + ".tmp", index=False)
+        os.replace(part + ".tmp", part)
+        return None
+
+    def close(self):
+        pass
+
+
+def progress_path(output):
+    return output.rstrip("/") + ".progress.json"
+
+
+def _input_identity(path):
+    stat = os.stat(path)
+    return {"input": os.path.abspath(path), "input_size": stat.st_size, "input_mtime": int(stat.st_mtime)}
+
+
+def load_progress(output, job):
+    """The saved progress for this exact job, or None when there is nothing to resume."""
+    path = progress_path(output)
+    if not os.path.exists(path) or not os.path.exists(output):
+        return None
+    with open(path) as f:
+        progress = json.load(f)
+    mismatched = [key for key, value in job.items() if progress.get(key) != value]
+    if mismatched:
+        raise SystemExit(f"Cannot resume {output}: {', '.join(mismatched)} changed since the last run")
+    return progress
+
+
+def save_progress(output, progress):
+    path = progress_path(output)
+    with open(path + ".tmp", "w") as f:
+        json.dump(progress, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def score_file(disease, input_path, output, chunk_size=CHUNK_SIZE, workers=1, engine="auto", keep=(), resume=False):
+    job = {"disease": disease, "chunk_size": chunk_size, "keep": list(keep), **_input_identity(input_path)}
+    progress = load_progress(output, job) if resume else None
+    if progress is None:
+        progress = {**job, "chunks": 0, "rows": 0, "invalid": 0, "offset": 0, "done": False}
+    elif progress["done"]:
+        print(f"{output} is already complete ({progress['rows']} rows)")
+        return progress
+
+    out_dir = os.path.dirname(output.rstrip("/"))
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    resuming = progress["chunks"] > 0
+    if _is_parquet(output):
+        sink = ParquetSink(output, progress["chunks"] if resuming else None)
+    else:
+        sink = CSVSink(output, progress["offset"] if resuming else None)
+    if resuming:
+        print(f"Resuming {output} after {progress['rows']} rows")
+
+    start, rows_at_start = time.perf_counter(), progress["rows"]
+    chunks = read_chunks(input_path, chunk_size, progress["rows"])
+
+    def commit(frame):
+        progress["offset"] = sink.write(frame, progress["chunks"])
+        progress["chunks"] += 1
+        progress["rows"] += len(frame)
+        progress["invalid"] += int(frame["error"].notna().sum())
+        save_progress(output, progress)
+
+    try:
+        if workers == 1:
+            init_worker(disease, engine)
+            first_row = progress["rows"]
+            for chunk in chunks:
+                commit(score_chunk(chunk, first_row, keep))
+                first_row += len(chunk)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(disease, engine)) as pool:
+                pending, first_row = deque(), progress["rows"]
+                for chunk in chunks:
+                    pending.append(pool.submit(score_chunk, chunk, first_row, keep))
+                    first_row += len(chunk)
+                    # bounded read-ahead; results are committed strictly in input order
+                    while len(pending) >= 2 * workers:
+                        commit(pending.popleft().result())
+                while pending:
+                    commit(pending.popleft().result())
+    finally:
+        sink.close()
+
+    progress["done"] = True
+    save_progress(output, progress)
+    seconds = time.perf_counter() - start
+    scored = progress["rows"] - rows_at_start
+    print(f"Scored {scored} rows ({progress['invalid']} invalid in total) into {output} "
+          f"in {seconds:.1f}s, {scored / max(seconds, 1e-9):,.0f} rows/s")
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("disease", choices=list(BULK_MODELS))
+    parser.add_argument("input", help="CSV file, or .parquet/.pq file")
+    parser.add_argument("output", help="CSV file, or .parquet directory of part files")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="scoring processes (1 scores inline)")
+    parser.add_argument("--engine", default=os.getenv("MODEL_ENGINE", "auto"), choices=["auto", "native", "sklearn"])
+    parser.add_argument("--keep", action="append", default=[], help="input column to copy to the output (repeatable)")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run instead of starting over")
+    args = parser.parse_args()
+    score_file(args.disease, args.input, args.output, args.chunk_size, args.workers, args.engine, args.keep, args.resume)
+
+
+if __name__ == "__main__":
+    main()
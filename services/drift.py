@@ -0,0 +1,287 @@
+"""Streaming feature-drift and prediction-calibration monitor.
+
+Reference statistics are computed at training time from the training rows
+(features) and the held-out predictions (probabilities) and stored in the
+model's .meta.json under "drift_reference". For models trained before that:
+
+    python -m services.drift reference            # backfill every model's meta
+    python -m services.drift reference heart
+
+At serving time every scored row updates fixed-size sketches: per feature
+a histogram over the reference percentile edges plus running sums for
+mean and variance, per categorical feature a count per category, and a
+histogram of predicted probabilities. Updates and evaluations happen on
+the event loop only (the monitoring endpoints are async), so they need no
+lock; each server process keeps its own sketches.
+Sketches cover the last one to two windows of DRIFT_WINDOW rows. Once a
+window fills, the one before it is dropped, so old traffic ages out.
+"""
+import bisect
+import math
+import os
+import sys
+import numpy as np
+from services.metrics import DRIFT_KS, DRIFT_PSI
+
+DRIFT_WINDOW = int(os.getenv("DRIFT_WINDOW", "5000"))
+DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "200"))
+DRIFT_PSI_WARN = float(os.getenv("DRIFT_PSI_WARN", "0.1"))
+DRIFT_PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.25"))
+DRIFT_KS_ALERT = float(os.getenv("DRIFT_KS_ALERT", "0.15"))  # also has to clear the 99% two-sample critical value
+REFERENCE_QUANTILES = 100
+PROBABILITY_BINS = 10
+PSI_EPSILON = 1e-4
+
+
+def _numeric_reference(values):
+    values = np.sort(values[~np.isnan(values)])
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, REFERENCE_QUANTILES + 1)[1:-1]))
+    return {
+        "kind": "numeric",
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "edges": edges.tolist(),
+        # fraction of reference rows <= each edge; bins are (edges[k-1], edges[k]]
+        "cdf": (np.searchsorted(values, edges, side="right") / len(values)).tolist(),
+    }
+
+
+def build_reference(model, X, proba):
+    """Reference stats for a model from its raw training rows X (FeatureLayout encoding) and held-out probabilities."""
+    X = np.asarray(X, dtype=np.float64)
+    features = {}
+    for j, column in enumerate(model.columns):
+        categories = model.categories.get(column)
+        if categories is None:
+            features[column] = _numeric_reference(X[:, j])
+        else:
+            counts = np.bincount(X[:, j].astype(np.int64), minlength=len(categories))[:len(categories)]
+            features[column] = {"kind": "categorical", "categories": list(categories), "proportions": (counts / counts.sum()).tolist()}
+    edges = np.linspace(0, 1, PROBABILITY_BINS + 1)[1:-1]
+    counts = np.bincount(np.searchsorted(edges, proba, side="left"), minlength=PROBABILITY_BINS)
+    return {
+        "rows": len(X),
+        "features": features,
+        "probability": {"edges": edges.tolist(), "proportions": (counts / counts.sum()).tolist(), "mean": float(np.mean(proba))},
+    }
+
+
+def reference_for(pipeline, X_train, X_test):
+    """drift_reference for a fitted pipeline: features from the training split, probabilities from the test split."""
+    from services.forest import SklearnEngine
+
+    engine = SklearnEngine(pipeline)
+    return build_reference(engine, engine.encode_frame(X_train), engine.predict_proba(engine.encode_frame(X_test))[:, 1])
+
+
+def psi(expected, actual):
+    expected = np.maximum(np.asarray(expected, dtype=np.float64), PSI_EPSILON)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _decile_groups(cdf):
+    # fine percentile bins are regrouped into ~10 reference-mass bins for PSI, which is noisy on small bins
+    groups = [0] + [k + 1 for k in range(len(cdf)) if k + 1 < len(cdf) and int(cdf[k] * 10) != int(cdf[k + 1] * 10)]
+    return np.asarray(groups + [len(cdf) + 1])
+
+
+class _Feature:
+    def __init__(self, reference):
+        self.kind = reference["kind"]
+        if self.kind == "numeric":
+            self.edges = list(reference["edges"])
+            self.edges_array = np.asarray(self.edges)
+            self.ref_cdf = np.asarray(reference["cdf"])
+            self.ref_mass = np.diff(np.concatenate([[0.0], self.ref_cdf, [1.0]]))
+            self.groups = _decile_groups(reference["cdf"])
+            self.ref_mean, self.ref_std = reference["mean"], reference["std"]
+            self.bins = len(self.edges) + 1
+        else:
+            self.categories = reference["categories"]
+            self.ref_mass = np.asarray(reference["proportions"])
+            self.bins = len(self.categories)
+
+
+class _Window:
+    def __init__(self, n_features, bins):
+        self.rows = 0
+        self.sums = np.zeros(n_features)
+        self.squares = np.zeros(n_features)
+        self.counts = [np.zeros(b, dtype=np.int64) for b in bins]
+        self.probability = np.zeros(PROBABILITY_BINS, dtype=np.int64)
+
+
+class ModelSketch:
+    """The sketches of one model version against its reference."""
+
+    def __init__(self, version, columns, reference, window=DRIFT_WINDOW):
+        self.version = version
+        self.columns = list(columns)
+        self.reference = reference
+        self.window = window
+        self.features = [_Feature(reference["features"][c]) for c in self.columns]
+        self.prob_edges = list(reference["probability"]["edges"])
+        self.prob_mass = np.asarray(reference["probability"]["proportions"])
+        self.prob_mean = reference["probability"]["mean"]
+        self.previous = None
+        self.current = self._new_window()
+
+    def _new_window(self):
+        return _Window(len(self.features), [f.bins for f in self.features])
+
+    def update(self, X, proba):
+        w = self.current
+        if len(X) == 1:
+            # the common case: scalar bisects beat per-feature NumPy calls on a single row
+            row = X[0]
+            for j, (f, x) in enumerate(zip(self.features, row.tolist())):
+                if f.kind == "numeric":
+                    w.counts[j][bisect.bisect_left(f.edges, x)] += 1
+                else:
+                    w.counts[j][int(x)] += 1
+            w.sums += row
+            w.squares += row * row
+            w.probability[bisect.bisect_left(self.prob_edges, proba[0])] += 1
+        else:
+            for j, f in enumerate(self.features):
+                column = X[:, j]
+                if f.kind == "numeric":
+                    w.counts[j] += np.bincount(np.searchsorted(f.edges_array, column, side="left"), minlength=f.bins)
+                else:
+                    w.counts[j] += np.bincount(column.astype(np.int64), minlength=f.bins)[:f.bins]
+            w.sums += X.sum(axis=0)
+            w.squares += np.square(X).sum(axis=0)
+            w.probability += np.bincount(np.searchsorted(self.prob_edges, proba, side="left"), minlength=PROBABILITY_BINS)
+        w.rows += len(X)
+        if w.rows >= self.window:
+            self.previous, self.current = self.current, self._new_window()
+
+    def evaluate(self, model_key=""):
+        windows = [w for w in (self.previous, self.current) if w is not None]
+        n = sum(w.rows for w in windows)
+        sums = sum(w.sums for w in windows)
+        squares = sum(w.squares for w in windows)
+        features, alerts = {}, []
+        for j, (column, f) in enumerate(zip(self.columns, self.features)):
+            counts = sum(w.counts[j] for w in windows)
+            stats = {"kind": f.kind}
+            if n:
+                share = counts / n
+                if f.kind == "numeric":
+                    mean = sums[j] / n
+                    stats.update(
+                        mean=round(float(mean), 4),
+                        std=round(math.sqrt(max(0.0, squares[j] / n - mean * mean)), 4),
+                        reference_mean=round(f.ref_mean, 4),
+                        reference_std=round(f.ref_std, 4),
+                        psi=round(psi(np.add.reduceat(f.ref_mass, f.groups[:-1]), np.add.reduceat(share, f.groups[:-1])), 4),
+                    )
+                    # KS on the binned CDFs, evaluated at every reference percentile edge
+                    live_cdf = np.cumsum(share)[:-1]
+                    stats["ks"] = round(float(np.max(np.abs(live_cdf - f.ref_cdf))) if len(f.ref_cdf) else 0.0, 4)
+                    DRIFT_KS.set(stats["ks"], model=model_key, feature=column)
+                else:
+                    stats.update(
+                        distribution=dict(zip(f.categories, np.round(share, 4).tolist())),
+                        reference=dict(zip(f.categories, np.round(f.ref_mass, 4).tolist())),
+                        psi=round(psi(f.ref_mass, share), 4),
+                    )
+                DRIFT_PSI.set(stats["psi"], model=model_key, feature=column)
+                stats["status"] = self._status(stats, n)
+                if stats["status"] != "ok":
+                    alerts.append({"model": model_key, "feature": column, "status": stats["status"],
+                                   "psi": stats["psi"], "ks": stats.get("ks")})
+            features[column] = stats
+
+        prediction = {"reference_mean_probability": round(self.prob_mean, 4)}
+        if n:
+            counts = sum(w.probability for w in windows)
+            prediction.update(
+                mean_probability=round(float(np.dot(counts, np.linspace(0.05, 0.95, PROBABILITY_BINS)) / n), 4),
+                psi=round(psi(self.prob_mass, counts / n), 4),
+            )
+            DRIFT_PSI.set(prediction["psi"], model=model_key, feature="__probability__")
+            prediction["status"] = self._status(prediction, n)
+            if prediction["status"] != "ok":
+                alerts.append({"model": model_key, "feature": "predicted_probability", "status": prediction["status"],
+                               "psi": prediction["psi"], "ks": None})
+        return {"version": self.version, "samples": n, "reference_rows": self.reference["rows"],
+                "features": features, "prediction": prediction, "alerts": alerts}
+
+    def _status(self, stats, n):
+        if n < DRIFT_MIN_SAMPLES:
+            return "ok"
+        ks = stats.get("ks")
+        # two-sample KS critical value at alpha = 0.01
+        critical = 1.628 * math.sqrt((n + self.reference["rows"]) / (n * self.reference["rows"]))
+        if stats["psi"] >= DRIFT_PSI_ALERT or (ks is not None and ks >= max(DRIFT_KS_ALERT, critical)):
+            return "alert"
+        if stats["psi"] >= DRIFT_PSI_WARN:
+            return "warn"
+        return "ok"
+
+
+class DriftMonitor:
+    """Per-model sketches, rebuilt whenever a new model version starts serving."""
+
+    def __init__(self, window=DRIFT_WINDOW):
+        self.window = window
+        self.models = {}
+
+    def observe(self, model_key, loaded, X, scored):
+        sketch = self.models.get(model_key)
+        if sketch is None or sketch.version != loaded.version:
+            reference = loaded.meta.get("drift_reference")
+            sketch = self.models[model_key] = (
+                ModelSketch(loaded.version, loaded.model.columns, reference, self.window) if reference else _NoReference(loaded.version)
+            )
+        if isinstance(sketch, _NoReference):
+            return
+        sketch.update(np.atleast_2d(X), [s["probability"] for s in scored])
+
+    def evaluate(self):
+        # a snapshot, so a model seen for the first time mid-evaluation can't break the iteration
+        return {key: sketch.evaluate(key) for key, sketch in list(self.models.items())}
+
+    def alerts(self):
+        return [alert for report in self.evaluate().values() for alert in report["alerts"]]
+
+
+class _NoReference:
+    def __init__(self, version):
+        self.version = version
+
+    def evaluate(self, model_key=""):
+        return {"version": self.version, "samples": 0, "alerts": [],
+                "error": "no drift_reference in the model's meta; run python -m services.drift reference"}
+
+
+def write_reference(name):
+    """Backfill drift_reference into an existing model's meta from its training split."""
+    import pickle
+    from services.inference import load_model_meta, save_model_meta
+    from services.training import TRAINING_CONFIGS, load_dataset, split_dataset
+
+    config = TRAINING_CONFIGS[name]
+    with open(config["model_path"], "rb") as f:
+        pipeline = pickle.load(f)
+    df, _ = load_dataset(config["data_path"])
+    X_train, X_test, _, _ = split_dataset(config, df)
+    reference = reference_for(pipeline, X_train, X_test)
+    meta = load_model_meta(config["model_path"])
+    meta["drift_reference"] = reference
+    save_model_meta(config["model_path"], **meta)
+    print(f"{name}: reference from {reference['rows']} training rows written to its meta")
+
+
+drift_monitor = DriftMonitor()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["reference"]:
+        sys.exit(__doc__)
+    from services.training import TRAINING_CONFIGS
+
+    for name in sys.argv[2:] or TRAINING_CONFIGS:
+        write_reference(name)
@@ -0,0 +1,154 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from services.metrics import EXECUTOR_INFLIGHT, EXECUTOR_REJECTIONS, begin_request, current_timings
+
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")  # thread | process
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "1"))  # seconds, sent with 503s
+WORKER_MODEL_CACHE = 8
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class _ModelNotCached(Exception):
+    pass
+
+
+def _run_collecting(fn, submitted, args):
+    # stages are collected, not observed, here; the caller adds them to its own request
+    waited = time.monotonic() - submitted
+    timings = begin_request(observe=False)
+    return fn(*args), waited, timings.stages
+
+
+_worker_models = OrderedDict()
+
+
+def _process_call(fn, version, source, payload, submitted, args):
+    """Runs in a worker process; each version is opened once, from its artifact or a pickled snapshot, and kept."""
+    loaded = _worker_models.get(version)
+    if loaded is None:
+        if payload is not None:
+            loaded = pickle.loads(payload)
+        elif source is not None:
+            from services.registry import open_snapshot
+
+            # mapping the artifact shares its pages with the server and the other workers
+            loaded = open_snapshot(*source)
+            if loaded.version != version:
+                # the file has moved on since (a hot reload, or a rollback to an older snapshot)
+                raise _ModelNotCached()
+        else:
+            raise _ModelNotCached()
+        _worker_models[version] = loaded
+        while len(_worker_models) > WORKER_MODEL_CACHE:
+            _worker_models.popitem(last=False)
+    _worker_models.move_to_end(version)
+    return _run_collecting(fn, submitted, (loaded, *args))
+
+
+class InferenceExecutor:
+    """A separately sized pool for CPU-bound scoring, so it never queues behind blocking I/O.
+
+    run(fn, loaded, *args) calls fn(loaded, *args) on a worker and is awaited
+    from the event loop. At most workers + queue_size calls are admitted at
+    once; beyond that run() raises ExecutorBusy straight away instead of
+    letting latency pile up. Stage timings recorded by fn are carried back to
+    the calling request, together with the time the call spent queued.
+
+    In "process" mode a worker opens a model version itself the first time it
+    needs it, from the artifact path (a .forest is mmapped, so its pages are
+    shared rather than copied per worker), and keeps it by version. Only when
+    the file on disk no longer holds that version is the snapshot pickled over.
+    """
+
+    def __init__(self, kind=INFERENCE_EXECUTOR, workers=INFERENCE_WORKERS, queue_size=INFERENCE_QUEUE_SIZE):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"INFERENCE_EXECUTOR must be 'thread' or 'process', not {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.inflight = 0
+        self.rejected = 0
+        self._pool = None
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.kind == "process":
+            # forkserver children start clean instead of inheriting the server's threads and event loop
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            # workers spawn on demand; start them now rather than on the first requests
+            for _ in range(self.workers):
+                self._pool.submit(int)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._payloads.clear()
+
+    async def run(self, fn, loaded, *args):
+        with self._lock:
+            if self.inflight >= self.capacity:
+                self.rejected += 1
+                EXECUTOR_REJECTIONS.inc()
+                raise ExecutorBusy()
+            self.inflight += 1
+            EXECUTOR_INFLIGHT.set(self.inflight)
+        try:
+            if self.kind == "process":
+                result, waited, stages = await self._run_in_process(fn, loaded, args)
+            else:
+                loop = asyncio.get_running_loop()
+                context = contextvars.copy_context()
+                result, waited, stages = await loop.run_in_executor(
+                    self._pool, context.run, _run_collecting, fn, time.monotonic(), (loaded, *args)
+                )
+        finally:
+            with self._lock:
+                self.inflight -= 1
+                EXECUTOR_INFLIGHT.set(self.inflight)
+
+        timings = current_timings()
+        if timings is not None:
+            timings.add("queue", waited)
+            for name, seconds in stages:
+                timings.add(name, seconds)
+        return result
+
+    async def _run_in_process(self, fn, loaded, args):
+        loop = asyncio.get_running_loop()
+        source = (loaded.path, loaded.engine) if getattr(loaded, "path", None) else None
+        try:
+            return await loop.run_in_executor(self._pool, _process_call, fn, loaded.version, source, None, time.monotonic(), args)
+        except _ModelNotCached:
+            pass
+        payload = self._payloads.get(loaded.version)
+        if payload is None:
+            payload = pickle.dumps(loaded, protocol=pickle.HIGHEST_PROTOCOL)
+            # a handful of recent versions is enough: old snapshots stop being served after a swap
+            if len(self._payloads) >= WORKER_MODEL_CACHE:
+                self._payloads.pop(next(iter(self._payloads)))
+            self._payloads[loaded.version] = payload
+        return await loop.run_in_executor(self._pool, _process_call, fn, loaded.version, None, payload, time.monotonic(), args)
+
+    def stats(self):
+        return {"kind": self.kind, "workers": self.workers, "capacity": self.capacity,
+                "inflight": self.inflight, "rejected": self.rejected}
+
+
+cpu_executor = InferenceExecutor()
@@ -0,0 +1,141 @@
+import os
+import numpy as np
+from services.forest import ForestEngine, SklearnEngine, _export_trees
+
+EXPLAIN_TOP_K = int(os.getenv("EXPLAIN_TOP_K", "3"))  # 0 turns explanations off
+# upper bound on the (rows, leaves, depth, quadrature) temporaries of one explain step
+EXPLAIN_CHUNK_ELEMENTS = int(os.getenv("EXPLAIN_CHUNK_ELEMENTS", "4000000"))
+
+
+def _leaf_paths(feature, threshold, children, cover, roots):
+    """Walk every tree once and describe the path to each leaf.
+
+    Splits on the same feature are merged, so a path is a dict
+    feature -> (lo, hi, z): the leaf is reachable for lo < x <= hi, and z is
+    the fraction of training cover that follows the path at that feature.
+    """
+    paths = []
+    for root in roots:
+        stack = [(int(root), {})]
+        while stack:
+            node, path = stack.pop()
+            right, left = children[node]
+            if left == node:
+                paths.append((node, path))
+                continue
+            f, thr = int(feature[node]), float(threshold[node])
+            for child, is_left in ((int(left), True), (int(right), False)):
+                lo, hi, z = path.get(f, (-np.inf, np.inf, 1.0))
+                if is_left:
+                    hi = min(hi, thr)
+                else:
+                    lo = max(lo, thr)
+                stack.append((child, {**path, f: (lo, hi, z * cover[child] / cover[node])}))
+    return paths
+
+
+class _PathGroup:
+    """All leaves whose path has the same number m of distinct features, packed for vectorized scoring.
+
+    Arrays are laid out (m, [Q,] leaves) so the product over path features
+    runs over contiguous rows of leaves, and since o_j is 0 or 1 both possible
+    factors z_j + t (o_j - z_j) are precomputed at every quadrature node.
+    """
+
+    def __init__(self, paths, values, source):
+        m = len(paths[0])
+        self.feature = np.array([list(p) for p in paths], dtype=np.intp).T
+        bounds = np.array([list(p.values()) for p in paths], dtype=np.float64).reshape(len(paths), m, 3)
+        self.lo, self.hi = bounds[..., 0].T.copy(), bounds[..., 1].T.copy()
+        self.z = bounds[..., 2].T.astype(np.float32)
+        self.value = np.asarray(values, dtype=np.float32)
+        # the integrand is a polynomial of degree m - 1, which ceil(m / 2) Gauss-Legendre points integrate exactly
+        t, w = np.polynomial.legendre.leggauss((m + 1) // 2)
+        t, self.w = ((t + 1) / 2).astype(np.float32), (w / 2).astype(np.float32)
+        z = self.z[:, None, :]
+        self.factor_out = z * (1 - t)[:, None]
+        self.factor_gap = z + t[:, None] * (1 - z) - self.factor_out
+        # contributions are summed straight into raw input columns
+        self.source = source[self.feature]
+        self.cells = self.factor_out.size
+
+
+class ForestExplainer:
+    """Exact path-dependent TreeSHAP for the positive class, vectorized over leaves.
+
+    For one leaf with value v and distinct path features j (cover ratio z_j,
+    o_j = 1 if x satisfies the path's conditions on j), the Shapley value of
+    feature i is
+
+        v * (o_i - z_i) * integral_0^1 prod_{j != i} (z_j + t (o_j - z_j)) dt
+
+    which equals the usual TreeSHAP subset weighting. Paths are extracted
+    once per loaded model, so explaining a row is a few array operations per
+    path length. Attributions are in probability units, per raw input column,
+    with one-hot columns summed back into their categorical field; together
+    with base_value they add up to the predicted probability.
+    """
+
+    def __init__(self, feature, threshold, children, value, cover, roots, source, columns, positive=1):
+        self.columns = list(columns)
+        n_trees = len(roots)
+        paths = _leaf_paths(feature, threshold, children, cover, roots)
+        leaf_values = value[:, positive].astype(np.float64) / n_trees
+
+        self.base_value = 0.0
+        by_length = {}
+        for leaf, path in paths:
+            z = np.prod([p[2] for p in path.values()]) if path else 1.0
+            self.base_value += leaf_values[leaf] * z
+            if path:
+                by_length.setdefault(len(path), []).append((leaf, path))
+        self.groups = [
+            _PathGroup([path for _, path in group], np.array([leaf_values[leaf] for leaf, _ in group]), source)
+            for _, group in sorted(by_length.items())
+        ]
+
+    @classmethod
+    def for_model(cls, model):
+        """Build from a serving engine, or return None for a model that isn't a forest engine."""
+        if isinstance(model, ForestEngine):
+            trees = model
+            arrays = (trees.feature, trees.threshold, trees.children, trees.value, trees.cover, trees.roots)
+        elif isinstance(model, SklearnEngine):
+            trees, _ = _export_trees(model.classifier)
+            arrays = tuple(trees[name] for name in ("feature", "threshold", "children", "value", "cover", "roots"))
+        else:
+            return None
+        return cls(*arrays, source=model.pre_source, columns=model.columns)
+
+    def shap_values(self, Xt):
+        """Attributions for already transformed rows, shape (n_rows, n_columns)."""
+        X = np.asarray(Xt, dtype=np.float64)
+        n_columns = len(self.columns)
+        phi = np.zeros(X.shape[0] * n_columns)
+        for g in self.groups:
+            step = max(1, EXPLAIN_CHUNK_ELEMENTS // g.cells)
+            for start in range(0, X.shape[0], step):
+                x = X[start:start + step][:, g.feature]
+                inside = ((x > g.lo) & (x <= g.hi)).astype(np.float32)
+                factors = g.factor_out + inside[:, :, None, :] * g.factor_gap
+                # cover ratios are > 0 and Gauss nodes lie inside (0, 1), so no factor is ever zero
+                others = factors.prod(axis=1, keepdims=True) / factors
+                contrib = g.value * (inside - g.z) * np.einsum("rmql,q->rml", others, g.w)
+                cells = ((np.arange(start, start + len(x)) * n_columns)[:, None, None] + g.source).ravel()
+                phi += np.bincount(cells, weights=contrib.ravel(), minlength=len(phi))
+        return phi.reshape(X.shape[0], n_columns)
+
+    def explain(self, model, X):
+        return self.shap_values(model.transform(X))
+
+
+def top_features(explainer, model, X, k=EXPLAIN_TOP_K):
+    """The k largest attributions (by magnitude) for every row of X, or None when explanations are off."""
+    if explainer is None or k <= 0:
+        return None
+    phi = explainer.explain(model, X)
+    order = np.argsort(-np.abs(phi), axis=1, kind="stable")[:, :k]
+    return [
+        [{"feature": explainer.columns[j], "contribution": round(float(row[j]), 4)} for j in top]
+        for row, top in zip(phi, order)
+    ]
@@ -0,0 +1,342 @@
+import json
+import os
+import pickle
+import struct
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+# Output column kinds of the exported preprocessing step
+NUMERIC, ONE_HOT = 0, 1
+
+# .forest file layout: magic, uint64 header length, JSON header, then every
+# array 64-byte aligned so it can be viewed straight out of a read-only mmap
+MAGIC = b"FOREST01"
+ALIGN = 64
+
+
+def forest_path(pickle_path):
+    return os.path.splitext(pickle_path)[0] + ".forest"
+
+
+def write_forest_file(path, arrays, meta):
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    header = json.dumps({"meta": meta, "arrays": layout}).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    # write to a temp file and rename so workers that have the old file mapped never see a partial write
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_forest_file(path):
+    """Map a .forest file read-only and return (arrays, meta) as zero-copy views.
+
+    Every worker process mapping the same file shares its physical pages
+    through the OS page cache, and pages are only read when first touched.
+    """
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(mm[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a forest artifact")
+    (header_len,) = struct.unpack("<Q", bytes(mm[len(MAGIC):len(MAGIC) + 8]))
+    header_end = len(MAGIC) + 8 + header_len
+    header = json.loads(bytes(mm[len(MAGIC) + 8:header_end]).decode("utf-8"))
+    data_start = -(-header_end // ALIGN) * ALIGN
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        arrays[name] = np.ndarray(
+            tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=mm, offset=data_start + spec["offset"]
+        )
+    return arrays, header["meta"]
+
+
+def _split_model(model):
+    """Return (preprocessor, classifier, input columns) for a bare forest or a Pipeline."""
+    if hasattr(model, "named_steps"):
+        steps = list(model.named_steps.values())
+        preprocessor = steps[0] if len(steps) > 1 else None
+        classifier = steps[-1]
+    else:
+        preprocessor, classifier = None, model
+    columns = [str(c) for c in getattr(model, "feature_names_in_", [])]
+    if not columns:
+        columns = [f"x{i}" for i in range(classifier.n_features_in_)]
+    return preprocessor, classifier, columns
+
+
+def _scaler_params(scaler, n):
+    mean = np.zeros(n) if getattr(scaler, "mean_", None) is None else scaler.mean_
+    scale = np.ones(n) if getattr(scaler, "scale_", None) is None else scaler.scale_
+    return mean, scale
+
+
+def _export_preprocessing(preprocessor, columns):
+    """Flatten the fitted scaler / ColumnTransformer into per-output-column arrays.
+
+    Every transformed column j is source[j] of the raw input, either scaled
+    ((x - mean) / scale) or one-hot (x == code) where categorical inputs are
+    passed as integer codes into categories[column].
+    """
+    kind, source, mean, scale, code = [], [], [], [], []
+    categories = {}
+
+    def numeric(cols, m, s):
+        for col, mu, sd in zip(cols, m, s):
+            kind.append(NUMERIC); source.append(columns.index(col)); mean.append(mu); scale.append(sd); code.append(-1)
+
+    if preprocessor is None:
+        numeric(columns, np.zeros(len(columns)), np.ones(len(columns)))
+    elif hasattr(preprocessor, "transformers_"):
+        for name, transformer, cols in preprocessor.transformers_:
+            cols = [columns[c] if isinstance(c, (int, np.integer)) else str(c) for c in cols]
+            if transformer == "drop" or not cols:
+                continue
+            if transformer == "passthrough":
+                numeric(cols, np.zeros(len(cols)), np.ones(len(cols)))
+            elif hasattr(transformer, "categories_"):
+                if getattr(transformer, "drop_idx_", None) is not None:
+                    raise ValueError(f"OneHotEncoder '{name}' with drop= is not supported")
+                for col, cats in zip(cols, transformer.categories_):
+                    categories[col] = [c.item() if hasattr(c, "item") else c for c in cats]
+                    for i in range(len(cats)):
+                        kind.append(ONE_HOT); source.append(columns.index(col)); mean.append(0.0); scale.append(1.0); code.append(i)
+            elif hasattr(transformer, "scale_") or hasattr(transformer, "mean_"):
+                numeric(cols, *_scaler_params(transformer, len(cols)))
+            else:
+                raise ValueError(f"Cannot export transformer '{name}' ({type(transformer).__name__})")
+    elif hasattr(preprocessor, "scale_") or hasattr(preprocessor, "mean_"):
+        numeric(columns, *_scaler_params(preprocessor, len(columns)))
+    else:
+        raise ValueError(f"Cannot export preprocessor {type(preprocessor).__name__}")
+
+    arrays = {
+        "pre_kind": np.asarray(kind, dtype=np.int8),
+        "pre_source": np.asarray(source, dtype=np.int32),
+        "pre_mean": np.asarray(mean, dtype=np.float64),
+        "pre_scale": np.asarray(scale, dtype=np.float64),
+        "pre_code": np.asarray(code, dtype=np.float64),
+    }
+    return arrays, categories
+
+
+def _float32_thresholds(threshold):
+    # inputs reach the trees as float32, and x <= t holds exactly when x <= the largest float32 not above t
+    rounded = threshold.astype(np.float32)
+    above = rounded > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _export_trees(classifier, compact=False):
+    """Pack every tree into flat node arrays with global child indices.
+
+    Leaves point to themselves so a fixed number of traversal steps is safe,
+    and leaf values are stored already normalised to class probabilities.
+    children[i] is (right, left) so a traversal step is children[i, x <= threshold];
+    cover is the training weight reaching every node, used by the explainer.
+
+    compact stores thresholds as float32 (decisions unchanged), indices as
+    int32 and leaf values as float16, less than half the bytes per node.
+    """
+    features, thresholds, lefts, rights, values, covers, roots = [], [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in classifier.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        own = np.arange(n) + offset
+        is_leaf = tree.children_left == -1
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+        rights.append(np.where(is_leaf, own, tree.children_right + offset))
+        value = tree.value[:, 0, :].astype(np.float64)
+        total = value.sum(axis=1, keepdims=True)
+        total[total == 0.0] = 1.0
+        values.append(value / total)
+        covers.append(tree.weighted_n_node_samples)
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    if compact:
+        return {
+            "feature": np.concatenate(features).astype(np.int32),
+            "threshold": _float32_thresholds(np.concatenate(thresholds)),
+            "children": np.stack([np.concatenate(rights), np.concatenate(lefts)], axis=1).astype(np.int32),
+            "value": np.concatenate(values).astype(np.float16),
+            "cover": np.concatenate(covers).astype(np.float32),
+            "roots": np.asarray(roots, dtype=np.int64),
+        }, max_depth
+    # intp-sized indices so traversal can gather straight from the mapped file without converting
+    return {
+        "feature": np.concatenate(features).astype(np.int64),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children": np.stack([np.concatenate(rights), np.concatenate(lefts)], axis=1).astype(np.int64),
+        "value": np.concatenate(values),
+        "cover": np.concatenate(covers).astype(np.float64),
+        "roots": np.asarray(roots, dtype=np.int64),
+    }, max_depth
+
+
+def export_forest(model, path, compact=False):
+    """Write a fitted forest (bare or inside a Pipeline) as packed NumPy arrays."""
+    preprocessor, classifier, columns = _split_model(model)
+    pre_arrays, categories = _export_preprocessing(preprocessor, columns)
+    tree_arrays, max_depth = _export_trees(classifier, compact)
+    meta = {
+        "columns": columns,
+        "categories": categories,
+        "classes": [c.item() if hasattr(c, "item") else c for c in classifier.classes_],
+        "n_features": int(classifier.n_features_in_),
+        "max_depth": int(max_depth),
+    }
+    write_forest_file(path, {**pre_arrays, **tree_arrays}, meta)
+    return path
+
+
+class _RawInputModel:
+    """Shared input side of both engines.
+
+    Models take a raw float64 array in training-column order with categorical
+    values passed as codes into categories[column] (see schemas.FeatureLayout);
+    a DataFrame with the training columns is still accepted and encoded first.
+    """
+
+    def _init_inputs(self, columns, categories, pre_arrays):
+        self.columns = columns
+        self.categories = categories
+        for name, array in pre_arrays.items():
+            setattr(self, name, array)
+        self._category_codes = {col: {c: i for i, c in enumerate(cats)} for col, cats in categories.items()}
+
+    def encode_frame(self, df):
+        X = np.empty((len(df), len(self.columns)), dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            codes = self._category_codes.get(col)
+            if codes is None:
+                X[:, j] = df[col].to_numpy(dtype=np.float64)
+            else:
+                X[:, j] = [codes.get(v, -1) for v in df[col]]
+        return X
+
+    def transform(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = self.encode_frame(X)
+        raw = np.asarray(X, dtype=np.float64)[:, self.pre_source]
+        scaled = (raw - self.pre_mean) / self.pre_scale
+        one_hot = (raw == self.pre_code).astype(np.float64)
+        # sklearn's trees compare float32 features against float64 thresholds
+        return np.where(self.pre_kind == ONE_HOT, one_hot, scaled).astype(np.float32)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class ForestEngine(_RawInputModel):
+    """Vectorized traversal of an exported forest.
+
+    Mirrors the sklearn surface the API uses (classes_, predict, predict_proba).
+    """
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.classes_ = np.asarray(meta["classes"])
+        self.max_depth = meta["max_depth"]
+        pre_arrays = {name: array for name, array in arrays.items() if name.startswith("pre_")}
+        self._init_inputs(meta["columns"], meta["categories"], pre_arrays)
+        for name, array in arrays.items():
+            if not name.startswith("pre_"):
+                setattr(self, name, array)
+        self._children_flat = self.children.reshape(-1)
+        self.n_trees = len(self.roots)
+
+    @classmethod
+    def load(cls, path):
+        return cls(*read_forest_file(path))
+
+    def apply(self, Xt):
+        """Leaf index (global) reached in every tree, shape (n_rows, n_trees)."""
+        n_rows, n_features = Xt.shape
+        flat = np.ascontiguousarray(Xt).reshape(-1)
+        row_offset = (np.arange(n_rows) * n_features)[:, None]
+        idx = np.tile(self.roots, (n_rows, 1))
+        for _ in range(self.max_depth):
+            go_left = flat[row_offset + self.feature[idx]] <= self.threshold[idx]
+            idx = self._children_flat[2 * idx + go_left]
+        return idx
+
+    def predict_proba(self, X):
+        leaves = self.apply(self.transform(X))
+        proba = self.value[leaves].sum(axis=1, dtype=np.float64)
+        if self.value.dtype == np.float16:
+            # compact leaves are only normalised to float16 precision, rows are rescaled to sum to 1
+            return proba / proba.sum(axis=1, keepdims=True)
+        return proba / self.n_trees
+
+
+class SklearnEngine(_RawInputModel):
+    """The pickled sklearn forest behind the same raw-array input as ForestEngine.
+
+    Preprocessing is replayed in NumPy from the fitted scaler/encoder, so the
+    classifier gets a transformed array and no DataFrame is ever built.
+    """
+
+    def __init__(self, model):
+        preprocessor, classifier, columns = _split_model(model)
+        pre_arrays, categories = _export_preprocessing(preprocessor, columns)
+        self._init_inputs(columns, categories, pre_arrays)
+        self.pipeline = model
+        self.classifier = classifier
+        self.classes_ = classifier.classes_
+        # a bare forest fitted on a DataFrame would warn on every array call; names are checked by the layout instead
+        if preprocessor is None and hasattr(classifier, "feature_names_in_"):
+            del classifier.feature_names_in_
+
+    def predict_proba(self, X):
+        return self.classifier.predict_proba(self.transform(X))
+
+
+_unpickle_lock = threading.Lock()
+
+
+def load_model(pickle_path, engine="auto"):
+    """Load a model for serving with the requested engine.
+
+    "native" and "auto" map the exported .forest file next to the pickle and
+    fall back to the pickled sklearn model when it is missing or unreadable;
+    "sklearn" always unpickles.
+    """
+    if engine in ("native", "auto"):
+        path = forest_path(pickle_path)
+        if os.path.exists(path):
+            try:
+                return ForestEngine.load(path)
+            except (ValueError, OSError) as e:
+                print(f"Could not map {path} ({e}), falling back to sklearn")
+        elif engine == "native":
+            print(f"No exported forest at {path}, falling back to sklearn")
+    # unpickling imports sklearn lazily, and first imports racing in parallel loads can fail half-initialized
+    with _unpickle_lock, open(pickle_path, "rb") as f:
+        model = pickle.load(f)
+    return SklearnEngine(model)
+
+
+if __name__ == "__main__":
+    # python -m services.forest models/heart_pipeline.pkl ...
+    for pickle_path in sys.argv[1:]:
+        with open(pickle_path, "rb") as f:
+            model = pickle.load(f)
+        print(f"Exported {export_forest(model, forest_path(pickle_path))}")
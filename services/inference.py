@@ -0,0 +1,77 @@
+import json
+import os
+import numpy as np
+
+RISK_THRESHOLDS = (0.3, 0.7)
+VARIANTS = ("pruned", "distilled")  # compressed models built by services/lite.py
+
+
+def meta_path(pickle_path):
+    return os.path.splitext(pickle_path)[0] + ".meta.json"
+
+
+def variant_path(pickle_path, variant):
+    if variant == "full":
+        return pickle_path
+    base, ext = os.path.splitext(pickle_path)
+    return f"{base}.{variant}{ext}"
+
+
+def serving_path(pickle_path, variant):
+    """The pickle to serve for a variant, or the full model's when that variant hasn't been built."""
+    if variant != "full" and variant not in VARIANTS:
+        raise ValueError(f"Unknown model variant {variant!r}, expected full or one of {', '.join(VARIANTS)}")
+    path = variant_path(pickle_path, variant)
+    if not os.path.exists(path):
+        print(f"No {variant} variant at {path}, serving the full model")
+        return pickle_path
+    return path
+
+
+def save_model_meta(pickle_path, risk_thresholds, **extra):
+    """Write the serving metadata that travels with a model artifact; serving reads the risk thresholds from it."""
+    meta = {"risk_thresholds": list(risk_thresholds), **extra}
+    with open(meta_path(pickle_path), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_model_meta(pickle_path):
+    # artifacts from before the meta file existed get the old fixed thresholds
+    meta = {"risk_thresholds": list(RISK_THRESHOLDS)}
+    path = meta_path(pickle_path)
+    if os.path.exists(path):
+        with open(path) as f:
+            meta.update(json.load(f))
+    return meta
+
+
+def get_risk_level(prob, thresholds=RISK_THRESHOLDS):
+    low, high = thresholds
+    if prob < low:
+        return "Low"
+    elif prob < high:
+        return "Medium"
+    else:
+        return "High"
+
+
+def risk_levels(probs, thresholds=RISK_THRESHOLDS):
+    """Vectorized get_risk_level over an array of probabilities."""
+    low, high = thresholds
+    return np.where(probs < low, "Low", np.where(probs < high, "Medium", "High"))
+
+
+def run_inference(model, X, thresholds=RISK_THRESHOLDS):
+    """Score every row of X with a single predict_proba call.
+
+    The predicted class is the argmax of the probability vector, which is
+    exactly what the forest's predict() does, so the trees are walked once.
+    Returns one dict per row with prediction, raw probability and risk level.
+    """
+    proba = model.predict_proba(X)
+    preds = model.classes_[proba.argmax(axis=1)]
+    return [
+        {"prediction": int(pred), "probability": prob, "risk_level": get_risk_level(prob, thresholds)}
+        for pred, prob in zip(preds, proba[:, 1])
+    ]
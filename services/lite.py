@@ -0,0 +1,246 @@
+"""Compressed "lite" variants of the trained models for small CPU-only hosts.
+
+    python -m services.training --lite                 # train, then build every variant
+    python -m services.lite heart                      # variants of the current artifacts
+    python -m services.lite diabetes --variants pruned --trees 15
+
+pruned     LITE_TREES trees of the full forest, picked greedily so that their
+           average stays closest to the full forest's probabilities on the
+           training split. The trees keep their full depth, and traversal
+           takes one step per level of the deepest tree, so this only saves
+           memory and per-row work on large batches, not single-row latency.
+distilled  a small, shallow forest trained on the full model's predictions
+           for the training rows plus jittered copies of them; smaller and
+           faster per row.
+
+Both are written next to the full model as a pickle, a compact .forest
+(float32 thresholds, int32 indices, float16 leaves) and a meta file, e.g.
+models/heart_pipeline.pruned.{pkl,forest,meta.json}. The meta records
+test-split accuracy and F1 with their deltas from the full model, how far
+the probabilities moved, the artifact size and the single-row latency. The
+same numbers are logged to MLflow. A variant whose test-split accuracy or F1
+drops more than LITE_MAX_ACCURACY_DROP / LITE_MAX_F1_DROP below the full
+model's is not written, and any earlier artifacts of it are removed, so
+serving falls back to the full model.
+
+Serve a variant with MODEL_VARIANT=pruned, or per disease with
+MODEL_VARIANT_DIABETES=distilled. "full" is the default.
+"""
+import argparse
+import copy
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from services.drift import reference_for
+from services.forest import ForestEngine, _split_model, export_forest, forest_path
+from services.inference import VARIANTS, load_model_meta, meta_path, save_model_meta, variant_path
+from services.training import (
+    MLFLOW_TRACKING_URI, TRAINING_CONFIGS, build_pipeline, file_hash, load_dataset, split_dataset,
+)
+from services.tuning import engine_latency
+
+LITE_TREES = int(os.getenv("LITE_TREES", "25"))
+LITE_MAX_ACCURACY_DROP = float(os.getenv("LITE_MAX_ACCURACY_DROP", "0.03"))
+LITE_MAX_F1_DROP = float(os.getenv("LITE_MAX_F1_DROP", "0.03"))
+DISTILL_PARAMS = {"n_estimators": 10, "max_depth": 6, "min_samples_leaf": 2, "random_state": 42}
+DISTILL_COPIES = 4  # jittered copies of every training row the student also learns from
+DISTILL_NOISE = 0.1  # jitter, as a fraction of each numeric column's standard deviation
+SAVES = {"pruned": ["memory"], "distilled": ["memory", "latency"]}  # recorded in the meta, see the module docstring
+
+
+class VariantRejected(Exception):
+    pass
+
+
+def _transformed(pipeline, X):
+    preprocessor, _, _ = _split_model(pipeline)
+    Xt = preprocessor.transform(X) if preprocessor is not None else X.to_numpy()
+    return np.asarray(Xt, dtype=np.float32)
+
+
+def prune_forest(pipeline, X, n_trees=LITE_TREES):
+    """A copy of the pipeline keeping the n_trees trees that best reproduce the full forest on X."""
+    _, classifier, _ = _split_model(pipeline)
+    Xt = _transformed(pipeline, X)
+    per_tree = np.stack([tree.predict_proba(Xt)[:, 1] for tree in classifier.estimators_])
+    target = per_tree.mean(axis=0)
+
+    # forward selection: each step adds the tree that brings the running average closest to the target
+    remaining, chosen, total = list(range(len(per_tree))), [], np.zeros_like(target)
+    for k in range(min(n_trees, len(per_tree))):
+        errors = np.square((total + per_tree[remaining]) / (k + 1) - target).mean(axis=1)
+        best = remaining.pop(int(errors.argmin()))
+        chosen.append(best)
+        total += per_tree[best]
+
+    pruned = copy.deepcopy(pipeline)
+    _, pruned_classifier, _ = _split_model(pruned)
+    pruned_classifier.estimators_ = [pruned_classifier.estimators_[i] for i in sorted(chosen)]
+    pruned_classifier.n_estimators = len(chosen)
+    return pruned
+
+
+def distill(config, teacher, X_train, params=DISTILL_PARAMS, copies=DISTILL_COPIES, seed=0):
+    """A small forest fitted on the teacher's labels for X_train and jittered copies of it."""
+    rng = np.random.default_rng(seed)
+    numeric = [c for c in X_train.columns if X_train[c].dtype.kind in "biuf"]
+    jittered = X_train.iloc[rng.integers(0, len(X_train), len(X_train) * copies)].reset_index(drop=True)
+    noise = rng.normal(size=(len(jittered), len(numeric))) * X_train[numeric].std().to_numpy() * DISTILL_NOISE
+    jittered[numeric] = jittered[numeric].to_numpy(dtype=np.float64) + noise
+    X = pd.concat([X_train.astype({c: np.float64 for c in numeric}), jittered], ignore_index=True)
+
+    student = build_pipeline(config, n_jobs=-1, params=params)
+    student.fit(X, teacher.predict(X))
+    student.named_steps["classifier"].n_jobs = None
+    return student
+
+
+def variant_params(variant, n_trees=LITE_TREES):
+    return {"trees": n_trees} if variant == "pruned" else dict(DISTILL_PARAMS)
+
+
+def _scores(y_true, proba, classes):
+    from sklearn.metrics import accuracy_score, f1_score
+
+    predicted = classes[proba.argmax(axis=1)]
+    return predicted, {"accuracy": accuracy_score(y_true, predicted), "f1_score": f1_score(y_true, predicted)}
+
+
+def build_variant(name, variant, pipeline, X_train, X_test, y_test, full, n_trees=LITE_TREES,
+                  max_accuracy_drop=LITE_MAX_ACCURACY_DROP, max_f1_drop=LITE_MAX_F1_DROP):
+    """Fit one variant, write its artifacts and return the metrics recorded in its meta.
+
+    Raises VariantRejected, writing nothing, when it falls past the accuracy or F1 floor.
+    """
+    config = TRAINING_CONFIGS[name]
+    lite = prune_forest(pipeline, X_train, n_trees) if variant == "pruned" else distill(config, pipeline, X_train)
+
+    path = variant_path(config["model_path"], variant)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(path) or ".") as tmp:
+        # measured from a scratch export, so a rejected variant never reaches the models directory
+        tmp_forest = export_forest(lite, os.path.join(tmp, "lite.forest"), compact=True)
+        engine = ForestEngine.load(tmp_forest)
+        rows = engine.encode_frame(X_test)
+        proba = engine.predict_proba(rows)
+        predicted, scores = _scores(y_test, proba, engine.classes_)
+        delta = np.abs(proba[:, 1] - full["proba"][:, 1])
+        metrics = {
+            **scores,
+            "accuracy_delta": scores["accuracy"] - full["accuracy"],
+            "f1_delta": scores["f1_score"] - full["f1_score"],
+            "agreement": float((predicted == full["predicted"]).mean()),
+            "mean_abs_probability_delta": float(delta.mean()),
+            "max_abs_probability_delta": float(delta.max()),
+            "trees": engine.n_trees,
+            "nodes": len(engine.feature),
+            "max_depth": engine.max_depth,
+            "forest_bytes": os.path.getsize(tmp_forest),
+            "latency_ms": engine_latency(engine, rows),
+        }
+        del engine
+        metrics = {k: round(v, 6) if isinstance(v, float) else v for k, v in metrics.items()}
+        if metrics["accuracy_delta"] < -max_accuracy_drop or metrics["f1_delta"] < -max_f1_drop:
+            raise VariantRejected(f"accuracy {metrics['accuracy_delta']:+.4f}, f1 {metrics['f1_delta']:+.4f} "
+                                  f"(floor -{max_accuracy_drop}, -{max_f1_drop})")
+
+        with open(path, "wb") as f:
+            pickle.dump(lite, f)
+        shutil.move(tmp_forest, forest_path(path))
+    save_model_meta(path, load_model_meta(config["model_path"])["risk_thresholds"], variant=variant,
+                    base_model=config["model_path"], base_hash=full["hash"], variant_params=variant_params(variant, n_trees),
+                    saves=SAVES[variant], metrics=metrics, drift_reference=reference_for(lite, X_train, X_test))
+    return metrics
+
+
+def remove_variant(model_path, variant):
+    path = variant_path(model_path, variant)
+    for artifact in (path, forest_path(path), meta_path(path)):
+        if os.path.exists(artifact):
+            os.remove(artifact)
+
+
+def build_variants(name, variants=VARIANTS, n_trees=LITE_TREES, force=False, use_mlflow=True,
+                   max_accuracy_drop=LITE_MAX_ACCURACY_DROP, max_f1_drop=LITE_MAX_F1_DROP):
+    """Build the lite variants of one trained model; a variant already built from the same full model is skipped."""
+    config = TRAINING_CONFIGS[name]
+    model_path = config["model_path"]
+    base_hash = file_hash(model_path)[:16]
+    with open(model_path, "rb") as f:
+        pipeline = pickle.load(f)
+    df, _ = load_dataset(config["data_path"])
+    X_train, X_test, _, y_test = split_dataset(config, df)
+
+    # the full model is measured the same way: exported to a .forest and scored on the native engine
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = ForestEngine.load(export_forest(pipeline, os.path.join(tmp, "full.forest")))
+        rows = engine.encode_frame(X_test)
+        proba = engine.predict_proba(rows)
+        predicted, scores = _scores(y_test, proba, engine.classes_)
+        full = {**scores, "proba": proba, "predicted": predicted, "hash": base_hash, "trees": engine.n_trees,
+                "forest_bytes": os.path.getsize(os.path.join(tmp, "full.forest")), "latency_ms": engine_latency(engine, rows)}
+        del engine
+
+    results = []
+    for variant in variants:
+        meta = load_model_meta(variant_path(model_path, variant))
+        if not force and meta.get("base_hash") == base_hash and meta.get("variant_params") == variant_params(variant, n_trees):
+            print(f"{name:<12}{variant:<10}skipped, already built from this model")
+            continue
+        try:
+            metrics = build_variant(name, variant, pipeline, X_train, X_test, y_test, full, n_trees,
+                                    max_accuracy_drop, max_f1_drop)
+        except VariantRejected as e:
+            # an older build of the variant would otherwise keep serving in place of this model
+            remove_variant(model_path, variant)
+            print(f"{name:<12}{variant:<10}rejected, {e}; serving falls back to the full model")
+            continue
+        if use_mlflow:
+            log_variant(config, variant, variant_params(variant, n_trees), metrics, full)
+        print(f"{name:<12}{variant:<10}{metrics['trees']:>4} trees  {metrics['forest_bytes'] / 1024:>8.0f} KiB "
+              f"(full {full['forest_bytes'] / 1024:.0f})  {metrics['latency_ms']:.3f}ms (full {full['latency_ms']:.3f})  "
+              f"acc {metrics['accuracy_delta']:+.4f}  f1 {metrics['f1_delta']:+.4f}")
+        results.append({"model": name, "variant": variant, **metrics})
+    return results
+
+
+def log_variant(config, variant, params, metrics, full):
+    import mlflow
+
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    mlflow.set_experiment(config["experiment"])
+    with mlflow.start_run(run_name=f"lite-{variant}"):
+        mlflow.log_params({"variant": variant, **params})
+        mlflow.log_metrics({**metrics, "full_accuracy": full["accuracy"], "full_f1_score": full["f1_score"],
+                            "full_forest_bytes": full["forest_bytes"], "full_latency_ms": full["latency_ms"]})
+        mlflow.log_artifact(forest_path(variant_path(config["model_path"], variant)))
+
+
+def build_all(names=None, variants=VARIANTS, n_trees=LITE_TREES, force=False, use_mlflow=True,
+              max_accuracy_drop=LITE_MAX_ACCURACY_DROP, max_f1_drop=LITE_MAX_F1_DROP):
+    return [
+        result for name in (names or TRAINING_CONFIGS)
+        for result in build_variants(name, variants, n_trees, force, use_mlflow, max_accuracy_drop, max_f1_drop)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="*", help=f"any of {', '.join(TRAINING_CONFIGS)} (default: all)")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument("--trees", type=int, default=LITE_TREES, help="trees kept by the pruned variant")
+    parser.add_argument("--force", action="store_true", help="rebuild even when the full model hasn't changed")
+    parser.add_argument("--max-accuracy-drop", type=float, default=LITE_MAX_ACCURACY_DROP)
+    parser.add_argument("--max-f1-drop", type=float, default=LITE_MAX_F1_DROP)
+    parser.add_argument("--no-mlflow", action="store_true", help="skip experiment tracking")
+    args = parser.parse_args()
+    unknown = set(args.models) - set(TRAINING_CONFIGS)
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(sorted(unknown))}")
+    build_all(args.models, args.variants, args.trees, args.force, not args.no_mlflow, args.max_accuracy_drop, args.max_f1_drop)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,44 @@
-from google import genai
 from dotenv import load_dotenv
 import os
+import random
+import threading
+import time
+from services.metrics import LLM_BREAKER_STATE, LLM_ERRORS, LLM_FALLBACKS, LLM_REQUEST_SECONDS
 
 load_dotenv()
 
-api_key = os.getenv("GEMINI_API_KEY")
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")  # gemini | http | template
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://127.0.0.1:8089")  # http provider only
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "15"))  # seconds per report, retries included
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.25"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "2"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
 
-if not api_key:
-    raise RuntimeError("GEMINI_API_KEY not found in environment.")
 
-client = genai.Client(api_key=api_key)
+class LLMUnavailable(Exception):
+    def __init__(self, reason, detail=""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
 
-def generate_health_report(disease_name, prediction, probability, input_data):
+
+def format_drivers(top_features):
+    return ", ".join(f"{f['feature']} ({f['contribution']:+.3f})" for f in top_features)
+
+
+def build_prompt(disease_name, prediction, probability, input_data, top_features=None):
     risk_status = "HIGH RISK" if prediction == 1 else "Low Risk"
+    drivers = f"\n    Main drivers (SHAP, + raises risk): {format_drivers(top_features)}" if top_features else ""
 
-    prompt = f"""
+    return f"""
     ML result for {disease_name}:
     Prediction: {risk_status}
     Probability: {probability:.2%}
-    Data: {input_data}
+    Data: {input_data}{drivers}
 
     Explain simply. Mention 1–2 risk factors.
     Give 2 lifestyle tips.
@@ -26,16 +46,390 @@ def generate_health_report(disease_name, prediction, probability, input_data):
     Under 100 words.
     """
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt
+
+LIFESTYLE_TIPS = {
+    "Diabetes": ("Keep refined sugar and processed carbohydrates low", "Aim for 150 minutes of moderate exercise a week"),
+    "Heart Disease": ("Cut back on salt and saturated fat", "Stay active and avoid smoking"),
+    "Parkinson's": ("Keep up regular aerobic and balance exercise", "Follow up with a neurologist about any tremor or speech changes"),
+}
+DEFAULT_TIPS = ("Eat a balanced diet", "Exercise regularly and sleep well")
+
+
+def template_report(disease_name, prediction, probability, input_data, top_features=None):
+    """Deterministic report built from the prediction alone, served when the LLM can't answer in time."""
+    risk_status = "a HIGH RISK" if prediction == 1 else "a low risk"
+    first, second = LIFESTYLE_TIPS.get(disease_name, DEFAULT_TIPS)
+    drivers = ""
+    if top_features:
+        raising = [f["feature"] for f in top_features if f["contribution"] > 0]
+        lowering = [f["feature"] for f in top_features if f["contribution"] < 0]
+        if raising:
+            drivers += f" The values that raised the estimate most: {', '.join(raising)}."
+        if lowering:
+            drivers += f" Values that lowered it: {', '.join(lowering)}."
+    return (
+        f"The screening model estimates {risk_status} of {disease_name} "
+        f"(probability {probability:.0%}) based on the values you entered.{drivers} "
+        f"Tips: 1) {first}. 2) {second}. "
+        "This is an automated estimate, not a diagnosis; please consult a doctor about your results."
+    )
+
+
+def merge_inputs(inputs):
+    """One dict of patient data for several diseases: fields shared between
+    payloads (Age in diabetes and heart) appear once; a shared field that was
+    entered differently is kept per disease as "<field> (<disease>)"."""
+    merged, conflicts = {}, set()
+    for disease_name, data in inputs.items():
+        for field, value in data.items():
+            if field in merged and merged[field] != value:
+                conflicts.add(field)
+            merged.setdefault(field, value)
+    for field in conflicts:
+        del merged[field]
+        for disease_name, data in inputs.items():
+            if field in data:
+                merged[f"{field} ({disease_name})"] = data[field]
+    return merged
+
+
+def build_screening_prompt(findings, input_data):
+    lines = []
+    for f in findings:
+        risk_status = "HIGH RISK" if f["prediction"] == 1 else "Low Risk"
+        drivers = f"; drivers: {format_drivers(f['top_features'])}" if f.get("top_features") else ""
+        lines.append(f"- {f['disease']}: {risk_status}, probability {f['probability']:.2%}{drivers}")
+    results = "\n    ".join(lines)
+
+    return f"""
+    ML screening results (SHAP drivers, + raises risk):
+    {results}
+    Data: {input_data}
+
+    Write one combined summary for all conditions, explained simply.
+    Mention the 1–3 most important risk factors overall.
+    Give 2–3 lifestyle tips that help across these conditions.
+    Add medical disclaimer.
+    Under 150 words.
+    """
+
+
+def template_screening_report(findings, input_data):
+    """Template counterpart of build_screening_prompt: one paragraph per condition, tips and disclaimer once."""
+    parts, tips = [], []
+    for f in findings:
+        report = template_report(f["disease"], f["prediction"], f["probability"], input_data, f.get("top_features"))
+        parts.append(report.split(" Tips: ")[0])
+        tips.extend(t for t in LIFESTYLE_TIPS.get(f["disease"], DEFAULT_TIPS) if t not in tips)
+    numbered = " ".join(f"{i}) {tip}." for i, tip in enumerate(tips[:3], 1))
+    return (
+        " ".join(parts) + f" Tips: {numbered} "
+        "This is an automated estimate, not a diagnosis; please consult a doctor about your results."
+    )
+
+
+class GeminiProvider:
+    def __init__(self, model=LLM_MODEL, pool_size=LLM_POOL_SIZE):
+        from google import genai
+        from google.genai import types
+        import httpx
+
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise LLMUnavailable("unconfigured", "GEMINI_API_KEY not found in environment")
+        self.model = model
+        self.types = types
+        # one client, one keep-alive pool shared by every report worker
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                client_args={"limits": httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)}
+            ),
         )
+
+    def _config(self, timeout):
+        return self.types.GenerateContentConfig(http_options=self.types.HttpOptions(timeout=int(timeout * 1000)))
+
+    def generate(self, prompt, timeout):
+        response = self.client.models.generate_content(model=self.model, contents=prompt, config=self._config(timeout))
         return response.text
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return f"LLM ERROR: {str(e)}"
-    
+    def stream(self, prompt, timeout):
+        for chunk in self.client.models.generate_content_stream(model=self.model, contents=prompt, config=self._config(timeout)):
+            if chunk.text:
+                yield chunk.text
+
+
+class HTTPProvider:
+    """Plain HTTP provider for self-hosted models and the fake server in benchmarks/fake_llm.py.
+
+    POST {base_url}/generate with {"model", "prompt", "stream"}; answers
+    {"text": ...}, or the raw text in chunks when stream is true.
+    """
+
+    def __init__(self, base_url=LLM_BASE_URL, model=LLM_MODEL, pool_size=LLM_POOL_SIZE):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = base_url.rstrip("/") + "/generate"
+        self.model = model
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def generate(self, prompt, timeout):
+        response = self.session.post(self.url, json={"model": self.model, "prompt": prompt, "stream": False}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()["text"]
+
+    def stream(self, prompt, timeout):
+        with self.session.post(
+            self.url, json={"model": self.model, "prompt": prompt, "stream": True}, timeout=timeout, stream=True
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+
+
+class TemplateProvider:
+    """No network at all: every report is the template one. Handy offline and in benchmarks."""
+
+    def generate(self, prompt, timeout):
+        raise LLMUnavailable("disabled")
+
+    def stream(self, prompt, timeout):
+        raise LLMUnavailable("disabled")
+
+
+PROVIDERS = {"gemini": GeminiProvider, "http": HTTPProvider, "template": TemplateProvider}
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and sheds calls for `cooldown` seconds,
+    then lets a single probe through (half-open) to decide whether to close again."""
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self._set("half_open")
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def rejecting(self):
+        # cheap check before queueing for a slot; allow() still has the final say
+        return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self._set("open")
+
+    def _set(self, state):
+        self.state = state
+        LLM_BREAKER_STATE.set({"closed": 0, "half_open": 1, "open": 2}[state])
+
+
+def _retryable(e):
+    if isinstance(e, LLMUnavailable):
+        return False
+    status = getattr(e, "code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    # bad requests and auth errors fail the same way every time
+    return not (isinstance(status, int) and 400 <= status < 500 and status not in (408, 429))
+
+
+class LLMClient:
+    """Shared entry point for report generation.
+
+    The provider is built lazily on first use, so the app starts without
+    credentials or network. Every call gets a deadline that covers queueing
+    for a concurrency slot and all retries; when the deadline passes, the
+    breaker is open or the provider keeps failing, callers get the template
+    report instead of an error.
+    """
+
+    def __init__(self, provider=LLM_PROVIDER, max_concurrency=LLM_MAX_CONCURRENCY, deadline=LLM_DEADLINE,
+                 retries=LLM_RETRIES, breaker=None):
+        self.provider_name = provider
+        self.deadline = deadline
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._provider = None
+        self._provider_error = None
+        self._lock = threading.Lock()
+
+    def provider(self):
+        if self._provider is None and self._provider_error is None:
+            with self._lock:
+                if self._provider is None and self._provider_error is None:
+                    try:
+                        self._provider = PROVIDERS[self.provider_name]()
+                    except LLMUnavailable as e:
+                        self._provider_error = e
+                    except Exception as e:
+                        self._provider_error = LLMUnavailable("unconfigured", f"{type(e).__name__}: {e}")
+                    if self._provider_error is not None:
+                        print(f"LLM provider '{self.provider_name}' unavailable, serving template reports: {self._provider_error}")
+        if self._provider_error is not None:
+            raise self._provider_error
+        return self._provider
+
+    def generate(self, disease_name, prediction, probability, input_data, top_features=None):
+        """Return (text, source) where source is "llm" or "fallback"."""
+        args = (disease_name, prediction, probability, input_data, top_features)
+        return self.generate_prompt(build_prompt(*args), lambda: template_report(*args))
+
+    def stream(self, disease_name, prediction, probability, input_data, top_features=None):
+        """Yield (source, chunk) pairs. Falls back to the template only if nothing was streamed yet;
+        a stream that breaks half way raises so the caller can mark the report failed."""
+        args = (disease_name, prediction, probability, input_data, top_features)
+        return self.stream_prompt(build_prompt(*args), lambda: template_report(*args))
+
+    def generate_prompt(self, prompt, fallback):
+        try:
+            return self._call(prompt), "llm"
+        except LLMUnavailable as e:
+            LLM_FALLBACKS.inc(reason=e.reason)
+            return fallback(), "fallback"
+
+    def stream_prompt(self, prompt, fallback):
+        try:
+            for chunk in self._stream(prompt):
+                yield "llm", chunk
+        except LLMUnavailable as e:
+            LLM_FALLBACKS.inc(reason=e.reason)
+            yield "fallback", fallback()
+
+    def _call(self, prompt):
+        deadline = time.monotonic() + self.deadline
+        provider = self.provider()
+        if self.breaker.rejecting():
+            raise LLMUnavailable("breaker_open")
+        if not self._slots.acquire(timeout=self.deadline):
+            raise LLMUnavailable("busy")
+        try:
+            last = None
+            for attempt in range(self.retries + 1):
+                remaining = self._remaining(deadline, last)
+                start = time.perf_counter()
+                try:
+                    text = provider.generate(prompt, remaining)
+                except Exception as e:
+                    last = self._failed(e, attempt, deadline, "sync")
+                    continue
+                self.breaker.record_success()
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="sync")
+                return text
+            raise LLMUnavailable("error", f"{type(last).__name__}: {last}")
+        finally:
+            self._slots.release()
+
+    def _stream(self, prompt):
+        deadline = time.monotonic() + self.deadline
+        provider = self.provider()
+        if self.breaker.rejecting():
+            raise LLMUnavailable("breaker_open")
+        if not self._slots.acquire(timeout=self.deadline):
+            raise LLMUnavailable("busy")
+        try:
+            last = None
+            for attempt in range(self.retries + 1):
+                remaining = self._remaining(deadline, last)
+                start = time.perf_counter()
+                started = False
+                try:
+                    for chunk in provider.stream(prompt, remaining):
+                        started = True
+                        yield chunk
+                        if time.monotonic() > deadline:
+                            raise TimeoutError("report stream passed its deadline")
+                except Exception as e:
+                    if started:
+                        # part of the report is already out, a retry would repeat it
+                        self.breaker.record_failure()
+                        LLM_ERRORS.inc(mode="stream", error=type(e).__name__)
+                        raise
+                    last = self._failed(e, attempt, deadline, "stream")
+                    continue
+                self.breaker.record_success()
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream")
+                return
+            raise LLMUnavailable("error", f"{type(last).__name__}: {last}")
+        finally:
+            self._slots.release()
+
+    def _remaining(self, deadline, last):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMUnavailable("deadline", f"{type(last).__name__}: {last}" if last else "")
+        if not self.breaker.allow():
+            raise LLMUnavailable("breaker_open")
+        return remaining
+
+    def _failed(self, e, attempt, deadline, mode):
+        if isinstance(e, LLMUnavailable):
+            raise e
+        self.breaker.record_failure()
+        LLM_ERRORS.inc(mode=mode, error=type(e).__name__)
+        if not _retryable(e):
+            raise LLMUnavailable("error", f"{type(e).__name__}: {e}")
+        if attempt == self.retries:
+            # no retry follows, so release the slot and fall back straight away
+            return e
+        # full jitter, never sleeping past the deadline
+        backoff = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+        time.sleep(max(0.0, min(backoff, deadline - time.monotonic())))
+        return e
+
+    def status(self):
+        return {
+            "provider": self.provider_name,
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "deadline_seconds": self.deadline,
+            "unavailable": str(self._provider_error) if self._provider_error else None,
+        }
+
+
+llm_client = LLMClient()
+
+
+def generate_health_report(disease_name, prediction, probability, input_data, top_features=None):
+    return llm_client.generate(disease_name, prediction, probability, input_data, top_features)
+
+
+def stream_health_report(disease_name, prediction, probability, input_data, top_features=None):
+    return llm_client.stream(disease_name, prediction, probability, input_data, top_features)
+
+
+def generate_screening_report(findings, input_data):
+    return llm_client.generate_prompt(build_screening_prompt(findings, input_data),
+                                      lambda: template_screening_report(findings, input_data))
+
 
+def stream_screening_report(findings, input_data):
+    return llm_client.stream_prompt(build_screening_prompt(findings, input_data),
+                                    lambda: template_screening_report(findings, input_data))
@@ -0,0 +1,184 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.type = "counter"
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.type = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, c in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += c
+                    out.append((f"{self.name}_bucket", key + (bound,), cumulative))
+                out.append((f"{self.name}_sum", key, total))
+                out.append((f"{self.name}_count", key, count))
+        return out
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, key, value in metric.samples():
+                names = metric.labels + (("le",) if name.endswith("_bucket") else ())
+                lines.append(f"{name}{_format_labels(names, key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics.add(Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")))
+PREDICTION_STAGE_SECONDS = metrics.add(Histogram("prediction_stage_seconds", "Time spent in each stage of a prediction", ("stage", "model")))
+MODEL_LOAD_SECONDS = metrics.add(Gauge("model_load_seconds", "Time the last load of each model took, warm-up included", ("model",)))
+MODEL_LOADS = metrics.add(Counter("model_loads_total", "Model loads by outcome", ("model", "outcome")))
+LLM_REQUEST_SECONDS = metrics.add(Histogram("llm_request_seconds", "Latency of LLM report calls", ("mode",)))
+LLM_ERRORS = metrics.add(Counter("llm_errors_total", "Failed LLM report calls", ("mode", "error")))
+LLM_FALLBACKS = metrics.add(Counter("llm_fallbacks_total", "Template reports served instead of the LLM", ("reason",)))
+LLM_BREAKER_STATE = metrics.add(Gauge("llm_breaker_state", "LLM circuit breaker: 0 closed, 1 half-open, 2 open"))
+EXECUTOR_INFLIGHT = metrics.add(Gauge("inference_executor_inflight", "Inference calls running or queued on the CPU executor"))
+MICRO_BATCH_ROWS = metrics.add(Histogram("micro_batch_rows", "Rows merged into each micro-batch", ("model",),
+                                         buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)))
+MICRO_BATCH_WAIT_SECONDS = metrics.add(Histogram("micro_batch_wait_seconds", "Time a row waited in the micro-batch queue", ("model",),
+                                                 buckets=(0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)))
+MICRO_BATCH_REJECTIONS = metrics.add(Counter("micro_batch_rejections_total", "Rows turned away with a 503 because the micro-batch queue was full", ("model",)))
+EXECUTOR_REJECTIONS = metrics.add(Counter("inference_executor_rejections_total", "Inference calls turned away with a 503 because the executor was full"))
+AUDIT_RECORDS = metrics.add(Counter("audit_records_total", "Prediction records written to the audit log", ("model",)))
+AUDIT_DROPPED = metrics.add(Counter("audit_records_dropped_total", "Prediction records dropped because the audit writer fell behind or failed", ("model",)))
+DRIFT_PSI = metrics.add(Gauge("feature_drift_psi", "Population stability index of recent inputs against the training reference", ("model", "feature")))
+DRIFT_KS = metrics.add(Gauge("feature_drift_ks", "Kolmogorov-Smirnov distance of recent numeric inputs from the training reference", ("model", "feature")))
+REPORT_CACHE_LOOKUPS = metrics.add(Counter("report_cache_lookups_total", "Report cache lookups by result", ("result",)))
+
+
+class RequestTimings:
+    """Per-request stage durations, shared with the threadpool through a context variable."""
+
+    def __init__(self, observe=True):
+        self.start = time.perf_counter()
+        self.stages = []
+        self.model = ""
+        self.observe = observe
+
+    def add(self, stage, seconds):
+        self.stages.append((stage, seconds))
+        if self.observe:
+            PREDICTION_STAGE_SECONDS.observe(seconds, stage=stage, model=self.model)
+
+    def server_timing(self):
+        return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages)
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def begin_request(observe=True):
+    timings = RequestTimings(observe)
+    _current.set(timings)
+    return timings
+
+
+def current_timings():
+    return _current.get()
+
+
+def set_model(model):
+    timings = _current.get()
+    if timings is not None:
+        timings.model = model
+    return timings
+
+
+def mark_parsed(model):
+    """Called first thing in a handler: body reading and validation happened since the request started."""
+    timings = set_model(model)
+    if timings is not None:
+        timings.add("parse", time.perf_counter() - timings.start)
+
+
+@contextmanager
+def stage(name, model=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+        else:
+            PREDICTION_STAGE_SECONDS.observe(elapsed, stage=name, model=model or "")
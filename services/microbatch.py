@@ -0,0 +1,149 @@
+import asyncio
+import bisect
+import os
+import time
+import numpy as np
+from services.executor import ExecutorBusy, cpu_executor
+from services.inference import run_inference
+from services.metrics import MICRO_BATCH_REJECTIONS, MICRO_BATCH_ROWS, MICRO_BATCH_WAIT_SECONDS
+
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "0") == "1"
+MICRO_BATCH_MAX_DELAY_MS = float(os.getenv("MICRO_BATCH_MAX_DELAY_MS", "2"))
+MICRO_BATCH_MAX_ROWS = int(os.getenv("MICRO_BATCH_MAX_ROWS", "64"))
+MICRO_BATCH_QUEUE_SIZE = int(os.getenv("MICRO_BATCH_QUEUE_SIZE", "256"))  # waiting rows per model before 503s
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+WAIT_MS_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+def _score(loaded, X):
+    return run_inference(loaded.model, X, loaded.meta["risk_thresholds"])
+
+
+def _bucket_labels(buckets):
+    return [f"<={b}" for b in buckets] + [f">{buckets[-1]}"]
+
+
+class MicroBatcher:
+    """Merges concurrent single-row predictions for one model into one predict_proba call.
+
+    The first request to arrive opens a batch window; the batch is flushed
+    when max_rows requests are waiting or max_delay_ms has passed, and every
+    caller gets its own row back. Rows are grouped by model snapshot so a hot
+    swap in the middle of a window never mixes versions in one call.
+
+    Up to max_flushes batches (by default one per executor worker) are scored
+    at once; while they all run, rows keep queueing and go out in the next,
+    larger batch. At most queue_size rows wait, beyond that submit() raises
+    ExecutorBusy like the executor itself.
+    """
+
+    def __init__(self, name, max_delay_ms=MICRO_BATCH_MAX_DELAY_MS, max_rows=MICRO_BATCH_MAX_ROWS,
+                 queue_size=MICRO_BATCH_QUEUE_SIZE, max_flushes=None):
+        self.name = name
+        self.max_delay = max_delay_ms / 1000
+        self.max_rows = max_rows
+        self.queue_size = queue_size
+        self.max_flushes = max_flushes or cpu_executor.workers
+        self._queue = None
+        self._task = None
+        self._slots = None
+        self._flushes = set()
+        self.rejected = 0
+        self.batch_sizes = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.wait_ms = [0] * (len(WAIT_MS_BUCKETS) + 1)
+        self.batches = 0
+        self.rows = 0
+        self.wait_ms_total = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._slots = asyncio.Semaphore(self.max_flushes)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [t for t in (self._task, *self._flushes) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._flushes.clear()
+
+    async def submit(self, loaded, row):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((loaded, row, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            MICRO_BATCH_REJECTIONS.inc(model=self.name)
+            raise ExecutorBusy()
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.max_rows:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # with every slot busy the next batch keeps filling up while this one waits
+            await self._slots.acquire()
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task):
+        self._flushes.discard(task)
+        self._slots.release()
+
+    async def _flush(self, batch):
+        started = time.perf_counter()
+        self._record(len(batch), [(started - queued) * 1000 for *_, queued in batch])
+
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+        for items in groups.values():
+            loaded = items[0][0]
+            try:
+                scored = await cpu_executor.run(_score, loaded, np.vstack([row for _, row, _, _ in items]))
+            except Exception as e:
+                for _, _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future, _), result in zip(items, scored):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record(self, size, waits):
+        self.batches += 1
+        self.rows += size
+        self.batch_sizes[bisect.bisect_left(BATCH_SIZE_BUCKETS, size)] += 1
+        MICRO_BATCH_ROWS.observe(size, model=self.name)
+        for wait in waits:
+            self.wait_ms_total += wait
+            self.wait_ms[bisect.bisect_left(WAIT_MS_BUCKETS, wait)] += 1
+            MICRO_BATCH_WAIT_SECONDS.observe(wait / 1000, model=self.name)
+
+    def stats(self):
+        return {
+            "max_delay_ms": self.max_delay * 1000,
+            "max_rows": self.max_rows,
+            "queue_size": self.queue_size,
+            "max_flushes": self.max_flushes,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "inflight_batches": len(self._flushes),
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": round(self.rows / self.batches, 3) if self.batches else 0.0,
+            "mean_queue_wait_ms": round(self.wait_ms_total / self.rows, 4) if self.rows else 0.0,
+            "batch_size_histogram": dict(zip(_bucket_labels(BATCH_SIZE_BUCKETS), self.batch_sizes)),
+            "queue_wait_ms_histogram": dict(zip(_bucket_labels(WAIT_MS_BUCKETS), self.wait_ms)),
+        }
@@ -0,0 +1,324 @@
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from services.explain import ForestExplainer, top_features
+from services.forest import ForestEngine, forest_path, load_model
+from services.inference import load_model_meta, meta_path, run_inference
+from services.metrics import MODEL_LOAD_SECONDS, MODEL_LOADS
+
+MODEL_LOAD_WORKERS = int(os.getenv("MODEL_LOAD_WORKERS", "3"))
+WARMUP_ROUNDS = int(os.getenv("MODEL_WARMUP_ROUNDS", "3"))
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))  # seconds, 0 disables hot reload
+MODEL_HISTORY = int(os.getenv("MODEL_HISTORY", "3"))
+HOLDOUT_ROWS = int(os.getenv("MODEL_HOLDOUT_ROWS", "200"))
+MIN_HOLDOUT_ACCURACY = float(os.getenv("MODEL_MIN_HOLDOUT_ACCURACY", "0.6"))
+MAX_ACCURACY_DROP = float(os.getenv("MODEL_MAX_ACCURACY_DROP", "0.05"))
+
+
+class ModelValidationError(Exception):
+    pass
+
+
+def artifact_files(path):
+    return [p for p in (path, forest_path(path), meta_path(path)) if os.path.exists(p)]
+
+
+def artifact_signature(path):
+    signature = []
+    for p in (path, forest_path(path), meta_path(path)):
+        try:
+            st = os.stat(p)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def artifact_version(path):
+    digest = hashlib.sha256()
+    for p in artifact_files(path):
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def holdout_split(name, rows=HOLDOUT_ROWS):
+    """Up to rows rows of a model's held-out test split (see services.training.split_dataset), or None without its CSV.
+
+    Rows the model was trained on would make the validation gate pass almost any model.
+    """
+    from services.training import TRAINING_CONFIGS, split_dataset
+
+    config = TRAINING_CONFIGS[name]
+    if not os.path.exists(config["data_path"]):
+        print(f"{name}: no dataset at {config['data_path']}, new versions will be swapped in without holdout validation")
+        return None
+    _, X_test, _, y_test = split_dataset(config, pd.read_csv(config["data_path"]))
+    if len(X_test) > rows:
+        X_test = X_test.sample(n=rows, random_state=0)
+        y_test = y_test.loc[X_test.index]
+    return X_test, y_test.to_numpy()
+
+
+class LoadedModel:
+    """An immutable snapshot of a loaded model and the metadata served with it.
+
+    Handlers grab one snapshot per request, so a swap never changes the model
+    under a request that is already in flight.
+    """
+
+    def __init__(self, model, meta, version, path=None):
+        self.model = model
+        self.meta = meta
+        self.version = version
+        self.path = path  # the artifact it came from, so worker processes can map it themselves
+        self.engine = "native" if isinstance(model, ForestEngine) else "sklearn"
+        self.loaded_at = time.time()
+        self.holdout_accuracy = None
+        self.explainer = None
+
+
+def open_snapshot(path, engine="auto"):
+    """Load an artifact into a LoadedModel with its explainer, without layout checks or warm-up."""
+    model = load_model(path, engine)
+    loaded = LoadedModel(model, load_model_meta(path), artifact_version(path), path)
+    # leaf paths are extracted once per version, off the request path
+    loaded.explainer = ForestExplainer.for_model(model)
+    return loaded
+
+
+class ModelEntry:
+    def __init__(self, key, path, engine, layout, holdout):
+        self.key = key
+        self.path = path
+        self.engine = engine
+        self.layout = layout
+        # (X, y), None, or a callable returning either, resolved on first use in a loader thread
+        self.holdout = holdout
+        self._holdout_lock = threading.Lock()
+        self.state = "registered"
+        self.error = None
+        self.load_seconds = None
+        self.loaded = None
+        self.signature = None
+        self.history = deque(maxlen=MODEL_HISTORY)
+
+    def resolve_holdout(self):
+        with self._holdout_lock:
+            if callable(self.holdout):
+                try:
+                    self.holdout = self.holdout()
+                except Exception as e:
+                    print(f"{self.key}: could not read the holdout ({type(e).__name__}: {e}), validating without it")
+                    self.holdout = None
+            return self.holdout
+
+    def status(self):
+        return {
+            "state": self.state,
+            "engine": self.loaded.engine if self.loaded else self.engine,
+            "version": self.loaded.version if self.loaded else None,
+            "variant": self.loaded.meta.get("variant", "full") if self.loaded else None,
+            "holdout_accuracy": self.loaded.holdout_accuracy if self.loaded else None,
+            "explainable": self.loaded.explainer is not None if self.loaded else None,
+            "previous_versions": [old.version for old in reversed(self.history)],
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """Models are registered up front and loaded in parallel in the background.
+
+    Handlers call get(), which returns None until the model has been loaded
+    and warmed up, so the app can accept traffic before every model is in.
+    Holdouts may be passed as callables so that reading datasets also happens
+    in the loader threads, not at startup.
+    A watcher thread polls the artifacts on disk; a changed model is loaded
+    next to the live one, checked on a holdout sample and only then swapped in.
+    A model whose first load failed is retried once its files change.
+    """
+
+    def __init__(self, workers=MODEL_LOAD_WORKERS, watch_interval=MODEL_WATCH_INTERVAL):
+        self.workers = workers
+        self.watch_interval = watch_interval
+        self.entries = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def register(self, key, path, engine="auto", layout=None, holdout=None):
+        self.entries[key] = ModelEntry(key, path, engine, layout, holdout)
+
+    def load_all(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="model-loader")
+        futures = [self._executor.submit(self._initial_load, entry) for entry in self.entries.values()]
+        if self.watch_interval > 0:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+        return futures
+
+    def _build(self, entry):
+        signature = artifact_signature(entry.path)
+        loaded = open_snapshot(entry.path, entry.engine)
+        if entry.layout is not None:
+            entry.layout.check(loaded.model)
+        if loaded.explainer is None:
+            print(f"{entry.key}: no explainer for this engine, predictions won't be explained")
+        self.warm_up(loaded, entry.layout)
+        return loaded, signature
+
+    def _initial_load(self, entry):
+        entry.state = "loading"
+        start = time.perf_counter()
+        attempted = artifact_signature(entry.path)
+        try:
+            loaded, signature = self._build(entry)
+            holdout = entry.resolve_holdout()
+            if holdout is not None:
+                loaded.holdout_accuracy = self.validate(loaded, holdout)
+        except Exception as e:
+            # the watcher retries once these files change
+            entry.signature = attempted
+            entry.state = "failed"
+            entry.error = f"{type(e).__name__}: {e}"
+            MODEL_LOADS.inc(model=entry.key, outcome="failed")
+            print(f"Failed to load {entry.key}: {entry.error}")
+            return
+        entry.load_seconds = round(time.perf_counter() - start, 4)
+        MODEL_LOAD_SECONDS.set(entry.load_seconds, model=entry.key)
+        MODEL_LOADS.inc(model=entry.key, outcome="loaded")
+        with self._lock:
+            entry.loaded = loaded
+            entry.signature = signature
+            entry.state = "ready"
+            entry.error = None
+        print(f"{entry.key} {loaded.version} ready in {entry.load_seconds}s")
+
+    @staticmethod
+    def warm_up(loaded, layout):
+        # first calls pay for lazy imports, page faults on mapped arrays and allocator warm-up
+        if layout is None:
+            return
+        row = layout.example_row()
+        for _ in range(WARMUP_ROUNDS):
+            run_inference(loaded.model, row, loaded.meta["risk_thresholds"])
+            top_features(loaded.explainer, loaded.model, row)
+
+    @staticmethod
+    def validate(loaded, holdout, baseline=None):
+        X, y = holdout
+        proba = loaded.model.predict_proba(X)
+        if proba.shape != (len(X), len(loaded.model.classes_)) or not np.isfinite(proba).all():
+            raise ModelValidationError("model produced malformed probabilities on the holdout sample")
+        if not np.allclose(proba.sum(axis=1), 1.0):
+            raise ModelValidationError("holdout probabilities do not sum to 1")
+        accuracy = float((loaded.model.classes_[proba.argmax(axis=1)] == y).mean())
+        if accuracy < MIN_HOLDOUT_ACCURACY:
+            raise ModelValidationError(f"holdout accuracy {accuracy:.3f} is below {MIN_HOLDOUT_ACCURACY}")
+        if baseline is not None and baseline.holdout_accuracy is not None and accuracy < baseline.holdout_accuracy - MAX_ACCURACY_DROP:
+            raise ModelValidationError(
+                f"holdout accuracy {accuracy:.3f} dropped more than {MAX_ACCURACY_DROP} from {baseline.holdout_accuracy:.3f}"
+            )
+        return round(accuracy, 4)
+
+    def reload(self, key):
+        """Load the artifact currently on disk and swap it in if it passes validation."""
+        entry = self.entries[key]
+        start = time.perf_counter()
+        try:
+            loaded, signature = self._build(entry)
+        except Exception:
+            MODEL_LOADS.inc(model=key, outcome="failed")
+            raise
+        MODEL_LOAD_SECONDS.set(round(time.perf_counter() - start, 4), model=key)
+        current = entry.loaded
+        if current is not None and loaded.version == current.version:
+            entry.signature = signature
+            return current
+        holdout = entry.resolve_holdout()
+        if holdout is not None:
+            try:
+                loaded.holdout_accuracy = self.validate(loaded, holdout, baseline=current)
+            except ModelValidationError:
+                MODEL_LOADS.inc(model=key, outcome="rejected")
+                raise
+        MODEL_LOADS.inc(model=key, outcome="swapped")
+        with self._lock:
+            if entry.loaded is not None:
+                entry.history.append(entry.loaded)
+            entry.loaded = loaded
+            entry.signature = signature
+            entry.state = "ready"
+            entry.error = None
+        print(f"{key} swapped to {loaded.version}")
+        return loaded
+
+    def rollback(self, key):
+        entry = self.entries[key]
+        with self._lock:
+            if not entry.history:
+                raise LookupError(f"no previous version of {key} to roll back to")
+            previous = entry.history.pop()
+            entry.loaded = previous
+        print(f"{key} rolled back to {previous.version}")
+        return previous
+
+    def _watch(self):
+        # an artifact is reloaded once its signature has been stable for one full interval,
+        # so a training run that is still writing the pickle/forest/meta trio is never picked up half way
+        pending = {}
+        while not self._stop.wait(self.watch_interval):
+            for key, entry in self.entries.items():
+                if entry.state not in ("ready", "failed"):
+                    continue
+                signature = artifact_signature(entry.path)
+                if signature == entry.signature:
+                    pending.pop(key, None)
+                    continue
+                if pending.get(key) != signature:
+                    pending[key] = signature
+                    continue
+                pending.pop(key, None)
+                if entry.state == "failed":
+                    # nothing is serving yet, so this is another first load rather than a swap
+                    self._initial_load(entry)
+                    continue
+                try:
+                    self.reload(key)
+                except Exception as e:
+                    # keep serving the old version; don't retry until the files change again
+                    entry.signature = signature
+                    entry.error = f"reload rejected: {type(e).__name__}: {e}"
+                    print(f"{key} {entry.error}")
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        return entry.loaded if entry else None
+
+    def status(self):
+        return {key: entry.status() for key, entry in self.entries.items()}
+
+    def ready(self):
+        return all(entry.state == "ready" for entry in self.entries.values())
+
+    def shutdown(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.watch_interval + 1)
+            self._watcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for entry in self.entries.values():
+            entry.loaded = None
+            entry.history.clear()
+            entry.state = "registered"
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from services.metrics import REPORT_CACHE_LOOKUPS
+
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "1024"))
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "86400"))
+REPORT_CACHE_DB = os.getenv("REPORT_CACHE_DB")  # e.g. cache/reports.sqlite3, unset = memory only
+REPORT_CACHE_DB_SIZE = int(os.getenv("REPORT_CACHE_DB_SIZE", "100000"))
+REPORT_CACHE_DB_PRUNE_EVERY = int(os.getenv("REPORT_CACHE_DB_PRUNE_EVERY", "500"))  # puts between trims of the file
+
+
+def _drivers(top_features):
+    # contributions rounded like format_drivers prints them
+    return [[f["feature"], round(float(f["contribution"]), 3)] for f in top_features or ()]
+
+
+def report_key(disease_name, prediction, probability, input_data, top_features=None):
+    # same inputs as the prompt; probability rounded to the precision the prompt prints
+    canonical = json.dumps(
+        {
+            "disease": disease_name,
+            "prediction": int(prediction),
+            "probability": round(float(probability), 4),
+            "input": input_data,
+            "drivers": _drivers(top_features),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def screening_key(findings, input_data):
+    canonical = json.dumps(
+        {
+            "findings": [
+                {"disease": f["disease"], "prediction": int(f["prediction"]), "probability": round(float(f["probability"]), 4),
+                 "drivers": _drivers(f.get("top_features"))}
+                for f in findings
+            ],
+            "input": input_data,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """Two-level cache for generated reports: an in-process LRU in front of an optional SQLite file.
+
+    With the file enabled, get() and put() do disk I/O, so callers on the
+    event loop run them in a thread (see persistent). Expired and surplus rows
+    are trimmed every prune_every puts rather than on each one.
+    """
+
+    def __init__(self, max_entries=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL, db_path=REPORT_CACHE_DB, db_max_entries=REPORT_CACHE_DB_SIZE,
+                 prune_every=REPORT_CACHE_DB_PRUNE_EVERY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_max_entries = db_max_entries
+        self.prune_every = max(1, prune_every)
+        self._puts = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "writes": 0}
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS reports (key TEXT PRIMARY KEY, report TEXT NOT NULL, created REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS reports_created ON reports (created)")
+            self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                report, created = entry
+                if now - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    REPORT_CACHE_LOOKUPS.inc(result="memory_hit")
+                    return report
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT report, created FROM reports WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] < self.ttl:
+                    self.stats["disk_hits"] += 1
+                    REPORT_CACHE_LOOKUPS.inc(result="disk_hit")
+                    self._remember(key, row[0], row[1])
+                    return row[0]
+
+            self.stats["misses"] += 1
+            REPORT_CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+    def put(self, key, report):
+        now = time.time()
+        with self._lock:
+            self.stats["writes"] += 1
+            self._remember(key, report, now)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO reports (key, report, created) VALUES (?, ?, ?)", (key, report, now))
+                self._puts += 1
+                if self._puts % self.prune_every == 0:
+                    self._prune(now)
+                self._db.commit()
+
+    def _prune(self, now):
+        # the file may overshoot db_max_entries by up to prune_every rows in between
+        self._db.execute(
+            "DELETE FROM reports WHERE created < ? OR key IN "
+            "(SELECT key FROM reports ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (now - self.ttl, self.db_max_entries),
+        )
+
+    @property
+    def persistent(self):
+        return self._db is not None
+
+    def _remember(self, key, report, created):
+        self._entries[key] = (report, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_enabled": self._db is not None,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+report_cache = ReportCache()
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from services.llm import stream_health_report, stream_screening_report
+from services.report_cache import report_cache, report_key, screening_key
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "4"))
+REPORT_QUEUE_SIZE = int(os.getenv("REPORT_QUEUE_SIZE", "256"))
+REPORT_RETENTION = int(os.getenv("REPORT_RETENTION", "10000"))
+
+
+class ReportQueueFull(Exception):
+    pass
+
+
+class ReportJob:
+    def __init__(self, stream, args, cache_key):
+        self.id = uuid.uuid4().hex
+        self.stream = stream
+        self.args = args
+        self.status = "pending"
+        self.chunks = []
+        self.error = None
+        self.cache_key = cache_key
+        self.source = None
+        self.created = time.time()
+        self.updated = asyncio.Event()
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    def to_dict(self):
+        return {"report_id": self.id, "status": self.status, "ai_analysis": self.text or None, "source": self.source, "error": self.error}
+
+
+class ReportWorkerPool:
+    """Bounded pool of asyncio workers that generate LLM reports in the background.
+
+    submit() is awaited on the event loop the pool was started on. Cache
+    lookups and writes that touch the SQLite file run in a thread, so the
+    loop never waits on disk.
+    """
+
+    def __init__(self, workers=REPORT_WORKERS, queue_size=REPORT_QUEUE_SIZE, retention=REPORT_RETENTION, cache=report_cache):
+        self.workers = workers
+        self.cache = cache
+        self.queue_size = queue_size
+        self.retention = retention
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, disease_name, prediction, probability, input_data, top_features=None):
+        return await self.submit_job(ReportJob(
+            stream_health_report,
+            (disease_name, prediction, probability, input_data, top_features),
+            report_key(disease_name, prediction, probability, input_data, top_features),
+        ))
+
+    async def submit_screening(self, findings, input_data):
+        return await self.submit_job(ReportJob(stream_screening_report, (findings, input_data), screening_key(findings, input_data)))
+
+    async def _cache_call(self, fn, *args):
+        if self.cache.persistent:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def submit_job(self, job):
+        cached = await self._cache_call(self.cache.get, job.cache_key)
+        if cached is not None:
+            job.chunks.append(cached)
+            job.source = "cache"
+            job.status = "done"
+
+        with self._lock:
+            if job.status == "pending":
+                if self._pending >= self.queue_size:
+                    raise ReportQueueFull()
+                self._pending += 1
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.retention:
+                self.jobs.popitem(last=False)
+
+        if job.status == "pending":
+            self._queue.put_nowait(job)
+        return job
+
+    def get(self, report_id):
+        return self.jobs.get(report_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            try:
+                await asyncio.to_thread(self._generate, job)
+                job.status = "done"
+                if job.source == "llm":
+                    await self._cache_call(self.cache.put, job.cache_key, job.text)
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                job.updated.set()
+
+    def _generate(self, job):
+        # runs in a worker thread, chunks are published back on the loop
+        for source, chunk in job.stream(*job.args):
+            job.source = source
+            self._loop.call_soon_threadsafe(self._publish, job, chunk)
+
+    @staticmethod
+    def _publish(job, chunk):
+        job.chunks.append(chunk)
+        job.updated.set()
+
+
+async def stream_job_events(job):
+    """Server-sent events for a report job: one `chunk` event per text chunk, then `done` or `error`."""
+    sent = 0
+    while True:
+        job.updated.clear()
+        while sent < len(job.chunks):
+            yield _sse("chunk", job.chunks[sent])
+            sent += 1
+        if job.status == "done":
+            yield _sse("done", job.id)
+            return
+        if job.status == "failed":
+            yield _sse("error", job.error)
+            return
+        await job.updated.wait()
+
+
+def _sse(event, data):
+    lines = "\n".join(f"data: {line}" for line in str(data).split("\n"))
+    return f"event: {event}\n{lines}\n\n"
+
+
+report_pool = ReportWorkerPool()
@@ -0,0 +1,272 @@
+"""Shared training driver for every disease model.
+
+    python -m services.training                    # train whatever changed
+    python -m services.training heart --force      # retrain one model regardless
+    python -m services.training --no-mlflow        # skip experiment tracking
+    python -m services.training heart --search     # tune hyperparameters (services/tuning.py)
+    python -m services.training --lite             # also build compressed variants (services/lite.py)
+
+Models train concurrently in a process pool and the cores are split between
+them for the forests. Parsed datasets are cached under DATASET_CACHE_DIR
+keyed by the CSV's hash, and a model is skipped when the fingerprint of its
+data, training code and hyperparameters matches the one stored in its
+.meta.json next to artifacts that are all still on disk.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import services.drift
+import services.forest
+import services.inference
+from services.drift import reference_for
+from services.forest import export_forest, forest_path
+from services.inference import load_model_meta, meta_path, save_model_meta
+
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", ".cache/datasets")
+MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "file:./mlruns")
+
+TRAINING_CONFIGS = {
+    "diabetes": {
+        "data_path": "datasets/diabetes.csv",
+        "target": "Outcome",
+        "model_path": "models/diabetes_model.pkl",
+        "experiment": "Diabetes_Risk_Prediction",
+        "logged_model": "diabetes_pipeline",
+        "params": {"n_estimators": 200, "max_depth": 10, "min_samples_split": 2, "random_state": 42},
+        "stratify": True,
+        "risk_thresholds": (0.3, 0.7),
+    },
+    "heart": {
+        "data_path": "datasets/heart.csv",
+        "target": "HeartDisease",
+        "model_path": "models/heart_pipeline.pkl",
+        "experiment": "Heart_Disease_Prediction",
+        "logged_model": "heart_pipeline",
+        "params": {"n_estimators": 100, "random_state": 42},
+        "numeric": ["Age", "RestingBP", "Cholesterol", "FastingBS", "MaxHR", "Oldpeak"],
+        "categorical": ["Sex", "ChestPainType", "RestingECG", "ExerciseAngina", "ST_Slope"],
+        "risk_thresholds": (0.3, 0.7),
+    },
+    "parkinsons": {
+        "data_path": "datasets/parkinsons.csv",
+        "target": "status",
+        "drop": ["name"],
+        "model_path": "models/parkinsons_pipeline.pkl",
+        "experiment": "Parkinsons_Prediction",
+        "logged_model": "parkinsons_rf_pipeline",
+        "params": {"n_estimators": 100, "random_state": 42},
+        "risk_thresholds": (0.3, 0.7),
+    },
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_dataset(csv_path, cache_dir=DATASET_CACHE_DIR):
+    """Read a CSV through a NumPy cache keyed by its content hash.
+
+    Returns (DataFrame, csv hash). A cache hit skips CSV parsing entirely;
+    string columns are stored as fixed-width unicode so no pickling is needed.
+    """
+    csv_hash = file_hash(csv_path)
+    cached = os.path.join(cache_dir, f"{csv_hash}.npz")
+    if os.path.exists(cached):
+        with np.load(cached, allow_pickle=False) as data:
+            columns = [str(c) for c in data["__columns__"]]
+            return pd.DataFrame({c: data[f"col{i}"] for i, c in enumerate(columns)}), csv_hash
+
+    df = pd.read_csv(csv_path)
+    arrays = {"__columns__": np.asarray(df.columns, dtype=str)}
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        arrays[f"col{i}"] = values if values.dtype.kind in "biuf" else values.astype(str)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cached}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, cached)
+    return df, csv_hash
+
+
+def tuned_params_path(model_path):
+    return os.path.splitext(model_path)[0] + ".tuned.json"
+
+
+def effective_params(config):
+    """The config's hyperparameters, overridden by the last --search result if there is one."""
+    params = dict(config["params"])
+    path = tuned_params_path(config["model_path"])
+    if os.path.exists(path):
+        with open(path) as f:
+            params.update(json.load(f)["params"])
+    return params
+
+
+def split_dataset(config, df):
+    from sklearn.model_selection import train_test_split
+
+    X = df.drop(columns=[config["target"], *config.get("drop", [])])
+    y = df[config["target"]]
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y if config.get("stratify") else None)
+
+
+def training_fingerprint(config, csv_hash):
+    import sklearn
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps(config, sort_keys=True).encode())
+    digest.update(csv_hash.encode())
+    digest.update(sklearn.__version__.encode())
+    # the export format is part of the artifact, so the forest code counts as training code
+    for module in (sys.modules[__name__], services.drift, services.forest, services.inference):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def is_up_to_date(config, fingerprint):
+    model_path = config["model_path"]
+    if not all(os.path.exists(p) for p in (model_path, forest_path(model_path), meta_path(model_path))):
+        return False
+    return load_model_meta(model_path).get("training_fingerprint") == fingerprint
+
+
+def build_pipeline(config, n_jobs, params=None):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    if config.get("categorical"):
+        preprocessor = ColumnTransformer(transformers=[
+            ("num", StandardScaler(), config["numeric"]),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), config["categorical"]),
+        ])
+        name = "preprocessor"
+    else:
+        preprocessor, name = StandardScaler(), "scaler"
+    return Pipeline([
+        (name, preprocessor),
+        ("classifier", RandomForestClassifier(**(params or config["params"]), n_jobs=n_jobs)),
+    ])
+
+
+def train_model(name, force=False, n_jobs=-1, use_mlflow=True):
+    """Train one model from TRAINING_CONFIGS and write its pickle, .forest and meta. Runs in a worker process."""
+    from sklearn.metrics import accuracy_score, f1_score
+
+    config = TRAINING_CONFIGS[name]
+    start = time.perf_counter()
+    df, csv_hash = load_dataset(config["data_path"])
+    params = effective_params(config)
+    fingerprint = training_fingerprint({**config, "params": params}, csv_hash)
+    if not force and is_up_to_date(config, fingerprint):
+        return {"model": name, "status": "skipped", "fingerprint": fingerprint, "seconds": round(time.perf_counter() - start, 3)}
+
+    X_train, X_test, y_train, y_test = split_dataset(config, df)
+    pipeline = build_pipeline(config, n_jobs, params)
+    pipeline.fit(X_train, y_train)
+    y_pred = pipeline.predict(X_test)
+    metrics = {"accuracy": accuracy_score(y_test, y_pred), "f1_score": f1_score(y_test, y_pred)}
+    # serving scores one row at a time; a joblib pool per predict call would only add latency
+    pipeline.named_steps["classifier"].n_jobs = None
+
+    model_path = config["model_path"]
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    with open(model_path, "wb") as f:
+        pickle.dump(pipeline, f)
+    export_forest(pipeline, forest_path(model_path))
+    save_model_meta(model_path, config["risk_thresholds"], training_fingerprint=fingerprint, params=params,
+                    drift_reference=reference_for(pipeline, X_train, X_test))
+
+    if use_mlflow:
+        log_run(config, params, pipeline, X_train, metrics)
+
+    return {
+        "model": name,
+        "status": "trained",
+        "fingerprint": fingerprint,
+        "seconds": round(time.perf_counter() - start, 3),
+        **{k: round(v, 4) for k, v in metrics.items()},
+    }
+
+
+def log_run(config, params, pipeline, X_train, metrics):
+    import mlflow
+    import mlflow.sklearn
+    from mlflow.models.signature import infer_signature
+
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    mlflow.set_experiment(config["experiment"])
+    with mlflow.start_run():
+        mlflow.log_params(params)
+        mlflow.log_metrics(metrics)
+        mlflow.sklearn.log_model(
+            sk_model=pipeline,
+            artifact_path=config["logged_model"],
+            signature=infer_signature(X_train, pipeline.predict(X_train)),
+            input_example=X_train.iloc[:5],
+        )
+
+
+def train_models(names=None, force=False, workers=None, use_mlflow=True):
+    """Train the given models (all by default) concurrently, one process each."""
+    names = list(names or TRAINING_CONFIGS)
+    workers = workers or len(names)
+    # split the cores between the concurrent fits instead of letting every forest grab them all
+    n_jobs = max(1, (os.cpu_count() or 1) // min(workers, len(names)))
+    if workers == 1:
+        results = [train_model(name, force, n_jobs, use_mlflow) for name in names]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(train_model, name, force, n_jobs, use_mlflow) for name in names]
+            results = [future.result() for future in futures]
+
+    for result in results:
+        scores = ", ".join(f"{k} {result[k]}" for k in ("accuracy", "f1_score") if k in result)
+        print(f"{result['model']:<12}{result['status']:<9}{result['seconds']:>8}s  {scores}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="*", help=f"any of {', '.join(TRAINING_CONFIGS)} (default: all)")
+    parser.add_argument("--force", action="store_true", help="retrain even when the fingerprint matches")
+    parser.add_argument("--workers", type=int, help="training processes (default: one per model)")
+    parser.add_argument("--no-mlflow", action="store_true", help="skip experiment tracking")
+    parser.add_argument("--search", action="store_true", help="tune size/depth/leaf settings before training")
+    parser.add_argument("--candidates", type=int, default=27, help="configurations sampled per model in --search")
+    parser.add_argument("--f1-tolerance", type=float, default=0.01,
+                        help="in --search, deploy the fastest Pareto model within this F1 of the best")
+    parser.add_argument("--lite", action="store_true", help="build the pruned and distilled variants after training")
+    args = parser.parse_args()
+    unknown = set(args.models) - set(TRAINING_CONFIGS)
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(sorted(unknown))}")
+    if args.search:
+        from services.tuning import search_models
+
+        search_models(args.models, candidates=args.candidates, workers=args.workers,
+                      f1_tolerance=args.f1_tolerance, use_mlflow=not args.no_mlflow)
+    else:
+        train_models(args.models, force=args.force, workers=args.workers, use_mlflow=not args.no_mlflow)
+    if args.lite:
+        from services.lite import build_all
+
+        build_all(args.models, use_mlflow=not args.no_mlflow)
+
+
+if __name__ == "__main__":
+    main()
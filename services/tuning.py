@@ -0,0 +1,189 @@
+"""Successive-halving search over forest size, depth and leaf settings.
+
+    python -m services.training heart --search
+    python -m services.training --search --candidates 27 --f1-tolerance 0.01
+
+Every candidate is scored on validation F1 (a split of the training set, so
+the test split train_model reports on stays untouched) and on the measured
+single-row latency of its exported .forest. Each round keeps the best third
+by Pareto rank and gives the survivors three times the training rows,
+until the last few are fitted on all of it. The
+deployed configuration is the fastest Pareto-optimal candidate whose F1 is
+within the tolerance of the best; its parameters go to <model>.tuned.json,
+which train_model then picks up to write the serving artifacts.
+"""
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from services.forest import ForestEngine, export_forest
+from services.training import (
+    MLFLOW_TRACKING_URI, TRAINING_CONFIGS, build_pipeline, load_dataset, split_dataset, train_model, tuned_params_path,
+)
+
+SEARCH_SPACE = {
+    "n_estimators": [25, 50, 100, 200, 400],
+    "max_depth": [4, 6, 8, 10, 14, None],
+    "min_samples_leaf": [1, 2, 4, 8],
+    "max_features": ["sqrt", 0.5],
+}
+HALVING_FACTOR = 3
+MIN_ROUND_SAMPLES = 100
+LATENCY_ROUNDS = int(os.getenv("SEARCH_LATENCY_ROUNDS", "200"))
+
+
+def sample_candidates(space, n, seed=0):
+    """Up to n distinct configurations drawn from the grid."""
+    rng = random.Random(seed)
+    grid_size = math.prod(len(values) for values in space.values())
+    seen, candidates = set(), []
+    while len(candidates) < min(n, grid_size):
+        params = {name: rng.choice(values) for name, values in space.items()}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+def _search_split(config, df):
+    from sklearn.model_selection import train_test_split
+
+    X_train, _, y_train, _ = split_dataset(config, df)
+    return train_test_split(X_train, y_train, test_size=0.25, random_state=0,
+                            stratify=y_train if config.get("stratify") else None)
+
+
+def fit_candidate(name, params, n_samples):
+    """Fit one candidate on the first n_samples fitting rows and score it on the validation rows. Runs in a worker."""
+    from sklearn.metrics import f1_score
+
+    config = TRAINING_CONFIGS[name]
+    df, _ = load_dataset(config["data_path"])
+    X_fit, X_val, y_fit, y_val = _search_split(config, df)
+    pipeline = build_pipeline(config, n_jobs=1, params={**config["params"], **params})
+    pipeline.fit(X_fit.iloc[:n_samples], y_fit.iloc[:n_samples])
+    return pipeline, f1_score(y_val, pipeline.predict(X_val))
+
+
+def measure_latency(pipeline, X, rounds=LATENCY_ROUNDS):
+    """Median milliseconds for one single-row predict_proba on the native engine, after a warm-up."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = ForestEngine.load(export_forest(pipeline, os.path.join(tmp, "candidate.forest")))
+        latency = engine_latency(engine, engine.encode_frame(X), rounds)
+        del engine
+    return latency
+
+
+def engine_latency(engine, rows, rounds=LATENCY_ROUNDS):
+    for row in rows[:10]:
+        engine.predict_proba(row[None, :])
+    timings = []
+    for i in range(rounds):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        engine.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def pareto_ranks(scores):
+    """Non-dominated sorting on (f1 high, latency low); rank 0 is the Pareto front."""
+    ranks = [None] * len(scores)
+    remaining, rank = set(range(len(scores))), 0
+    while remaining:
+        front = {
+            i for i in remaining
+            if not any(
+                scores[j]["f1"] >= scores[i]["f1"] and scores[j]["latency_ms"] <= scores[i]["latency_ms"]
+                and (scores[j]["f1"], scores[j]["latency_ms"]) != (scores[i]["f1"], scores[i]["latency_ms"])
+                for j in remaining
+            )
+        }
+        for i in front:
+            ranks[i] = rank
+        remaining -= front
+        rank += 1
+    return ranks
+
+
+def search_model(name, candidates=27, workers=None, f1_tolerance=0.01, use_mlflow=True, seed=0):
+    """Run the search for one model, write its tuned parameters and retrain the deployable artifacts."""
+    config = TRAINING_CONFIGS[name]
+    df, _ = load_dataset(config["data_path"])
+    X_fit, X_val, _, _ = _search_split(config, df)
+    space = config.get("search_space", SEARCH_SPACE)
+    pool = sample_candidates(space, candidates, seed)
+
+    # halve until a handful is left, so the final full-data round still has a trade-off to pick from
+    n_rounds, remaining = 1, len(pool)
+    while remaining > HALVING_FACTOR:
+        remaining //= HALVING_FACTOR
+        n_rounds += 1
+    history = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for rnd in range(n_rounds):
+            n_samples = len(X_fit) if rnd == n_rounds - 1 else max(
+                MIN_ROUND_SAMPLES, len(X_fit) // HALVING_FACTOR ** (n_rounds - 1 - rnd)
+            )
+            futures = [executor.submit(fit_candidate, name, params, n_samples) for params in pool]
+            # every fit of the round has finished before any latency is measured, one candidate at a time,
+            # so the timings are taken on otherwise idle cores
+            fitted = [future.result() for future in futures]
+            scores = []
+            for params, (pipeline, f1) in zip(pool, fitted):
+                scores.append({
+                    "params": params, "round": rnd, "n_samples": min(n_samples, len(X_fit)),
+                    "f1": round(float(f1), 4), "latency_ms": round(measure_latency(pipeline, X_val), 4),
+                })
+            history.extend(scores)
+            ranks = pareto_ranks(scores)
+            order = sorted(range(len(scores)), key=lambda i: (ranks[i], -scores[i]["f1"], scores[i]["latency_ms"]))
+            if rnd < n_rounds - 1:
+                pool = [scores[i]["params"] for i in order[:max(1, len(pool) // HALVING_FACTOR)]]
+            print(f"{name:<12}round {rnd}  {len(scores):>3} candidates on {scores[0]['n_samples']} rows")
+
+    front = [scores[i] for i in range(len(scores)) if ranks[i] == 0]
+    best_f1 = max(s["f1"] for s in front)
+    chosen = min((s for s in front if s["f1"] >= best_f1 - f1_tolerance), key=lambda s: (s["latency_ms"], -s["f1"]))
+
+    with open(tuned_params_path(config["model_path"]), "w") as f:
+        json.dump({
+            "params": chosen["params"], "f1": chosen["f1"], "latency_ms": chosen["latency_ms"],
+            "f1_tolerance": f1_tolerance, "candidates": len(history), "searched_at": int(time.time()),
+        }, f, indent=2)
+    if use_mlflow:
+        log_search(config, history, chosen)
+
+    result = train_model(name, force=True, use_mlflow=use_mlflow)
+    print(f"{name:<12}chose {chosen['params']}  val f1 {chosen['f1']}  {chosen['latency_ms']}ms/row  "
+          f"({len(history)} fits in {time.perf_counter() - start:.1f}s)")
+    return {**result, "search": chosen, "front": front}
+
+
+def log_search(config, history, chosen):
+    """One parent run per search with a nested run for every fit, in the file-based tracking store."""
+    import mlflow
+
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    mlflow.set_experiment(config["experiment"])
+    with mlflow.start_run(run_name="successive-halving"):
+        mlflow.log_params({f"chosen_{k}": v for k, v in chosen["params"].items()})
+        mlflow.log_metrics({"chosen_f1": chosen["f1"], "chosen_latency_ms": chosen["latency_ms"]})
+        for score in history:
+            with mlflow.start_run(nested=True, run_name=f"round{score['round']}"):
+                mlflow.log_params({**score["params"], "round": score["round"], "n_samples": score["n_samples"]})
+                mlflow.log_metrics({"f1": score["f1"], "latency_ms": score["latency_ms"]})
+
+
+def search_models(names=None, candidates=27, workers=None, f1_tolerance=0.01, use_mlflow=True):
+    # models run one after another; the candidates inside each search already fill the pool
+    return [
+        search_model(name, candidates, workers, f1_tolerance, use_mlflow)
+        for name in (names or TRAINING_CONFIGS)
+    ]
@@ -0,0 +1,73 @@
+import os
+import pickle
+import time
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+from services.audit import AuditLog, read_segment, replay, segment_paths
+from services.forest import SklearnEngine
+from services.inference import RISK_THRESHOLDS, run_inference
+from services.training import TRAINING_CONFIGS
+
+
+@pytest.fixture(scope="module")
+def heart():
+    config = TRAINING_CONFIGS["heart"]
+    with open(config["model_path"], "rb") as f:
+        engine = SklearnEngine(pickle.load(f))
+    df = pd.read_csv(config["data_path"]).drop(columns=[config["target"]])
+    X = engine.encode_frame(df.head(300))
+    return SimpleNamespace(model=engine, version="0123456789ab"), X, run_inference(engine, X)
+
+
+def write_log(directory, loaded, X, scored, segment_bytes=64 << 20):
+    log = AuditLog(str(directory), flush_interval=0.005, segment_bytes=segment_bytes)
+    log.start()
+    for i in range(0, len(X), 30):
+        log.record("heart_pipeline", loaded, X[i:i + 30], scored[i:i + 30])
+        time.sleep(0.02)  # segments only rotate between flushes
+    log.stop()
+    return segment_paths(str(directory / "heart_pipeline"))
+
+
+def read_all(paths):
+    return np.concatenate([np.asarray(read_segment(p)[1]) for p in paths])
+
+
+def test_segments_round_trip(heart, tmp_path):
+    loaded, X, scored = heart
+    # small segments, so the log rotates several times
+    paths = write_log(tmp_path, loaded, X, scored, segment_bytes=4096)
+    assert len(paths) > 1
+    header, _ = read_segment(paths[0])
+    assert header["columns"] == list(loaded.model.columns)
+    assert header["categories"] == loaded.model.categories
+
+    records = read_all(paths)
+    np.testing.assert_array_equal(records["features"], X)
+    assert records["prediction"].tolist() == [s["prediction"] for s in scored]
+    assert records["probability"].tolist() == [s["probability"] for s in scored]
+    assert set(records["version"].tolist()) == {b"0123456789ab"}
+
+
+def test_replay_against_the_served_model_changes_nothing(heart, tmp_path):
+    loaded, X, scored = heart
+    result = replay(write_log(tmp_path, loaded, X, scored), loaded.model, RISK_THRESHOLDS, chunk_rows=64)
+    assert result["rows"] == len(X)
+    assert result["served_versions"] == {"0123456789ab": len(X)}
+    assert (result["flipped_predictions"], result["risk_level_changes"], result["max_abs_probability_delta"]) == (0, 0, 0.0)
+
+
+def test_torn_record_at_the_end_is_ignored(heart, tmp_path):
+    loaded, X, scored = heart
+    [path] = write_log(tmp_path, loaded, X, scored)
+    _, records = read_segment(path)
+    itemsize = records.dtype.itemsize
+    del records
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - itemsize // 2)
+    _, records = read_segment(path)
+    assert len(records) == len(X) - 1
+    np.testing.assert_array_equal(records["features"], X[:-1])
+    assert replay([path], loaded.model, RISK_THRESHOLDS)["rows"] == len(X) - 1
@@ -0,0 +1,73 @@
+import json
+import time
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import main
+import services.batch
+from schemas import HeartInput
+from services.batch import read_batch_records
+
+app = FastAPI()
+
+
+@app.post("/batch")
+async def batch(request: Request):
+    return {"rows": len(await read_batch_records(request))}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(services.batch, "MAX_BATCH_SIZE", 3)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_accepts_records_columns_and_csv(client):
+    assert client.post("/batch", json=[{"a": 1}, {"a": 2}]).json() == {"rows": 2}
+    assert client.post("/batch", json={"a": [1, 2, 3], "b": [4, 5, 6]}).json() == {"rows": 3}
+    csv = "a,b\n1,2\n3,4\n"
+    assert client.post("/batch", content=csv, headers={"content-type": "text/csv"}).json() == {"rows": 2}
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (json.dumps([{"a": i} for i in range(4)]), "application/json"),
+    (json.dumps({"a": list(range(4))}), "application/json"),
+    ("a\n1\n2\n3\n4\n", "text/csv"),
+])
+def test_too_many_rows(client, body, content_type):
+    assert client.post("/batch", content=body, headers={"content-type": content_type}).status_code == 413
+
+
+def test_body_over_byte_limit_is_refused_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(services.batch, "MAX_BATCH_BYTES", 64)
+    parsed = []
+    monkeypatch.setattr(services.batch.json, "loads", lambda body: parsed.append(body) or [])
+    response = client.post("/batch", content="[" + ",".join(["{}"] * 100) + "]", headers={"content-type": "application/json"})
+    assert response.status_code == 413
+    assert not parsed
+
+
+def test_body_without_content_length_is_counted(client, monkeypatch):
+    monkeypatch.setattr(services.batch, "MAX_BATCH_BYTES", 64)
+
+    def chunks():
+        for _ in range(100):
+            yield b"[{}," * 4
+
+    response = client.post("/batch", content=chunks(), headers={"content-type": "application/json"})
+    assert response.status_code == 413
+
+
+def test_model_is_reported_once_per_batch():
+    row = {field.alias or name: field.json_schema_extra["example"] for name, field in HeartInput.model_fields.items()}
+    with TestClient(main.app) as api:
+        deadline = time.monotonic() + 60
+        while not main.registry.ready():
+            assert time.monotonic() < deadline, main.registry.status()
+            time.sleep(0.05)
+        body = api.post("/predict/heart/batch", json=[row, row, {}]).json()
+    assert body["model_version"] and body["model_variant"]
+    assert body["valid"] == 2
+    for item in body["results"][:2]:
+        assert set(item) == {"index", "prediction", "probability", "risk_level"}
@@ -0,0 +1,27 @@
+import importlib.util
+import os
+from conftest import ROOT
+
+spec = importlib.util.spec_from_file_location("bench_api", os.path.join(ROOT, "benchmarks", "bench_api.py"))
+bench_api = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench_api)
+
+MODEL_KEYS = {"heart": "heart"}
+BASELINE = {
+    "engines_served": {"native": {"heart": "native"}},
+    "results": {"native/heart/single": {"p95_ms": 1.0, "rows_per_s": 1000.0}},
+}
+
+
+def test_same_engine_is_compared():
+    results = {"native/heart/single": {"p95_ms": 2.0, "rows_per_s": 1000.0}}
+    failures, mismatched = bench_api.check_regressions(results, BASELINE, 0.25, {"native": {"heart": "native"}}, MODEL_KEYS)
+    assert len(failures) == 1 and not mismatched
+
+
+def test_fallback_engine_is_not_compared():
+    # a checkout without .forest files serves "native" with sklearn
+    results = {"native/heart/single": {"p95_ms": 2.0, "rows_per_s": 1000.0}}
+    failures, mismatched = bench_api.check_regressions(results, BASELINE, 0.25, {"native": {"heart": "sklearn"}}, MODEL_KEYS)
+    assert not failures
+    assert mismatched == ["native/heart/single: served by sklearn, baseline by native"]
@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+from services.bulk import read_chunks
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"a": range(10), "b": [f"r{i}" for i in range(10)]})
+
+
+def test_csv_chunks_resume_after_skipped_rows(frame, tmp_path):
+    path = str(tmp_path / "rows.csv")
+    frame.to_csv(path, index=False)
+    assert [c["a"].tolist() for c in read_chunks(path, 4)] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert [c["a"].tolist() for c in read_chunks(path, 4, skip_rows=5)] == [[5, 6, 7, 8], [9]]
+    assert list(read_chunks(path, 4, skip_rows=10)) == []
+
+
+def test_parquet_chunks_resume_after_skipped_rows(frame, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "rows.parquet")
+    frame.to_parquet(path, index=False)
+    assert [c["a"].tolist() for c in read_chunks(path, 4, skip_rows=5)] == [[5, 6, 7], [8, 9]]
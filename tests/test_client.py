@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "frontend"))
+from client import APIError, PredictionClient  # noqa: E402
+
+
+class FakeAPI(ThreadingHTTPServer):
+    """Answers every request with the next scripted (status, body, delay) and records the paths it was asked for."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.script = []
+        self.default = (200, {"prediction": 1, "probability": 0.8}, 0.0)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def next_response(self, path):
+        with self.lock:
+            self.requests.append(path)
+            return self.script.pop(0) if self.script else self.default
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.answer()
+
+    def do_GET(self):
+        self.answer()
+
+    def answer(self):
+        status, body, delay = self.server.next_response(self.path)
+        time.sleep(delay)
+        payload = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        if status == 503:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "text/event-stream" if isinstance(body, str) else "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = FakeAPI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(api, **kwargs):
+    return PredictionClient(f"http://127.0.0.1:{api.server_address[1]}", **kwargs)
+
+
+PAYLOAD = {"Age": 50, "Sex": "M"}
+
+
+def test_503_is_retried_until_it_succeeds(api):
+    api.script = [(503, {"detail": "busy"}, 0.0), (503, {"detail": "busy"}, 0.0)]
+    _, result = make_client(api).predict("heart", PAYLOAD)
+    assert result["probability"] == 0.8
+    assert api.requests == ["/predict/heart"] * 3
+
+
+def test_persistent_503_gives_up_with_an_api_error(api):
+    api.default = (503, {"detail": "busy"}, 0.0)
+    with pytest.raises(APIError) as error:
+        make_client(api).predict("heart", PAYLOAD)
+    assert error.value.status_code == 503
+    assert len(api.requests) == 3
+
+
+def test_client_errors_are_mapped_and_not_retried(api):
+    api.script = [(422, {"detail": [{"loc": ["body", "Age"], "type": "missing"}]}, 0.0)]
+    with pytest.raises(APIError) as error:
+        make_client(api).predict("heart", PAYLOAD)
+    assert error.value.status_code == 422
+    assert "missing" in error.value.text
+    assert len(api.requests) == 1
+
+
+def test_slow_call_is_aborted_and_not_cached(api):
+    api.script = [(200, {"probability": 0.1}, 0.5)]
+    client = make_client(api, timeout=(1, 0.1))
+    with pytest.raises(requests.exceptions.RequestException):
+        client.predict("heart", PAYLOAD)
+    # nothing is left in flight or cached, the next call goes out again
+    _, result = client.predict("heart", PAYLOAD)
+    assert result["probability"] == 0.8
+
+
+def test_identical_concurrent_predictions_share_one_call(api):
+    api.default = (200, {"prediction": 0, "probability": 0.2}, 0.2)
+    client = make_client(api)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: client.predict("heart", dict(PAYLOAD)), range(8)))
+    assert api.requests == ["/predict/heart"]
+    assert len({key for key, _ in results}) == 1 and all(r == results[0][1] for _, r in results)
+
+
+def test_coalesced_callers_all_see_the_error(api):
+    api.default = (500, {"detail": "boom"}, 0.2)
+    client = make_client(api)
+
+    def call(_):
+        try:
+            client.predict("heart", PAYLOAD)
+        except APIError as e:
+            return e.status_code
+
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(call, range(4))) == [500] * 4
+    assert len(api.requests) == 1
+
+
+def test_results_are_cached_by_payload_until_the_ttl(api):
+    client = make_client(api, cache_ttl=0.2)
+    key, _ = client.predict("heart", {"Sex": "M", "Age": 50})
+    assert client.predict("heart", {"Age": 50, "Sex": "M"})[0] == key  # key order doesn't matter
+    client.predict("diabetes", PAYLOAD)
+    assert api.requests == ["/predict/heart", "/predict/diabetes"]
+    time.sleep(0.25)
+    client.predict("heart", PAYLOAD)
+    assert len(api.requests) == 3
+
+
+def test_cache_evicts_the_least_recently_used(api):
+    client = make_client(api, cache_size=2)
+    for age in (1, 2, 1, 3, 1, 2):
+        client.predict("heart", {"Age": age})
+    # 1 stays warm; 2 was evicted by 3 and has to be fetched again
+    assert len(api.requests) == 4
+
+
+def test_finished_report_is_remembered_with_the_result(api):
+    api.default = (200, {"probability": 0.8, "report_id": "r1", "report_status": "pending"}, 0.0)
+    client = make_client(api)
+    key, _ = client.predict("heart", PAYLOAD)
+    client.remember_report(key, "Full report")
+    _, result = client.predict("heart", PAYLOAD)
+    assert (result["ai_analysis"], result["report_status"]) == ("Full report", "done")
+    assert len(api.requests) == 1
+
+
+def test_report_stream_yields_chunks_until_done(api):
+    api.script = [(200, "event: chunk\ndata: Hello\n\nevent: chunk\ndata: two\ndata: lines\n\nevent: done\ndata: r1\n\n", 0.0)]
+    assert list(make_client(api).stream_report("r1")) == ["Hello", "two\nlines"]
+    assert api.requests == ["/reports/r1/stream"]
+
+
+def test_report_stream_error_event_raises(api):
+    api.script = [(200, "event: chunk\ndata: Hel\n\nevent: error\ndata: LLM failed\n\n", 0.0)]
+    stream = make_client(api).stream_report("r1")
+    assert next(stream) == "Hel"
+    with pytest.raises(APIError, match="LLM failed"):
+        next(stream)
@@ -0,0 +1,58 @@
+import asyncio
+import inspect
+from types import SimpleNamespace
+import numpy as np
+import main
+from services.drift import DriftMonitor, build_reference
+
+MODEL = SimpleNamespace(columns=["Age", "Sex"], categories={"Sex": ["F", "M"]})
+
+
+def loaded(version="v1"):
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.normal(50, 10, 2000), rng.integers(0, 2, 2000)])
+    return SimpleNamespace(version=version, model=MODEL, meta={"drift_reference": build_reference(MODEL, X, rng.uniform(size=500))})
+
+
+def observe(monitor, model, X):
+    proba = np.random.default_rng(1).uniform(size=len(X))
+    monitor.observe("heart", model, X, [{"probability": p} for p in proba])
+
+
+def test_matching_traffic_raises_no_alert():
+    monitor, model = DriftMonitor(window=1000), loaded()
+    rng = np.random.default_rng(2)
+    observe(monitor, model, np.column_stack([rng.normal(50, 10, 500), rng.integers(0, 2, 500)]))
+    assert monitor.alerts() == []
+
+
+def test_shifted_feature_alerts():
+    monitor, model = DriftMonitor(window=1000), loaded()
+    rng = np.random.default_rng(2)
+    observe(monitor, model, np.column_stack([rng.normal(65, 10, 500), rng.integers(0, 2, 500)]))
+    assert [a["feature"] for a in monitor.alerts()] == ["Age"]
+
+
+def test_single_rows_match_a_batch():
+    rng = np.random.default_rng(3)
+    X = np.column_stack([rng.normal(55, 10, 300), rng.integers(0, 2, 300)])
+    batched, single, model = DriftMonitor(), DriftMonitor(), loaded()
+    observe(batched, model, X)
+    for row in X:
+        single.observe("heart", model, row, [{"probability": 0.5}])
+    assert batched.evaluate()["heart"]["features"] == single.evaluate()["heart"]["features"]
+
+
+def test_new_version_resets_the_sketch():
+    monitor = DriftMonitor()
+    observe(monitor, loaded("v1"), np.zeros((10, 2)))
+    observe(monitor, loaded("v2"), np.zeros((3, 2)))
+    report = monitor.evaluate()["heart"]
+    assert (report["version"], report["samples"]) == ("v2", 3)
+
+
+def test_monitoring_endpoints_run_on_the_event_loop():
+    # the sketches are updated on the loop without a lock, so they must be read there too
+    for endpoint in (main.prometheus_metrics, main.drift_report, main.drift_alerts):
+        assert inspect.iscoroutinefunction(endpoint)
+    assert "alerts" in asyncio.run(main.drift_alerts())
@@ -0,0 +1,89 @@
+import asyncio
+import shutil
+import threading
+import time
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+import main
+from schemas import FEATURE_LAYOUTS, HeartInput
+from services.executor import INFERENCE_RETRY_AFTER, ExecutorBusy, InferenceExecutor
+from services.inference import run_inference
+from services.registry import open_snapshot
+
+
+def score(loaded, X):
+    return run_inference(loaded.model, X, loaded.meta["risk_thresholds"])
+
+
+@pytest.fixture
+def process_executor():
+    executor = InferenceExecutor("process", workers=1, queue_size=4)
+    executor.start()
+    yield executor
+    executor.shutdown()
+
+
+def test_process_mode_round_trip_maps_the_artifact(process_executor):
+    loaded = open_snapshot("models/heart_pipeline.pkl")
+    row = FEATURE_LAYOUTS[HeartInput].example_row()
+    expected = score(loaded, row)
+
+    async def scenario():
+        return [await process_executor.run(score, loaded, row) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [expected] * 3
+    # the worker opened the artifact itself, no snapshot was pickled over
+    assert process_executor._payloads == {}
+
+
+def test_process_mode_falls_back_to_the_snapshot_once_the_file_changed(process_executor, tmp_path):
+    path = str(tmp_path / "heart_pipeline.pkl")
+    shutil.copy("models/heart_pipeline.pkl", path)
+    loaded = open_snapshot(path)
+    with open(path, "ab") as f:
+        f.write(b"\0")  # a different version on disk now
+    row = FEATURE_LAYOUTS[HeartInput].example_row()
+
+    async def scenario():
+        return await process_executor.run(score, loaded, row)
+
+    assert asyncio.run(scenario()) == score(loaded, row)
+    assert list(process_executor._payloads) == [loaded.version]
+
+
+def test_calls_past_capacity_are_turned_away():
+    gate = threading.Event()
+    executor = InferenceExecutor("thread", workers=1, queue_size=1)
+    executor.start()
+
+    async def scenario():
+        # one call runs, one waits in the queue, the third finds the executor full
+        admitted = [asyncio.ensure_future(executor.run(lambda loaded: gate.wait(5), None)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorBusy):
+            await executor.run(lambda loaded: None, None)
+        gate.set()
+        await asyncio.gather(*admitted)
+        # capacity is given back once calls finish
+        await executor.run(lambda loaded: None, None)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert executor.stats()["rejected"] == 1 and executor.inflight == 0
+
+
+def test_full_executor_answers_503_with_retry_after(monkeypatch):
+    row = pd.read_csv("datasets/heart.csv").drop(columns=["HeartDisease"]).iloc[0].to_dict()
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 30
+        while main.registry.get("heart_pipeline") is None:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert client.post("/predict/heart", json=row).status_code == 200
+        monkeypatch.setattr(main.cpu_executor, "capacity", 0)
+        response = client.post("/predict/heart", json=row)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(INFERENCE_RETRY_AFTER)
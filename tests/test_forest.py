@@ -0,0 +1,45 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from services.forest import ForestEngine, SklearnEngine, export_forest
+from services.training import TRAINING_CONFIGS
+
+
+def load_pipeline(config):
+    with open(config["model_path"], "rb") as f:
+        return pickle.load(f)
+
+
+def dataset_rows(config):
+    df = pd.read_csv(config["data_path"])
+    return df.drop(columns=[config["target"], *config.get("drop", [])])
+
+
+@pytest.fixture(scope="module", params=list(TRAINING_CONFIGS))
+def model(request, tmp_path_factory):
+    config = TRAINING_CONFIGS[request.param]
+    X = dataset_rows(config)
+    expected = load_pipeline(config).predict_proba(X)
+    path = export_forest(load_pipeline(config), os.path.join(tmp_path_factory.mktemp("forest"), "model.forest"))
+    return config, X, expected, path
+
+
+def test_native_engine_matches_sklearn(model):
+    _, X, expected, path = model
+    engine = ForestEngine.load(path)
+    np.testing.assert_allclose(engine.predict_proba(engine.encode_frame(X)), expected, rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(engine.predict(engine.encode_frame(X)), engine.classes_[expected.argmax(axis=1)])
+
+
+def test_sklearn_engine_matches_sklearn(model):
+    config, X, expected, _ = model
+    engine = SklearnEngine(load_pipeline(config))
+    np.testing.assert_allclose(engine.predict_proba(engine.encode_frame(X)), expected, rtol=0, atol=1e-9)
+
+
+def test_dataframe_input_is_encoded(model):
+    _, X, expected, path = model
+    engine = ForestEngine.load(path)
+    np.testing.assert_allclose(engine.predict_proba(X), expected, rtol=0, atol=1e-9)
@@ -0,0 +1,71 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from services.forest import SklearnEngine
+from services.inference import RISK_THRESHOLDS, get_risk_level, load_model_meta, risk_levels, run_inference
+from services.training import TRAINING_CONFIGS, train_model
+
+SINGLE_ROWS = 50  # the old endpoints scored one row per request; this many are replayed that way
+
+
+def load_pipeline(config):
+    with open(config["model_path"], "rb") as f:
+        return pickle.load(f)
+
+
+def old_endpoint(pipeline, row):
+    # what the handlers did before run_inference: two forest passes on a one-row frame
+    prob = pipeline.predict_proba(row)[0][1]
+    pred = pipeline.predict(row)[0]
+    return {"prediction": int(pred), "probability": prob, "risk_level": get_risk_level(prob)}
+
+
+@pytest.fixture(scope="module", params=list(TRAINING_CONFIGS))
+def model(request):
+    config = TRAINING_CONFIGS[request.param]
+    df = pd.read_csv(config["data_path"])
+    return load_pipeline(config), df.drop(columns=[config["target"], *config.get("drop", [])])
+
+
+def test_single_rows_match_old_endpoints(model):
+    pipeline, X = model
+    for i in range(SINGLE_ROWS):
+        row = X.iloc[i:i + 1]
+        assert run_inference(pipeline, row) == [old_endpoint(pipeline, row)]
+
+
+def test_batch_matches_old_path_on_every_row(model):
+    pipeline, X = model
+    probs = pipeline.predict_proba(X)[:, 1]
+    expected = [
+        {"prediction": int(pred), "probability": prob, "risk_level": get_risk_level(prob)}
+        for pred, prob in zip(pipeline.predict(X), probs)
+    ]
+    assert run_inference(pipeline, X) == expected
+    assert list(risk_levels(probs, RISK_THRESHOLDS)) == [e["risk_level"] for e in expected]
+
+
+def test_serving_engine_matches_old_path(model):
+    pipeline, X = model
+    engine = SklearnEngine(pickle.loads(pickle.dumps(pipeline)))
+    old = [old_endpoint(pipeline, X.iloc[i:i + 1]) for i in range(SINGLE_ROWS)]
+    assert run_inference(engine, engine.encode_frame(X.iloc[:SINGLE_ROWS])) == old
+
+
+def test_risk_level_boundaries():
+    low, high = RISK_THRESHOLDS
+    assert [get_risk_level(p) for p in (0.0, low - 1e-9, low, high - 1e-9, high, 1.0)] == [
+        "Low", "Low", "Medium", "Medium", "High", "High"
+    ]
+    assert list(risk_levels(np.array([0.0, low, high]))) == ["Low", "Medium", "High"]
+
+
+def test_trained_meta_carries_the_configs_thresholds(monkeypatch, tmp_path):
+    assert all(len(config["risk_thresholds"]) == 2 for config in TRAINING_CONFIGS.values())
+    config = {**TRAINING_CONFIGS["parkinsons"], "model_path": str(tmp_path / "parkinsons.pkl"), "risk_thresholds": (0.2, 0.9)}
+    monkeypatch.setitem(TRAINING_CONFIGS, "parkinsons", config)
+    assert train_model("parkinsons", n_jobs=1, use_mlflow=False)["status"] == "trained"
+    assert load_model_meta(config["model_path"])["risk_thresholds"] == [0.2, 0.9]
+    assert os.path.exists(tmp_path / "parkinsons.meta.json")
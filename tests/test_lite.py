@@ -0,0 +1,40 @@
+import os
+import shutil
+import pytest
+import services.lite
+from services.inference import load_model_meta, meta_path, variant_path
+from services.lite import build_variants, remove_variant
+from services.training import TRAINING_CONFIGS
+
+
+@pytest.fixture
+def heart(tmp_path, monkeypatch):
+    model_path = str(tmp_path / "heart_pipeline.pkl")
+    shutil.copy(TRAINING_CONFIGS["heart"]["model_path"], model_path)
+    monkeypatch.setitem(services.lite.TRAINING_CONFIGS, "heart", {**TRAINING_CONFIGS["heart"], "model_path": model_path})
+    return model_path
+
+
+def artifacts(model_path):
+    path = variant_path(model_path, "pruned")
+    return [p for p in (path, path.replace(".pkl", ".forest"), meta_path(path)) if os.path.exists(p)]
+
+
+def test_variant_within_the_floor_is_written(heart):
+    [result] = build_variants("heart", ["pruned"], n_trees=5, use_mlflow=False, max_accuracy_drop=1, max_f1_drop=1)
+    assert len(artifacts(heart)) == 3
+    meta = load_model_meta(variant_path(heart, "pruned"))
+    assert meta["saves"] == ["memory"]
+    assert meta["metrics"]["trees"] == result["trees"] == 5
+
+
+def test_variant_past_the_floor_is_not_written(heart):
+    build_variants("heart", ["pruned"], n_trees=5, use_mlflow=False, max_accuracy_drop=1, max_f1_drop=1)
+    # a stricter floor than any variant can meet rejects the rebuild and removes the earlier build
+    assert build_variants("heart", ["pruned"], n_trees=5, force=True, use_mlflow=False, max_accuracy_drop=-1) == []
+    assert artifacts(heart) == []
+    assert [p for p in os.listdir(os.path.dirname(heart)) if p != "heart_pipeline.pkl"] == []
+
+
+def test_remove_variant_without_artifacts(heart):
+    remove_variant(heart, "distilled")
@@ -0,0 +1,108 @@
+import time
+import pytest
+import services.llm
+from services.llm import CircuitBreaker, LLMClient
+
+
+class FakeProvider:
+    """Fails the first `failures` calls with `error`, then answers."""
+
+    def __init__(self, failures=0, error=ConnectionError("down"), delay=0.0):
+        self.failures = failures
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    def generate(self, prompt, timeout):
+        self.calls += 1
+        if self.delay:
+            time.sleep(min(self.delay, timeout))
+        if self.calls <= self.failures:
+            raise self.error
+        return "llm report"
+
+    def stream(self, prompt, timeout):
+        yield self.generate(prompt, timeout)
+
+
+def client(provider, retries=2, deadline=5, breaker=None):
+    llm = LLMClient("fake", max_concurrency=1, deadline=deadline, retries=retries,
+                    breaker=breaker or CircuitBreaker(threshold=100, cooldown=60))
+    llm._provider = provider
+    return llm
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(services.llm.time, "sleep", recorded.append)
+    return recorded
+
+
+def test_transient_failures_are_retried(sleeps):
+    provider = FakeProvider(failures=2)
+    assert client(provider).generate_prompt("prompt", lambda: "template") == ("llm report", "llm")
+    assert provider.calls == 3
+    assert len(sleeps) == 2
+
+
+def test_no_sleep_after_the_last_attempt(sleeps):
+    provider = FakeProvider(failures=10)
+    llm = client(provider, retries=2)
+    assert llm.generate_prompt("prompt", lambda: "template") == ("template", "fallback")
+    assert provider.calls == 3
+    assert len(sleeps) == 2
+    # the concurrency slot was released with the fallback
+    assert llm._slots.acquire(blocking=False)
+
+
+def test_client_errors_are_not_retried(sleeps):
+    error = RuntimeError("bad request")
+    error.code = 400
+    provider = FakeProvider(failures=10, error=error)
+    assert client(provider).generate_prompt("prompt", lambda: "template") == ("template", "fallback")
+    assert provider.calls == 1 and sleeps == []
+
+
+def test_stream_falls_back_before_anything_was_sent(sleeps):
+    provider = FakeProvider(failures=10)
+    assert list(client(provider, retries=1).stream_prompt("prompt", lambda: "template")) == [("fallback", "template")]
+    assert provider.calls == 2 and len(sleeps) == 1
+
+
+def test_deadline_falls_back_to_the_template():
+    provider = FakeProvider(failures=10, delay=0.2)
+    llm = client(provider, retries=5, deadline=0.3)
+    start = time.monotonic()
+    assert llm.generate_prompt("prompt", lambda: "template") == ("template", "fallback")
+    assert time.monotonic() - start < 1
+    assert provider.calls < 6
+
+
+def test_breaker_opens_then_probes_half_open(sleeps):
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    provider = FakeProvider(failures=2)
+    llm = client(provider, retries=0, breaker=breaker)
+    for _ in range(2):
+        assert llm.generate_prompt("prompt", lambda: "template")[1] == "fallback"
+    assert breaker.state == "open"
+    # open: calls are shed without reaching the provider
+    assert llm.generate_prompt("prompt", lambda: "template")[1] == "fallback"
+    assert provider.calls == 2
+
+    deadline = time.monotonic() + 0.05
+    while time.monotonic() < deadline:  # time.sleep is recorded, not slept, in this test
+        pass
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # a single probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert llm.generate_prompt("prompt", lambda: "template") == ("llm report", "llm")
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.0)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.state == "open"
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from services.executor import ExecutorBusy, InferenceExecutor
+import services.microbatch
+from services.metrics import metrics
+from services.microbatch import MicroBatcher
+
+
+class EchoModel:
+    """Probability of the positive class is the row's first value; records every call's batch size."""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+
+    def predict_proba(self, X):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls.append(len(X))
+        return np.column_stack([1 - X[:, 0], X[:, 0]])
+
+
+def loaded(model):
+    return SimpleNamespace(model=model, meta={"risk_thresholds": (0.3, 0.7)})
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = InferenceExecutor("thread", workers=2, queue_size=8)
+    executor.start()
+    monkeypatch.setattr(services.microbatch, "cpu_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_rows_are_coalesced_and_routed_back(executor):
+    model = EchoModel()
+    snapshot = loaded(model)
+
+    async def scenario():
+        batcher = MicroBatcher("test", max_delay_ms=50, max_rows=64)
+        await batcher.start()
+        values = [i / 100 for i in range(20)]
+        results = await asyncio.gather(*(batcher.submit(snapshot, np.array([[v]])) for v in values))
+        await batcher.stop()
+        return values, results, batcher.stats()
+
+    values, results, stats = run(scenario())
+    assert model.calls == [20]
+    assert [r["probability"] for r in results] == values
+    assert stats["batches"] == 1 and stats["rows"] == 20
+    rendered = metrics.render()
+    assert 'micro_batch_rows_bucket{model="test",le="32"} 1' in rendered
+    assert 'micro_batch_wait_seconds_count{model="test"} 20' in rendered
+
+
+def test_batches_are_capped_at_max_rows(executor):
+    model = EchoModel()
+    snapshot = loaded(model)
+
+    async def scenario():
+        batcher = MicroBatcher("test", max_delay_ms=50, max_rows=8)
+        await batcher.start()
+        await asyncio.gather(*(batcher.submit(snapshot, np.array([[0.5]])) for _ in range(20)))
+        await batcher.stop()
+
+    run(scenario())
+    assert sorted(model.calls, reverse=True) == [8, 8, 4]
+
+
+def test_a_lone_row_goes_out_after_max_delay(executor):
+    model = EchoModel()
+
+    async def scenario():
+        batcher = MicroBatcher("test", max_delay_ms=5, max_rows=64)
+        await batcher.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await batcher.submit(loaded(model), np.array([[0.5]]))
+        elapsed = loop.time() - start
+        await batcher.stop()
+        return elapsed
+
+    assert run(scenario()) < 1
+    assert model.calls == [1]
+
+
+def test_snapshots_are_never_mixed_in_one_call(executor):
+    old, new = EchoModel(), EchoModel()
+    snapshots = {old: loaded(old), new: loaded(new)}
+
+    async def scenario():
+        batcher = MicroBatcher("test", max_delay_ms=50, max_rows=64)
+        await batcher.start()
+        await asyncio.gather(*(batcher.submit(snapshots[m], np.array([[0.5]])) for m in (old, new, old, new, old)))
+        await batcher.stop()
+
+    run(scenario())
+    assert (old.calls, new.calls) == ([3], [2])
+
+
+def test_full_queue_is_turned_away(executor):
+    gate = threading.Event()
+    model = EchoModel(gate)
+
+    async def scenario():
+        batcher = MicroBatcher("test", max_delay_ms=1, max_rows=1, queue_size=2, max_flushes=1)
+        await batcher.start()
+        # the first row is taken off the queue and blocks the only flush slot
+        first = asyncio.ensure_future(batcher.submit(loaded(model), np.array([[0.1]])))
+        await asyncio.sleep(0.05)
+        # the next row waits for that slot in the batcher, two more fill the queue
+        queued = []
+        for _ in range(3):
+            queued.append(asyncio.ensure_future(batcher.submit(loaded(model), np.array([[0.2]]))))
+            await asyncio.sleep(0.02)
+        with pytest.raises(ExecutorBusy):
+            await batcher.submit(loaded(model), np.array([[0.3]]))
+        gate.set()
+        await asyncio.gather(first, *queued)
+        await batcher.stop()
+        return batcher.stats()
+
+    stats = run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["rows"] == 4
+
+
+def test_flushes_overlap_up_to_max_flushes(executor):
+    gate = threading.Event()
+    model = EchoModel(gate)
+
+    async def scenario():
+        batcher = MicroBatcher("test", max_delay_ms=1, max_rows=1, max_flushes=2)
+        await batcher.start()
+        pending = [asyncio.ensure_future(batcher.submit(loaded(model), np.array([[0.5]]))) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        inflight = batcher.stats()["inflight_batches"]
+        gate.set()
+        await asyncio.gather(*pending)
+        await batcher.stop()
+        return inflight
+
+    assert run(scenario()) == 2
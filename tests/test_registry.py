@@ -0,0 +1,119 @@
+import threading
+import time
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+import main
+import services.training
+from services.registry import ModelRegistry, holdout_split
+from services.training import TRAINING_CONFIGS, split_dataset
+
+
+@pytest.mark.parametrize("name", list(TRAINING_CONFIGS))
+def test_holdout_is_the_test_split(name):
+    config = TRAINING_CONFIGS[name]
+    X_train, X_test, _, y_test = split_dataset(config, pd.read_csv(config["data_path"]))
+    X, y = holdout_split(name, rows=10_000)
+    assert X.index.isin(X_test.index).all()
+    assert not X.index.isin(X_train.index).any()
+    assert (y == y_test.loc[X.index].to_numpy()).all()
+
+
+def test_holdout_is_capped(monkeypatch):
+    X, y = holdout_split("heart", rows=20)
+    assert len(X) == len(y) == 20
+
+
+def test_missing_dataset_means_no_holdout(monkeypatch):
+    config = {**TRAINING_CONFIGS["heart"], "data_path": "datasets/missing.csv"}
+    monkeypatch.setitem(services.training.TRAINING_CONFIGS, "heart", config)
+    assert holdout_split("heart") is None
+
+
+@pytest.mark.parametrize("method, path", [
+    ("get", "/admin/models"),
+    ("post", "/admin/models/heart/reload"),
+    ("post", "/admin/models/heart/rollback"),
+])
+def test_admin_is_closed_without_a_token(monkeypatch, method, path):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    client = TestClient(main.app)
+    assert getattr(client, method)(path).status_code == 403
+    assert getattr(client, method)(path, headers={"x-admin-token": ""}).status_code == 403
+
+
+def test_admin_checks_the_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    client = TestClient(main.app)
+    assert client.post("/admin/models/heart/rollback", headers={"x-admin-token": "wrong"}).status_code == 403
+    assert client.post("/admin/models/heart/rollback").status_code == 403
+    assert client.get("/admin/models", headers={"x-admin-token": "secret"}).status_code == 200
+
+
+def wait_for(registry, key, timeout=30):
+    deadline = time.monotonic() + timeout
+    while registry.entries[key].state not in ("ready", "failed"):
+        assert time.monotonic() < deadline, f"{key} still {registry.entries[key].state}"
+        time.sleep(0.02)
+    return registry.entries[key]
+
+
+def test_holdout_is_read_in_the_loader_thread():
+    threads = []
+
+    def holdout():
+        threads.append(threading.current_thread().name)
+        return holdout_split("heart", rows=20)
+
+    registry = ModelRegistry(watch_interval=0)
+    registry.register("heart_pipeline", "models/heart_pipeline.pkl", "sklearn", holdout=holdout)
+    assert threads == []
+    registry.load_all()
+    try:
+        entry = wait_for(registry, "heart_pipeline")
+        assert entry.state == "ready" and entry.loaded.holdout_accuracy is not None
+        assert len(threads) == 1 and threads[0].startswith("model-loader")
+    finally:
+        registry.shutdown()
+
+
+def test_startup_reads_no_dataset(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "holdout_split", lambda name: calls.append(name))
+    monkeypatch.setattr(main.registry, "load_all", lambda: [])
+    with TestClient(main.app) as client:
+        assert client.get("/").status_code == 200
+        assert calls == []
+
+
+def test_reload_of_a_corrupt_artifact_keeps_the_current_version(monkeypatch, tmp_path):
+    path = tmp_path / "heart_pipeline.pkl"
+    path.write_bytes(open("models/heart_pipeline.pkl", "rb").read())
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(main, "model_path", lambda disease, default: str(path) if disease == "heart" else default)
+    with TestClient(main.app) as client:
+        wait_for(main.registry, "heart_pipeline")
+        version = main.registry.get("heart_pipeline").version
+        path.write_bytes(path.read_bytes()[:1000])
+        response = client.post("/admin/models/heart/reload", headers={"x-admin-token": "secret"})
+        assert response.status_code == 422
+        assert "could not be loaded" in response.json()["detail"]
+        assert main.registry.get("heart_pipeline").version == version
+
+
+def test_watcher_retries_a_failed_initial_load(tmp_path):
+    path = tmp_path / "heart_pipeline.pkl"
+    path.write_bytes(b"not a pickle")
+    registry = ModelRegistry(watch_interval=0.05)
+    registry.register("heart_pipeline", str(path), "sklearn")
+    registry.load_all()
+    try:
+        assert wait_for(registry, "heart_pipeline").state == "failed"
+        path.write_bytes(open("models/heart_pipeline.pkl", "rb").read())
+        deadline = time.monotonic() + 30
+        while registry.entries["heart_pipeline"].state != "ready":
+            assert time.monotonic() < deadline, registry.entries["heart_pipeline"].status()
+            time.sleep(0.05)
+        assert registry.entries["heart_pipeline"].error is None
+    finally:
+        registry.shutdown()
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import services.report_cache
+from services.report_cache import ReportCache, report_key, screening_key
+from services.reports import ReportJob, ReportWorkerPool
+
+INPUT = {"Age": 54, "Cholesterol": 240}
+TOP = [{"feature": "Cholesterol", "contribution": 0.1234}, {"feature": "Age", "contribution": -0.05}]
+
+
+def test_report_key_depends_on_drivers():
+    # a new model version can score the same probability with other drivers, and the prompt prints them
+    key = report_key("Heart Disease", 1, 0.71, INPUT, TOP)
+    assert key != report_key("Heart Disease", 1, 0.71, INPUT)
+    assert key != report_key("Heart Disease", 1, 0.71, INPUT, list(reversed(TOP)))
+    assert key == report_key("Heart Disease", 1, 0.71, INPUT, [{**f, "contribution": f["contribution"] + 1e-5} for f in TOP])
+
+
+def test_screening_key_depends_on_drivers():
+    finding = {"disease": "Heart Disease", "prediction": 1, "probability": 0.71}
+    assert screening_key([{**finding, "top_features": TOP}], INPUT) != screening_key([finding], INPUT)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(services.report_cache.time, "time", lambda: now[0])
+    cache = ReportCache(ttl=60, db_path=None)
+    cache.put("a", "report")
+    now[0] += 59
+    assert cache.get("a") == "report"
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.snapshot()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ReportCache(max_entries=2, db_path=None)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_sqlite_file_survives_a_restart(tmp_path):
+    path = str(tmp_path / "reports.sqlite3")
+    first = ReportCache(db_path=path)
+    first.put("a", "A")
+    first.close()
+    second = ReportCache(db_path=path)
+    assert second.get("a") == "A"
+    assert second.snapshot()["disk_hits"] == 1
+    assert second.get("a") == "A"
+    assert second.snapshot()["memory_hits"] == 1
+    second.close()
+
+
+def test_sqlite_file_is_trimmed_every_few_puts(tmp_path):
+    cache = ReportCache(max_entries=1, db_path=str(tmp_path / "reports.sqlite3"), db_max_entries=2, prune_every=4)
+    rows = []
+    for i in range(8):
+        cache.put(str(i), "report")
+        rows.append(cache._db.execute("SELECT COUNT(*) FROM reports").fetchone()[0])
+    assert rows == [1, 2, 3, 2, 3, 4, 5, 2]
+    assert cache.get("7") == "report" and cache.get("0") is None
+    cache.close()
+
+
+def test_pool_does_disk_cache_io_off_the_event_loop(tmp_path):
+    threads = []
+
+    class RecordingCache(ReportCache):
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return super().get(key)
+
+        def put(self, key, report):
+            threads.append(threading.current_thread())
+            super().put(key, report)
+
+    def stream(*args):
+        yield "llm", "text"
+
+    async def scenario():
+        pool = ReportWorkerPool(workers=1, cache=RecordingCache(db_path=str(tmp_path / "reports.sqlite3")))
+        await pool.start()
+        job = await pool.submit_job(ReportJob(stream, (), "key"))
+        while job.status != "done" or not job.updated.is_set():
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        return job
+
+    assert asyncio.run(scenario()).text == "text"
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+import main
+from services.report_cache import ReportCache
+from services.reports import ReportJob, ReportQueueFull, ReportWorkerPool, stream_job_events
+
+
+def chunks(*parts, gate=None, fail=None):
+    def stream(*args):
+        for part in parts:
+            yield "llm", part
+        if gate is not None:
+            gate.wait(5)
+        if fail is not None:
+            raise fail
+    return stream
+
+
+async def events(job):
+    return [event async for event in stream_job_events(job)]
+
+
+async def finished(job):
+    while job.status in ("pending", "running") or not job.updated.is_set():
+        await asyncio.sleep(0.005)
+    return job
+
+
+def test_job_goes_pending_running_done_and_is_cached():
+    gate = threading.Event()
+    cache = ReportCache(db_path=None)
+
+    async def scenario():
+        pool = ReportWorkerPool(workers=1, cache=cache)
+        await pool.start()
+        job = await pool.submit_job(ReportJob(chunks("Hello ", "world", gate=gate), (), "key"))
+        assert job.status == "pending" and pool.get(job.id) is job
+        while job.status == "pending":
+            await asyncio.sleep(0.005)
+        assert job.status == "running"
+        gate.set()
+        await finished(job)
+        again = await pool.submit_job(ReportJob(chunks("other"), (), "key"))
+        await pool.stop()
+        return job, again
+
+    job, again = asyncio.run(scenario())
+    assert job.to_dict() == {"report_id": job.id, "status": "done", "ai_analysis": "Hello world", "source": "llm", "error": None}
+    # the same key is answered from the cache without queueing
+    assert (again.status, again.source, again.text) == ("done", "cache", "Hello world")
+
+
+def test_events_stream_in_order_then_done():
+    async def scenario():
+        pool = ReportWorkerPool(workers=1, cache=ReportCache(db_path=None))
+        await pool.start()
+        job = await pool.submit_job(ReportJob(chunks("a", "b\nc", "d"), (), "key"))
+        streamed = await events(job)
+        await pool.stop()
+        return job, streamed
+
+    job, streamed = asyncio.run(scenario())
+    assert streamed == [
+        "event: chunk\ndata: a\n\n",
+        "event: chunk\ndata: b\ndata: c\n\n",
+        "event: chunk\ndata: d\n\n",
+        f"event: done\ndata: {job.id}\n\n",
+    ]
+
+
+def test_failing_worker_marks_the_job_failed():
+    async def scenario():
+        pool = ReportWorkerPool(workers=1, cache=ReportCache(db_path=None))
+        await pool.start()
+        job = await pool.submit_job(ReportJob(chunks("partial", fail=RuntimeError("stream broke")), (), "key"))
+        streamed = await events(job)
+        # the worker survives and takes the next job
+        after = await finished(await pool.submit_job(ReportJob(chunks("ok"), (), "other")))
+        await pool.stop()
+        return job, streamed, after
+
+    job, streamed, after = asyncio.run(scenario())
+    assert (job.status, job.error) == ("failed", "stream broke")
+    assert streamed == ["event: chunk\ndata: partial\n\n", "event: error\ndata: stream broke\n\n"]
+    assert after.status == "done"
+
+
+def test_full_queue_is_refused():
+    gate = threading.Event()
+
+    async def scenario():
+        pool = ReportWorkerPool(workers=1, queue_size=1, cache=ReportCache(db_path=None))
+        await pool.start()
+        first = await pool.submit_job(ReportJob(chunks(gate=gate), (), "a"))
+        with pytest.raises(ReportQueueFull):
+            await pool.submit_job(ReportJob(chunks(), (), "b"))
+        gate.set()
+        await finished(first)
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_sse_endpoint():
+    with TestClient(main.app) as client:
+        job = client.portal.call(main.report_pool.submit_job, ReportJob(chunks("one ", "two"), (), "sse-test"))
+        with client.stream("GET", f"/reports/{job.id}/stream") as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+        assert body == f"event: chunk\ndata: one \n\nevent: chunk\ndata: two\n\nevent: done\ndata: {job.id}\n\n"
+        assert client.get(f"/reports/{job.id}").json()["status"] == "done"
+        assert client.get("/reports/unknown/stream").status_code == 404
@@ -0,0 +1,85 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from schemas import FEATURE_LAYOUTS, DiabetesInput, HeartInput, ParkinsonInput
+from services.forest import SklearnEngine
+from services.training import TRAINING_CONFIGS
+
+SCHEMAS = {"diabetes": DiabetesInput, "heart": HeartInput, "parkinsons": ParkinsonInput}
+HEART = FEATURE_LAYOUTS[HeartInput]
+
+
+def dataset(name):
+    config = TRAINING_CONFIGS[name]
+    df = pd.read_csv(config["data_path"])
+    return config, df.drop(columns=[config["target"], *config.get("drop", [])])
+
+
+@pytest.fixture(scope="module", params=list(SCHEMAS))
+def model(request):
+    config, X = dataset(request.param)
+    with open(config["model_path"], "rb") as f:
+        pipeline = pickle.load(f)
+    return FEATURE_LAYOUTS[SCHEMAS[request.param]], pipeline, X
+
+
+def test_layout_matches_the_training_columns(model):
+    layout, pipeline, X = model
+    assert layout.columns == list(X.columns)
+    layout.check(SklearnEngine(pipeline))
+
+
+def test_frame_to_matrix_matches_the_pipeline_on_every_row(model):
+    layout, pipeline, X = model
+    matrix, errors = layout.frame_to_matrix(X)
+    assert (errors == None).all()  # noqa: E711
+    np.testing.assert_allclose(SklearnEngine(pipeline).predict_proba(matrix), pipeline.predict_proba(X), rtol=0, atol=1e-9)
+
+
+def test_frame_to_matrix_matches_per_row_validation(model):
+    layout, _, X = model
+    records = X.head(25).to_dict("records")
+    expected = layout.to_matrix([layout.schema.model_validate(r) for r in records])
+    np.testing.assert_array_equal(layout.frame_to_matrix(pd.DataFrame(records))[0], expected)
+
+
+def test_column_order_of_the_input_does_not_matter():
+    _, X = dataset("heart")
+    shuffled = X[list(reversed(X.columns))]
+    np.testing.assert_array_equal(HEART.frame_to_matrix(shuffled)[0], HEART.frame_to_matrix(X)[0])
+
+
+def test_categories_are_coded_in_sorted_order():
+    assert HEART.categories["ChestPainType"] == ["ASY", "ATA", "NAP", "TA"]
+    row = HEART.to_row(HeartInput.model_validate({**_heart_example(), "ChestPainType": "NAP", "Sex": "F"}))
+    assert row[0, HEART.columns.index("ChestPainType")] == 2
+    assert row[0, HEART.columns.index("Sex")] == 0
+
+
+def test_missing_and_extra_columns():
+    frame = pd.DataFrame([_heart_example()]).drop(columns=["Cholesterol"]).assign(Unused="x")
+    X, errors = HEART.frame_to_matrix(frame)
+    assert errors.tolist() == ["Cholesterol: missing"]
+    assert np.isnan(X).all()
+
+
+def test_invalid_values_are_reported_per_row():
+    rows = [
+        _heart_example(),
+        {**_heart_example(), "Sex": "X"},
+        {**_heart_example(), "Age": "old", "FastingBS": 2},
+        {**_heart_example(), "RestingBP": 120.5},
+        {**_heart_example(), "MaxHR": None},
+    ]
+    X, errors = HEART.frame_to_matrix(pd.DataFrame(rows))
+    assert errors[0] is None and not np.isnan(X[0]).any()
+    assert errors[1] == "Sex: must be one of ['F', 'M']"
+    assert errors[2] == "Age: not a number; FastingBS: must be <= 1"
+    assert errors[3] == "RestingBP: not an integer"
+    assert errors[4] == "MaxHR: missing"
+    assert np.isnan(X[1:]).all()
+
+
+def _heart_example():
+    return {name: field.json_schema_extra["example"] for name, field in HeartInput.model_fields.items()}
@@ -0,0 +1,66 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+import main
+from schemas import DiabetesInput, HeartInput, ParkinsonInput
+from services.llm import merge_inputs
+
+
+def example(schema):
+    return {field.alias or name: field.json_schema_extra["example"] for name, field in schema.model_fields.items()}
+
+
+def test_shared_fields_appear_once():
+    merged = merge_inputs({"Diabetes": {"Age": 50, "BMI": 33.6}, "Heart Disease": {"Age": 50, "Sex": "M"}})
+    assert merged == {"Age": 50, "BMI": 33.6, "Sex": "M"}
+
+
+def test_conflicting_fields_are_kept_per_disease():
+    merged = merge_inputs({"Diabetes": {"Age": 50, "BMI": 33.6}, "Heart Disease": {"Age": 40, "Sex": "M"}})
+    assert merged == {"BMI": 33.6, "Sex": "M", "Age (Diabetes)": 50, "Age (Heart Disease)": 40}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 60
+        while not main.registry.ready():
+            assert time.monotonic() < deadline, main.registry.status()
+            time.sleep(0.05)
+        yield client
+
+
+def test_screen_matches_the_single_endpoints(client):
+    payload = {"diabetes": example(DiabetesInput), "heart": example(HeartInput), "parkinsons": example(ParkinsonInput)}
+    response = client.post("/predict/screen", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["results"]) == {"diabetes", "heart", "parkinsons"}
+    assert body["report_id"]
+    for disease, data in payload.items():
+        single = client.post(f"/predict/{disease}", json=data).json()
+        for field in ("prediction", "probability", "risk_level", "model_version"):
+            assert body["results"][disease][field] == single[field]
+
+
+def test_screen_with_a_subset(client):
+    response = client.post("/predict/screen", json={"heart": example(HeartInput)})
+    assert response.status_code == 200
+    assert set(response.json()["results"]) == {"heart"}
+
+
+@pytest.mark.parametrize("disease, schema, field", [
+    ("diabetes", DiabetesInput, "Glucose"),
+    ("heart", HeartInput, "ChestPainType"),
+    ("parkinsons", ParkinsonInput, "MDVP:Fo(Hz)"),
+])
+def test_missing_required_field_names_the_disease(client, disease, schema, field):
+    data = example(schema)
+    del data[field]
+    response = client.post("/predict/screen", json={disease: data})
+    assert response.status_code == 422
+    assert [(e["loc"], e["type"]) for e in response.json()["detail"]] == [(["body", disease, field], "missing")]
+
+
+def test_empty_screen_is_rejected(client):
+    assert client.post("/predict/screen", json={}).status_code == 422
@@ -0,0 +1,38 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import services.tuning
+from services.tuning import pareto_ranks, search_model
+
+
+def test_pareto_ranks():
+    scores = [{"f1": 0.9, "latency_ms": 2.0}, {"f1": 0.8, "latency_ms": 1.0}, {"f1": 0.8, "latency_ms": 2.0}]
+    assert pareto_ranks(scores) == [0, 0, 1]
+
+
+def test_latency_is_only_measured_once_a_rounds_fits_are_done(monkeypatch, tmp_path):
+    lock, running, overlaps, calls = threading.Lock(), [0], [], []
+
+    def fit_candidate(name, params, n_samples):
+        with lock:
+            running[0] += 1
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return params, params["n_estimators"] / 1000
+
+    def measure_latency(pipeline, X):
+        calls.append(pipeline)
+        overlaps.append(running[0])
+        return pipeline["n_estimators"] / 100
+
+    monkeypatch.setattr(services.tuning, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(services.tuning, "fit_candidate", fit_candidate)
+    monkeypatch.setattr(services.tuning, "measure_latency", measure_latency)
+    monkeypatch.setattr(services.tuning, "tuned_params_path", lambda path: str(tmp_path / "tuned.json"))
+    monkeypatch.setattr(services.tuning, "train_model", lambda name, force, use_mlflow: {"model": name})
+    result = search_model("heart", candidates=9, workers=4, use_mlflow=False)
+
+    assert len(calls) > 9
+    assert set(overlaps) == {0}
+    assert "n_estimators" in result["search"]["params"]